@@ -2,97 +2,148 @@ import streamlit as st
 import pandas as pd
 import os
 import sys
-from supabase import create_client, Client
 
 # Add parent directory to path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 import config.config as config
+import db.database as database
+import db.cache as db_cache
+from db.outbox import get_outbox
+import db.rollups as rollups
+import bulk_import
+import export
+import mail_outbox
+import warmup
+import tracing
+import catalog_answers
+import session_store
 import rag_pipeline as rag 
 
-# --- INITIALIZE SUPABASE ---
-try:
-    supabase: Client = create_client(config.SUPABASE_URL, config.SUPABASE_KEY)
-except Exception as e:
-    st.error(f"Supabase Connection Failed: {e}")
-    supabase = None
-
-def load_table_data(table_name):
-    """
-    Fetches all rows from a Supabase table.
-    Replaces the old SQL query execution.
-    """
+PAGE_SIZE = 50
+
+# Column names shown in the dashboard
+VIEW_COLUMNS = {
+    'id': 'Booking_ID',
+    'name': 'Customer',
+    'email': 'Email',
+    'location': 'Destination',
+    'module_name': 'Module',
+    'booking_date': 'Date',
+    'guest_count': 'Guests',
+    'total_cost': 'Cost',
+    'status': 'Status',
+    'created_at': 'Booked_On'
+}
+
+def to_view(rows_or_df):
+    """Joined booking rows -> dashboard frame with display column names."""
+    df = rows_or_df if isinstance(rows_or_df, pd.DataFrame) else pd.DataFrame(rows_or_df)
+    if df.empty: return df
+    df = df.rename(columns=VIEW_COLUMNS)
+    if 'Cost' in df.columns:
+        df['Cost'] = pd.to_numeric(df['Cost'], errors='coerce').fillna(0)
+    return df
+
+def load_bookings_page(filters, page):
+    """Server-side filtered page of bookings. Returns (view frame, total matching rows)."""
+    try:
+        rows, total = database.get_repository().query_bookings(filters, offset=page * PAGE_SIZE, limit=PAGE_SIZE)
+        return to_view(rows), total
+    except Exception as e:
+        st.error(f"Error loading bookings: {e}")
+        return pd.DataFrame(), 0
+
+def load_customers_page(page):
+    try:
+        rows, total = database.get_repository().query_customers(offset=page * PAGE_SIZE, limit=PAGE_SIZE)
+        return pd.DataFrame(rows), total
+    except Exception as e:
+        st.error(f"Error loading customers: {e}")
+        return pd.DataFrame(), 0
+
+def load_rollups():
+    """Pre-aggregated analytics rows (O(#groups), maintained on every booking write)."""
+    try:
+        return database.get_repository().read_rollups()
+    except Exception as e:
+        st.error(f"Error loading analytics: {e}")
+        return []
+
+def count_customers():
     try:
-        response = supabase.table(table_name).select("*").execute()
-        if not response.data:
-            return pd.DataFrame()
-        return pd.DataFrame(response.data)
+        _, total = database.get_repository().query_customers(offset=0, limit=1)
+        return total
     except Exception as e:
-        st.error(f"Error loading {table_name}: {e}")
-        return pd.DataFrame()
+        st.error(f"Error counting customers: {e}")
+        return 0
 
 def update_booking_status(booking_id, new_status):
-    """Updates booking status in Supabase"""
+    """Updates booking status through the repository (also invalidates its cache entry)"""
     try:
-        supabase.table("bookings").update({"status": new_status}).eq("id", booking_id).execute()
-        return True
+        return database.get_repository().update_booking(booking_id, {"status": new_status})
     except Exception as e:
         st.error(f"Update Failed: {e}")
         return False
 
+def load_outbox_stats():
+    """Booking outbox counters; a disabled or unreadable outbox must not take the dashboard down."""
+    if not config.OUTBOX_ENABLED:
+        return {"enabled": False}
+    try:
+        return get_outbox().get_stats()
+    except Exception as e:
+        return {"error": str(e)}
+
+def page_selector(total, key):
+    """Page number input; returns the zero-based page index."""
+    pages = max(1, -(-total // PAGE_SIZE))
+    page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, step=1, key=key)
+    return int(page) - 1
+
 def show_admin_panel():
     st.title("Admin Dashboard")
     
-    # --- 1. FETCH DATA  ---
-    df_bookings = load_table_data("bookings")
-    df_customers = load_table_data("customers")
-    
-    if not df_bookings.empty and not df_customers.empty:
-        df_full = pd.merge(
-            df_bookings, 
-            df_customers[['id', 'name', 'email']], 
-            left_on='customer_id', 
-            right_on='id', 
-            how='left',
-            suffixes=('', '_cust')
-        )
-        
-        df_full.rename(columns={
-            'id': 'Booking_ID',
-            'name': 'Customer',
-            'email': 'Email',
-            'location': 'Destination',
-            'module_name': 'Module',
-            'booking_date': 'Date',
-            'guest_count': 'Guests',
-            'total_cost': 'Cost',
-            'status': 'Status',
-            'created_at': 'Booked_On'
-        }, inplace=True)
-    else:
-        df_full = pd.DataFrame()
-
-    # --- 2. GLOBAL METRICS ---
-    total_bookings = len(df_full)
-    
-    # Calculate Revenue 
-    total_revenue = 0
-    if not df_full.empty and 'Cost' in df_full.columns:
-        
-        df_full['Cost'] = pd.to_numeric(df_full['Cost'], errors='coerce').fillna(0)
-        total_revenue = df_full[df_full['Status'] != 'Cancelled']['Cost'].sum()
-        
-    total_customers = len(df_customers)
+    # --- 1. FETCH DATA (rollups only; the bookings tab loads one filtered page) ---
+    rollup_rows = load_rollups()
+    summary = rollups.summarize(rollup_rows)
+
+    # --- 2. GLOBAL METRICS (from rollups, no scan over bookings) ---
+    total_bookings = summary["total_bookings"]
+    total_revenue = summary["total_revenue"]
+    total_customers = count_customers()
 
     # Metric Row
     m1, m2, m3 = st.columns(3)
     m1.metric("Total Bookings", total_bookings)
     m2.metric("Total Revenue", f"INR {total_revenue:,.0f}")
     m3.metric("Total Customers", total_customers)
+
+    with st.expander("Data Layer Stats", expanded=False):
+        st.write("**Cache hit rates**")
+        st.json(db_cache.get_cache_stats())
+        st.write("**Latency per operation**")
+        st.json(database.get_latency_report())
+        st.write("**Exports**")
+        st.json(export.EXPORT_STATS)
+        st.write("**Session store** (read/write timings per rerun, save conflicts merged)")
+        st.json(session_store.get_store_stats())
+        st.write("**Booking outbox**")
+        st.json(load_outbox_stats())
+        st.write("**Email outbox**")
+        st.json(mail_outbox.get_mail_outbox().get_stats())
+        st.write("**Catalog fast path** (chat turns answered from logistics.json, no LLM)")
+        st.json(catalog_answers.get_stats())
+        st.write("**Warm-up**")
+        st.json(warmup.get_status())
+        if config.RERANK_ENABLED:
+            import reranker
+            st.write("**Rerank** (context chunks kept vs. plain top-3)")
+            st.json(reranker.get_stats())
     
     st.divider()
 
     # --- MAIN TABS ---
-    tab1, tab2, tab3, tab4 = st.tabs(["Bookings Management", "Analytics", "Customer Data", "Knowledge Base"])
+    tab1, tab2, tab3, tab4, tab5 = st.tabs(["Bookings Management", "Analytics", "Customer Data", "Knowledge Base", "Traces"])
 
    
     # TAB 1: BOOKINGS 
@@ -104,38 +155,32 @@ def show_admin_panel():
         with st.expander("Filter Options", expanded=True):
             f1, f2, f3 = st.columns(3)
             with f1:
-                status_filter = st.selectbox("Filter by Status", ["All", "Confirmed", "Completed", "Cancelled"])
+                status_filter = st.selectbox("Filter by Status", ["All", "Confirmed", "Completed", "Cancelled", "Email Failed"])
             with f2:
                 
-                if not df_full.empty and 'Destination' in df_full.columns:
-                    locations = ["All"] + df_full['Destination'].unique().tolist()
-                else:
-                    locations = ["All"]
+                locations = ["All"] + rollups.destinations(rollup_rows)
                 location_filter = st.selectbox("Filter by Destination", locations)
             with f3:
                 search_term = st.text_input("Search Name/ID", placeholder="Type name...")
 
-        # 2. APPLY FILTERS 
-        if not df_full.empty:
-            df_view = df_full.copy()
-
-            if status_filter != "All":
-                df_view = df_view[df_view['Status'] == status_filter]
-            
-            if location_filter != "All":
-                df_view = df_view[df_view['Destination'] == location_filter]
-                
-            if search_term:
-            
-                s_term = search_term.lower()
-                df_view = df_view[
-                    df_view['Customer'].str.lower().str.contains(s_term, na=False) | 
-                    df_view['Booking_ID'].astype(str).str.contains(s_term)
-                ]
+        # 2. APPLY FILTERS (server-side, one page at a time)
+        filters = {
+            "status": status_filter if status_filter != "All" else None,
+            "location": location_filter if location_filter != "All" else None,
+            "search": search_term,
+        }
+        page = st.session_state.get("bookings_page", 1) - 1
+        df_view, total_matching = load_bookings_page(filters, page)
+        if total_matching and df_view.empty and page > 0:
+            # Filters shrank the result set below the current page
+            st.session_state["bookings_page"] = 1
+            page = 0
+            df_view, total_matching = load_bookings_page(filters, page)
 
-            
-            if 'Booked_On' in df_view.columns:
-                df_view = df_view.sort_values(by='Booked_On', ascending=False)
+        if total_matching:
+            page_selector(total_matching, key="bookings_page")
+            start = page * PAGE_SIZE
+            st.caption(f"Showing {start + 1}–{start + len(df_view)} of {total_matching} bookings")
 
             # 3. DISPLAY TABLE
             
@@ -143,72 +188,126 @@ def show_admin_panel():
             
             cols_to_show = [c for c in cols_to_show if c in df_view.columns]
             
-            st.dataframe(df_view[cols_to_show], use_container_width=True, hide_index=True)
+            event = st.dataframe(
+                df_view[cols_to_show],
+                on_select="rerun",
+                selection_mode="multi-row",
+                use_container_width=True,
+                hide_index=True,
+                key="bookings_table"
+            )
             
             st.divider()
             
-            # 4. ACTION SECTION
+            # 4. ACTION SECTION (one batched request for every selected row)
             st.subheader("Update Booking Status")
+            selected_ids = df_view.iloc[event.selection.rows]['Booking_ID'].tolist()
             ac1, ac2, ac3 = st.columns([1, 2, 1])
             
             with ac1:
-                
-                available_ids = df_view['Booking_ID'].tolist()
-                selected_id = st.selectbox("Select Booking ID", available_ids)
+                st.write("") 
+                st.markdown(f"**{len(selected_ids)} selected**" if selected_ids else "Select rows in the table")
             
             with ac2:
-                new_status_action = st.selectbox("Change Status To", ["Confirmed", "Completed", "Cancelled"])
+                new_status_action = st.selectbox("Change Status To", ["Confirmed", "Completed", "Cancelled", "Email Failed"])
             
             with ac3:
                 st.write("") 
                 st.write("") 
-                if st.button("Update Status"):
-                    if update_booking_status(selected_id, new_status_action):
-                        st.success(f"Booking #{selected_id} updated to {new_status_action}!")
+                if st.button("Update Status", disabled=not selected_ids):
+                    try:
+                        report = bulk_import.update_status_batch(selected_ids, new_status_action)
+                        st.session_state["bulk_status_report"] = (
+                            f"{report['updated']} bookings set to {new_status_action} "
+                            f"in {report['seconds'] * 1000:.0f} ms ({report['rows_per_sec']:,.0f} rows/s)"
+                        )
                         st.rerun()
+                    except Exception as e:
+                        st.error(f"Update Failed: {e}")
+
+            if "bulk_status_report" in st.session_state:
+                st.success(st.session_state.pop("bulk_status_report"))
             
-            # Download
-            csv = df_view.to_csv(index=False).encode('utf-8')
-            st.download_button("Download filtered data as CSV", csv, "bookings.csv", "text/csv")
+            # Download (built only on click, streamed from the DB in chunks)
+            export_fmt = st.radio("Export format", list(export.EXPORT_FORMATS), horizontal=True, key="export_format")
+            file_name, mime = export.EXPORT_FORMATS[export_fmt]
+            st.download_button(
+                f"Download filtered data as {export_fmt}",
+                data=lambda f=dict(filters), fmt=export_fmt: export.build_export(f, fmt),
+                file_name=file_name, mime=mime,
+            )
             
         else:
             st.info("No bookings match your filters.")
 
+        # 5. BULK CSV IMPORT (offline / agent bookings)
+        with st.expander("Bulk Import from CSV", expanded=False):
+            st.caption("Columns: " + ", ".join(bulk_import.REQUIRED_COLUMNS) + " (optional: total_cost, status)")
+            import_file = st.file_uploader("Upload bookings CSV", type="csv", key="bulk_import_csv")
+            if import_file is not None:
+                df_import = pd.read_csv(import_file, dtype=str, keep_default_na=False)
+                st.write(f"{len(df_import)} rows found.")
+                if st.button("Validate & Import"):
+                    with st.spinner("Importing..."):
+                        report = bulk_import.import_bookings(df_import)
+                    st.success(
+                        f"Imported {report['inserted']} bookings in {report['chunks']} chunks, "
+                        f"{report['seconds']:.2f}s ({report['rows_per_sec']:,.0f} rows/s)."
+                    )
+                    if report["errors"]:
+                        st.warning(f"{report['rejected']} rows rejected:")
+                        st.dataframe(pd.DataFrame(report["errors"]), hide_index=True)
+
     
     # TAB 2: ANALYTICS (Charts)
     
     with tab2:
         st.subheader("Business Intelligence")
         
-        if not df_full.empty:
-         
-            valid_an = df_full[df_full['Status'] != 'Cancelled']
+        if summary["revenue_by_destination"] or summary["bookings_by_module"]:
             
             col_a, col_b = st.columns(2)
             
             with col_a:
                 # 1. REVENUE BY DESTINATION
-                if 'Destination' in valid_an.columns:
-                    st.markdown("### Revenue by Destination")
-                    rev_by_loc = valid_an.groupby("Destination")["Cost"].sum()
-                    st.bar_chart(rev_by_loc, color="#4CAF50")
+                st.markdown("### Revenue by Destination")
+                rev_by_loc = pd.Series(summary["revenue_by_destination"], name="Cost").rename_axis("Destination")
+                st.bar_chart(rev_by_loc, color="#4CAF50")
 
             with col_b:
                 # 2. POPULAR MODULES
-                if 'Module' in valid_an.columns:
-                    st.markdown("### Most Popular Packages")
-                    mod_counts = valid_an['Module'].value_counts()
-                    st.bar_chart(mod_counts, color="#FF9800")
+                st.markdown("### Most Popular Packages")
+                mod_counts = pd.Series(summary["bookings_by_module"], name="count").sort_values(ascending=False).rename_axis("Module")
+                st.bar_chart(mod_counts, color="#FF9800")
             
         else:
             st.warning("Not enough data to generate charts. Add some bookings!")
 
+        # 3. ROLLUP MAINTENANCE
+        with st.expander("Rollup Consistency", expanded=False):
+            rc1, rc2 = st.columns(2)
+            with rc1:
+                if st.button("Check Consistency"):
+                    diffs = rollups.check_consistency(database.get_repository())
+                    if diffs:
+                        st.error(f"{len(diffs)} rollup groups differ from a full recount.")
+                        st.json(diffs[:20])
+                    else:
+                        st.success("Rollups match a full recount.")
+            with rc2:
+                if st.button("Rebuild Rollups"):
+                    database.get_repository().rebuild_rollups()
+                    st.success("Rollups rebuilt from scratch.")
+                    st.rerun()
+
     
     # TAB 3: CUSTOMERS
    
     with tab3:
         st.subheader("Customer Database")
-        if not df_customers.empty:
+        if total_customers:
+            cust_page = page_selector(total_customers, key="customers_page")
+            df_customers, _ = load_customers_page(cust_page)
             st.dataframe(df_customers, use_container_width=True)
         else:
             st.info("No customers found.")
@@ -237,7 +336,7 @@ def show_admin_panel():
                     
                     
                     with st.spinner("Updating AI Brain..."):
-                        rag.initialize_knowledge_base()
+                        rag.initialize_knowledge_base(force=True)
                     st.rerun()
 
         st.divider()
@@ -263,19 +362,85 @@ def show_admin_panel():
                         
                         
                         with st.spinner("Re-indexing..."):
-                            rag.initialize_knowledge_base()
+                            rag.initialize_knowledge_base(force=True)
                         st.rerun()
         else:
             st.info("No documents found. Upload one above!")
 
         st.divider()
         
+        import index_snapshots
+        st.caption(f"Live index version: `{index_snapshots.current_version() or 'none'}` "
+                   f"({len(index_snapshots.versions())} version(s) on disk; old ones are removed after each publish)")
+
         # Manual Force Refresh 
         if st.button("🔄 Force Re-build Index"):
             with st.spinner("Processing all PDFs..."):
-                rag.initialize_knowledge_base()
+                rag.initialize_knowledge_base(force=True)
                 st.success("Knowledge Base Re-built successfully!")
 
+
+    # TAB 5: TRACES (per-turn latency breakdown, see app/tracing.py)
+
+    with tab5:
+        show_traces()
+
+def show_traces():
+    st.subheader("Request Traces")
+    if not config.TRACING_ENABLED:
+        st.info("Tracing is off (TRACING_ENABLED=false).")
+        return
+    kinds = tracing.kinds()
+    if not kinds:
+        st.info("No traces yet. Chat turns show up here as they finish.")
+        return
+    kind = st.selectbox("Trace kind", kinds, index=kinds.index("turn") if "turn" in kinds else 0, key="trace_kind")
+    traces = tracing.get_traces(kind)
+    durations = [t["duration_ms"] for t in traces]
+
+    m1, m2, m3, m4 = st.columns(4)
+    m1.metric("Traces", len(traces))
+    m2.metric("p50", f"{tracing.percentile(durations, 50):.0f} ms")
+    m3.metric("p90", f"{tracing.percentile(durations, 90):.0f} ms")
+    m4.metric("p99", f"{tracing.percentile(durations, 99):.0f} ms")
+    st.caption(f"Last {len(traces)} of at most {config.TRACE_BUFFER_SIZE} kept in memory"
+               + (f"; all traces are appended to {config.TRACE_FILE_PATH}" if config.TRACE_FILE_PATH else ""))
+
+    # 1. WHERE THE TIME GOES
+    stages = pd.DataFrame(tracing.stage_stats(traces))
+    if not stages.empty:
+        st.markdown("### Per-Stage Breakdown")
+        st.caption("Times include nested stages (rag.retrieve contains embed.query and faiss.search).")
+        st.bar_chart(stages.set_index("stage")["total_ms"], color="#1B4D3E")
+        st.dataframe(stages, hide_index=True, use_container_width=True)
+
+    # 2. LATENCY DISTRIBUTION
+    st.markdown("### Duration Histogram")
+    bins = pd.cut(pd.Series(durations), bins=min(20, max(1, len(set(durations)))))
+    histogram = bins.value_counts(sort=False)
+    histogram.index = [f"{interval.right:.0f}" for interval in histogram.index]
+    st.bar_chart(histogram, x_label="ms (bin upper edge)", y_label="traces", color="#FF9800")
+
+    # 3. SLOWEST TRACES
+    st.markdown("### Slowest")
+    slow = tracing.slowest(traces, n=20)
+    st.dataframe(pd.DataFrame([{
+        "id": t["id"], "name": t["name"], "at": pd.to_datetime(t["started_at"], unit="s"),
+        "duration_ms": t["duration_ms"], "top_stage": tracing.top_stage(t), "spans": len(t["spans"]),
+        "attrs": ", ".join(f"{k}={v}" for k, v in t["attrs"].items()),
+    } for t in slow]), hide_index=True, use_container_width=True)
+
+    trace_id = st.selectbox("Inspect trace", [t["id"] for t in slow], key="trace_detail")
+    trace = next(t for t in slow if t["id"] == trace_id)
+    depth = {}
+    lines = []
+    for i, span in enumerate(trace["spans"]):
+        depth[i] = depth[span["parent"]] + 1 if span["parent"] is not None else 0
+        attrs = " ".join(f"{k}={v}" for k, v in span.get("attrs", {}).items())
+        error = f"  !! {span['error']}" if "error" in span else ""
+        lines.append(f"{'  ' * depth[i]}{span['name']:<{32 - 2 * depth[i]}} +{span['start_ms']:>9.1f} ms {span['duration_ms']:>9.1f} ms  {attrs}{error}")
+    st.code("\n".join(lines), language=None)
+
 if __name__ == "__main__":
     st.set_page_config(layout="wide")
     show_admin_panel()
\ No newline at end of file
@@ -0,0 +1,239 @@
+import io
+import os
+import sys
+import json
+import uuid
+import contextlib
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import config.config as config
+
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Route
+
+import booking_flow as booking
+import history
+import intent_router as router
+import rag_pipeline as rag
+import session_store
+import tools
+import transcripts
+import warmup
+
+# --- HEADLESS HTTP/JSON API ---
+# The same chat, booking, availability and invoice functions as app/main.py,
+# without Streamlit. Conversations live in session_store (SESSION_BACKEND), keyed
+# by session_id, so any worker process can serve any turn. Handlers are blocking
+# (LLM, DB, PDF), so they run in the threadpool with the session bound to
+# booking_flow for the duration of the call.
+#
+#   uvicorn api:app --app-dir app --port 8000 --workers 4     (SESSION_BACKEND=sqlite for >1 worker)
+#   python app/api.py
+
+def _json(payload, status_code=200):
+    # default=str: DB rows carry dates/decimals
+    return Response(json.dumps(payload, default=str, ensure_ascii=False), status_code=status_code, media_type="application/json")
+
+def _error(message, status_code):
+    return _json({"error": message}, status_code)
+
+async def _body(request):
+    try:
+        return await request.json()
+    except ValueError:
+        return None
+
+def _records(df):
+    return [] if df is None else df.to_dict(orient="records")
+
+# --- SESSIONS ---
+class UnknownSession(Exception):
+    """No stored session with this ID."""
+
+class WrongStep(Exception):
+    """The request doesn't apply to the session's current booking step."""
+
+def _load_session(session_id):
+    """Returns (state, version). Version 0 means a new session."""
+    version, blob = session_store.get_session_store().load(session_id)
+    state = session_store.SessionState(session_store.deserialize_state(blob) if blob is not None else {})
+    state.setdefault("messages", [])
+    state.update(_session_version=version, _session_base=blob)
+    return state, version
+
+def _save_session(session_id, state):
+    """Saves the turn; a concurrent request's save is merged in, not overwritten (session_store.save_merged)."""
+    session_store.save_merged(session_id, state)
+
+def _session_view(session_id, state, reply=None):
+    """What a client needs to render the turn: reply, flow step, and table rows to pick from."""
+    step = state.get("booking_step", "IDLE")
+    options = _records(state.get("selection_df")) if step in ("WAITING_FOR_SELECTION", "WAITING_FOR_UPDATE_SELECTION") else []
+    return {"session_id": session_id, "reply": reply, "step": step, "options": options}
+
+def _run_turn(session_id, turn, create=False):
+    """Loads the session, runs turn(state) -> reply with the state bound, saves. Runs in the threadpool."""
+    state, version = _load_session(session_id)
+    if version == 0 and not create:
+        raise UnknownSession(session_id)
+    with booking.bound_session(state), transcripts.session(session_id):
+        booking.init_booking_state()
+        reply = turn(state)
+    history.compact(state)
+    _save_session(session_id, state)
+    return _session_view(session_id, state, reply)
+
+async def _turn(session_id, turn, create=False):
+    try:
+        return _json(await run_in_threadpool(_run_turn, session_id, turn, create))
+    except UnknownSession:
+        return _error("Unknown session.", 404)
+    except WrongStep as e:
+        return _error(str(e), 409)
+    except session_store.VersionConflict:
+        return _error("Another request updated this session; retry.", 409)
+
+# --- ENDPOINTS ---
+async def health(request):
+    return _json({"status": "ok", "warmup": warmup.get_status()})
+
+async def create_session(request):
+    session_id = uuid.uuid4().hex
+    return await _turn(session_id, lambda state: None, create=True)
+
+async def get_session(request):
+    session_id = request.path_params["session_id"]
+    state, version = await run_in_threadpool(_load_session, session_id)
+    if version == 0:
+        return _error("Unknown session.", 404)
+    return _json({**_session_view(session_id, state), "summary": state.get("history_summary", ""),
+                  "messages": state.get("history_pending", []) + state["messages"]})
+
+async def chat(request):
+    """POST {"message": "..."} -> routed exactly like a chat message in the UI."""
+    body = await _body(request)
+    if not body or not str(body.get("message", "")).strip():
+        return _error("Body must be JSON with a non-empty 'message'.", 400)
+    message = str(body["message"]).strip()
+
+    def turn(state):
+        state.messages.append({"role": "user", "content": message})
+        reply = router.dispatch(message, history.context(state))
+        state.messages.append({"role": "assistant", "content": reply})
+        return reply
+    return await _turn(request.path_params["session_id"], turn)
+
+async def select(request):
+    """POST {"index": n} -> picks row n of the options table (package or new date)."""
+    body = await _body(request)
+    if not body or not isinstance(body.get("index"), int):
+        return _error("Body must be JSON with an integer 'index'.", 400)
+
+    def turn(state):
+        step = state.get("booking_step")
+        rows = _records(state.get("selection_df"))
+        if step not in ("WAITING_FOR_SELECTION", "WAITING_FOR_UPDATE_SELECTION") or not rows:
+            raise WrongStep("Nothing to select in this step.")
+        if not 0 <= body["index"] < len(rows):
+            raise WrongStep(f"index must be between 0 and {len(rows) - 1}.")
+        row = rows[body["index"]]
+        if step == "WAITING_FOR_SELECTION":
+            state.messages.append({"role": "user", "content": f"I select {row['Package']} on {row['Date']}"})
+            reply = booking.select_package(row, history.context(state))
+        else:
+            state.messages.append({"role": "user", "content": f"I select date: {row['Date']}"})
+            reply = booking.select_update_date(row, history.context(state))
+        state.messages.append({"role": "assistant", "content": reply})
+        return reply
+    return await _turn(request.path_params["session_id"], turn)
+
+async def _read_pdf(request):
+    data = await request.body()
+    if not data:
+        return None, _error("Send the PDF as the request body (Content-Type: application/pdf).", 400)
+    if len(data) > config.PDF_MAX_BYTES:
+        return None, _error(f"PDF is larger than {config.PDF_MAX_BYTES // (1024 * 1024)} MB.", 413)
+    upload = io.BytesIO(data)
+    upload.name = request.query_params.get("filename", "invoice.pdf")
+    return upload, None
+
+async def verify_invoice(request):
+    """POST <pdf bytes> -> {"valid", "booking", "message"} (no session)."""
+    upload, error = await _read_pdf(request)
+    if error: return error
+    is_valid, b_data, msg = await run_in_threadpool(tools.verify_booking_from_pdf, upload)
+    return _json({"valid": is_valid, "booking": b_data, "message": msg.strip()})
+
+async def session_invoice(request):
+    """POST <pdf bytes> while the session waits for an invoice (update/cancel flows)."""
+    upload, error = await _read_pdf(request)
+    if error: return error
+    is_valid, b_data, msg = await run_in_threadpool(tools.verify_booking_from_pdf, upload)
+    if not is_valid:
+        return _json({"valid": False, "message": msg.strip()}, 422)
+
+    def turn(state):
+        if state.get("booking_step") != "WAITING_FOR_INVOICE":
+            raise WrongStep("This session is not waiting for an invoice.")
+        reply = booking.invoice_verified(b_data, history.context(state))
+        state.messages.append({"role": "assistant", "content": reply})
+        return reply
+    return await _turn(request.path_params["session_id"], turn)
+
+async def availability(request):
+    """GET ?location=coorg[&module=module_a] -> open slots, same rows as the UI table."""
+    location = booking.match_location(request.query_params.get("location"))
+    if not location:
+        return _error(f"Unknown location. Valid: {', '.join(booking.DESTINATIONS)}", 404)
+    module = request.query_params.get("module")
+    df = await run_in_threadpool(tools.get_availability_df, location, module)
+    if df is None:
+        return _error("Availability lookup failed.", 503)
+    return _json({"location": location, "slots": _records(df)})
+
+async def answer(request):
+    """POST {"question": "...", "history": [...]} -> knowledge-base answer (query_rag)."""
+    body = await _body(request)
+    if not body or not str(body.get("question", "")).strip():
+        return _error("Body must be JSON with a non-empty 'question'.", 400)
+    text = await run_in_threadpool(rag.query_rag, body["question"], body.get("history") or [])
+    return _json({"answer": text})
+
+async def answer_stream(request):
+    """Same as /v1/answer, streamed as server-sent events: data: {"delta": "..."} ... data: [DONE]"""
+    body = await _body(request)
+    if not body or not str(body.get("question", "")).strip():
+        return _error("Body must be JSON with a non-empty 'question'.", 400)
+
+    def events():
+        # Sync generator: Starlette iterates it in the threadpool, so the event loop never blocks
+        for delta in rag.stream_rag(body["question"], body.get("history") or []):
+            yield f"data: {json.dumps({'delta': delta}, ensure_ascii=False)}\n\n"
+        yield "data: [DONE]\n\n"
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    warmup.start()
+    yield
+
+routes = [
+    Route("/v1/health", health, methods=["GET"]),
+    Route("/v1/sessions", create_session, methods=["POST"]),
+    Route("/v1/sessions/{session_id}", get_session, methods=["GET"]),
+    Route("/v1/sessions/{session_id}/messages", chat, methods=["POST"]),
+    Route("/v1/sessions/{session_id}/select", select, methods=["POST"]),
+    Route("/v1/sessions/{session_id}/invoice", session_invoice, methods=["POST"]),
+    Route("/v1/availability", availability, methods=["GET"]),
+    Route("/v1/invoices/verify", verify_invoice, methods=["POST"]),
+    Route("/v1/answer", answer, methods=["POST"]),
+    Route("/v1/answer/stream", answer_stream, methods=["POST"]),
+]
+
+app = Starlette(routes=routes, lifespan=lifespan)
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host=config.API_HOST, port=config.API_PORT)
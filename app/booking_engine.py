@@ -0,0 +1,662 @@
+import os
+import re
+import json
+
+from catalog_index import CatalogIndex
+
+# --- PURE BOOKING ENGINE ---
+# The booking conversation as data: transition(state, event) -> (state, reply, commands).
+# No Streamlit, no LLM, no DB. Anything that touches the outside world is returned
+# as a command; the caller executes it and feeds the result back as an event
+# (run() does that loop). booking_flow.py adapts this to st.session_state and the
+# real tools; the simulator at the bottom drives it with canned results.
+#
+# state:    {"step": "IDLE", "data": {...booking_data...}, "options": [table rows]}
+# events:   {"type": "message", "text", "history", "intent"}   a chat message
+#           {"type": "select", "row"}                          a table row was picked
+#           {"type": "invoice_verified", "booking"}            an uploaded invoice checked out
+#           plus the result events listed under COMMANDS
+# commands: {"type": <command>, ...args}; results come back with the command under "command"
+
+# --- CATALOG ---
+def load_logistics():
+    try:
+        base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        json_path = os.path.join(base_dir, "app", "data", "logistics.json")
+        with open(json_path, "r") as f:
+            data = json.load(f)
+        return data["destinations"]
+    except Exception as e:
+        print(f"Error loading JSON: {e}")
+        return {}
+
+DESTINATIONS = load_logistics()
+# Fuzzy lookup of destination and module names, aliases included (app/catalog_index.py)
+CATALOG = CatalogIndex(DESTINATIONS)
+
+# --- COMMANDS (type -> result event type; None = fire and forget) ---
+COMMANDS = {
+    "extract_details": "extracted",         # text, hint             -> fields
+    "get_availability": "availability",     # location, module_key   -> rows (None on error)
+    "check_availability": "capacity",       # location, module_key, date, guests -> ok, message
+    "create_booking": "booking_created",    # booking fields         -> booking_id (None on error)
+    "send_booking_email": "email_sent",     # email, name, booking_id, details   -> ok
+    "send_cancellation_email": "email_sent",  # email, name, booking_id          -> ok
+    "update_booking": "booking_updated",    # booking_id, date, guests, total, old_date -> ok
+    "delete_booking": None,                 # booking_id
+    "send_update_email": None,              # email, name, booking_id, old_details, new_details
+}
+
+# --- STATE ---
+def empty_data():
+    return {
+        "location": None, "module_key": None, "module_name": None,
+        "date": None, "nights": 1, "guests": None,
+        "total_cost": 0, "itinerary": "", "policy": "", "food": "",
+        "name": None, "email": None, "phone": None
+    }
+
+def new_state():
+    return {"step": "IDLE", "data": empty_data(), "options": []}
+
+def _copy(state):
+    # data is the only thing handlers mutate; options are replaced, never edited
+    return {**state, "data": dict(state["data"]), "options": state.get("options") or []}
+
+def _reset(state):
+    state["step"] = "IDLE"
+    state["data"] = {k: None for k in state["data"]}
+    state["options"] = []
+    return state
+
+def _cmd(kind, **args):
+    return {"type": kind, **args}
+
+def _is_open(row):
+    return (row.get("Status") or "").strip() != "Sold out"
+
+def _open_rows(rows):
+    """Availability rows a user may pick: sold-out slots are never offered."""
+    return [r for r in rows or [] if _is_open(r)]
+
+def _wants_out(text):
+    """'no' / 'cancel' / 'start over' mid-flow: leave the booking instead of re-asking."""
+    text = text.lower()
+    return bool(set(re.findall(r"[a-z]+", text)) & {"no", "cancel", "stop", "quit", "nevermind"}) \
+        or "start over" in text or "never mind" in text
+
+# --- MATCHERS (pure helpers over the catalog) ---
+def scan_history_for_intent(chat_history):
+    """Destination (and module, if that's what was named) from the most recent message that mentions one."""
+    if not chat_history: return {}
+    for msg in reversed(chat_history):
+        loc = CATALOG.find_location(msg["content"], partial=False)
+        if loc:
+            return {"location": loc}
+        found = CATALOG.find_any_module(msg["content"])
+        if found:
+            loc, mod_key = found
+            return {"location": loc, "service_type": DESTINATIONS[loc]["modules"][mod_key]["name"]}
+    return {}
+
+def match_location(user_input_loc):
+    if not user_input_loc: return None
+    return CATALOG.find_location(user_input_loc)
+
+def match_module(loc_key, user_text):
+    """Finds best matching module from text."""
+    if not user_text: return None
+    user_text = user_text.lower()
+    modules = DESTINATIONS[loc_key]["modules"]
+
+    # 1. Check for "Package"
+    if any(w in user_text for w in ["3 day", "3-day", "package", "full trip", "plan", "all"]):
+        if "module_combo" in modules:
+            return "module_combo"
+
+    # 2. Check for specific module names, aliases and keys (typos allowed)
+    found = CATALOG.find_module(loc_key, user_text)
+    if found:
+        return found
+
+    # 3. Check for generic types (Glamping, Trek)
+    if "glamp" in user_text:
+        for m_key, m_val in modules.items():
+            if "glamp" in m_val["type"].lower(): return m_key
+
+    return None
+
+def detect_keyword_intent(user_text):
+    user_lower = user_text.lower()
+    if "update" in user_lower or "change" in user_lower: return "update"
+    if "cancel" in user_lower: return "cancel"
+    if any(w in user_lower for w in ["book", "reserve"]): return "book"
+    return None
+
+# --- 1. START (IDLE) ---
+def _idle_message(state, event):
+    intent = event.get("intent") or detect_keyword_intent(event["text"])
+
+    if intent == "update":
+        state["data"]["intent"] = "update"
+        state["step"] = "WAITING_FOR_INVOICE"
+        return state, "To update your booking, I first need to verify it. \n\nPlease upload your Booking PDF (Invoice) in the sidebar.", []
+
+    if intent == "cancel":
+        state["data"]["intent"] = "cancel"
+        state["step"] = "WAITING_FOR_INVOICE"
+        return state, "To cancel, I need to verify your booking. \n\nPlease upload your Booking PDF in the sidebar.", []
+
+    if intent == "book":
+        # History is scanned now so the extraction result doesn't need to carry it
+        context = scan_history_for_intent(event.get("history"))
+        return state, None, [_cmd("extract_details", text=event["text"], hint="Booking Intent", context=context)]
+
+    return state, None, []
+
+def _idle_extracted(state, event):
+    data = state["data"]
+    explicit = event["fields"]
+    if explicit.get("location"): data.update(explicit)
+    if not data.get("location"):
+        context = event["command"]["context"]
+        if context.get("location"): data.update(context)
+
+    found_key = match_location(data["location"])
+    if not found_key:
+        return state, None, []  # no destination: the router falls back to the knowledge base
+    data["location"] = found_key
+
+    user_text_combined = event["command"]["text"] + " " + (data.get("service_type") or "")
+    found_mod = match_module(found_key, user_text_combined)
+    if found_mod:
+        data["module_key"] = found_mod
+    return state, None, [_cmd("get_availability", location=found_key, module_key=found_mod)]
+
+def _idle_availability(state, event):
+    found_key = event["command"]["location"]
+    found_mod = event["command"]["module_key"]
+    rows = _open_rows(event["rows"])
+    if event["rows"] and not rows:
+        return _reset(state), f"Sorry, every slot for **{found_key.title()}** is sold out on the next dates. Where else would you like to go?", []
+    if rows:
+        state["options"] = rows
+        state["step"] = "WAITING_FOR_SELECTION"
+        if found_mod:
+            mod_name = DESTINATIONS[found_key]["modules"][found_mod]["name"]
+            return state, f"Here are the available slots for **{mod_name}** in {found_key.title()}: \n\n **Click a row to confirm:**", []
+        return state, f"I found several options for **{found_key.title()}**. \n\n **Please select a package from the table:**", []
+
+    # Fallback
+    state["step"] = "CHECK_DATE"
+    return state, f"When do you want to visit {found_key.title()}?", []
+
+# --- 2. VERIFY INVOICE (update / cancel) ---
+def _invoice_verified(state, event):
+    b_data = event["booking"]
+    state["data"]["verified_booking"] = b_data
+    intent = state["data"].get("intent") or "cancel"
+
+    # Common Verification Message
+    msg = (
+        f"✅ **Verification Successful!**\n\n"
+        f"Found Booking #{b_data['id']}\n"
+        f"👤 Name: {b_data['name']}\n"
+        f"📅 Date: {b_data['booking_date']}\n"
+        f"⛺ Type: {b_data['service_type']}\n\n"
+    )
+
+    if intent == "update":
+        state["step"] = "ASK_UPDATE_DETAILS"
+        return state, msg + "What would you like to change? (e.g., 'Change date to 2025-12-25' or 'Change guests to 4')", []
+
+    state["step"] = "CONFIRM_CANCEL"
+    return state, msg + "Based on our policy, you are eligible for cancellation.\n**Are you sure you want to cancel this trip? (Yes/No)**", []
+
+def _waiting_for_invoice_message(state, event):
+    return state, "Please upload the PDF in the sidebar to continue.", []
+
+def _confirm_cancel_message(state, event):
+    text = event["text"].lower()
+    if "yes" in text:
+        b_data = state["data"]["verified_booking"]
+        # Email first; the booking is only removed once it went out
+        return state, None, [_cmd("send_cancellation_email", email=b_data["email"], name=b_data["name"], booking_id=b_data["id"])]
+    if "no" in text:
+        return _reset(state), "Cancellation aborted. Your booking remains active.", []
+    return state, "Type **YES** to confirm cancellation.", []
+
+def _confirm_cancel_email_sent(state, event):
+    if not event["ok"]:
+        return state, " **Error.** Could not send cancellation email. Database NOT updated. Please try again.", []
+    booking_id = event["command"]["booking_id"]
+    return _reset(state), f" **Cancelled.** Booking #{booking_id} has been removed. A confirmation email has been sent.", [
+        _cmd("delete_booking", booking_id=booking_id)
+    ]
+
+# --- 3. PICK A SLOT ---
+def _selection_select(state, event):
+    row = event["row"]
+    if not _is_open(row):
+        return state, f"Sorry, **{row['Package']}** is sold out on {row['Date']}. Please pick another row.", []
+    data = state["data"]
+    data["module_key"] = row["module_key"]
+    data["date"] = row["raw_date"]
+    state["options"] = []
+
+    loc_data = DESTINATIONS[data["location"]]
+    mod_data = loc_data["modules"][data["module_key"]]
+    data["module_name"] = mod_data["name"]
+    data["itinerary"] = mod_data.get("itinerary", "")
+    data["policy"] = loc_data.get("policy_summary", "")
+    data["food"] = loc_data.get("food_summary", "")
+
+    name_lower = mod_data["name"].lower()
+    if "3-day" in name_lower:
+        data["nights"] = 2
+    elif "day trip" in mod_data.get("itinerary", "").lower() or "hike" in name_lower:
+        data["nights"] = 0
+    else:
+        data["nights"] = 1
+
+    state["step"] = "VERIFY_SELECTION"
+    return state, f"You selected **{mod_data['name']}** on **{data['date']}**. \n\nIs this correct?", []
+
+def _selection_message(state, event):
+    return state, "Please select a row from the table and click Confirm.", []
+
+def _verify_selection_message(state, event):
+    text = event["text"].lower()
+    if "yes" in text or "correct" in text:
+        state["step"] = "CHECK_GUESTS"
+        return state, "Great! **How many guests** are joining?", []
+    state["step"] = "IDLE"
+    return state, "No problem. Let's start over. Where do you want to go?", []
+
+# --- 4. GUESTS ---
+def _guests_reply(state, guests):
+    if not guests:
+        return state, "Please enter a number (e.g., 2).", []
+    if guests < 1:
+        return state, "Please enter at least 1 guest.", []
+    data = state["data"]
+    return state, None, [_cmd("check_availability", location=data["location"], module_key=data["module_key"], date=data["date"], guests=guests)]
+
+def _check_guests_message(state, event):
+    digits = re.findall(r'\d+', event["text"])
+    if digits and int(digits[0]):
+        return _guests_reply(state, int(digits[0]))
+    # "book wayanad instead" starts over with the new request; "no" / "cancel" just starts over
+    if detect_keyword_intent(event["text"]) == "book":
+        return _idle_message(_reset(state), event)
+    if _wants_out(event["text"]):
+        return _reset(state), "No problem. Let's start over. Where do you want to go?", []
+    return state, None, [_cmd("extract_details", text=event["text"], hint="Guests")]
+
+def _check_guests_extracted(state, event):
+    guests = event["fields"].get("guests")
+    return _guests_reply(state, int(guests) if guests else None)
+
+def _check_guests_capacity(state, event):
+    if not event["ok"]:
+        # Fresh table: tells "fewer slots than asked" (stay) from "sold out" (pick again)
+        return state, None, [_cmd("get_availability", location=state["data"]["location"], module_key=None, reason=event["message"])]
+    state["data"]["guests"] = event["command"]["guests"]
+    state["step"] = "GET_DETAILS"
+    return state, "Perfect! Slots reserved. Now, what is your **Full Name**?", []
+
+def _check_guests_availability(state, event):
+    data = state["data"]
+    reason = event["command"]["reason"]
+    picked = next((r for r in event["rows"] or [] if r["module_key"] == data["module_key"] and r["raw_date"] == data["date"]), None)
+    if event["rows"] is None or (picked and _is_open(picked)):
+        return state, f"Error: {reason} \n\nEnter fewer guests, or say **'cancel'** to start over.", []
+    rows = _open_rows(event["rows"])
+    if not rows:
+        return _reset(state), f"{reason} Every other slot at **{data['location'].title()}** is sold out too. Where else would you like to go?", []
+    state["options"] = rows
+    state["step"] = "WAITING_FOR_SELECTION"
+    return state, f"{reason} \n\n **Please pick another slot from the table:**", []
+
+# --- 5. DETAILS ---
+EMAIL_PATTERN = r"^[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+$"
+
+def _get_details_message(state, event):
+    data = state["data"]
+    user_input = event["text"]
+
+    # A. Validate & Collect Name
+    if not data["name"]:
+        if len(user_input) < 2 or user_input.isdigit():
+            return state, "Please enter a valid **Full Name**.", []
+        data["name"] = user_input.title()
+        return state, "Thanks! What is your **Email ID**?", []
+
+    # B. Validate & Collect Email
+    if not data["email"]:
+        if not re.match(EMAIL_PATTERN, user_input):
+            return state, " That doesn't look like a valid email. Please try again (e.g., name@example.com).", []
+        data["email"] = user_input.lower()
+        return state, "And your **Phone Number**?", []
+
+    # C. Validate & Collect Phone
+    if not data["phone"]:
+        digits = re.sub(r"\D", "", user_input)
+        if len(digits) != 10:
+            return state, f" Invalid number. Please enter exactly **10 digits** (You entered {len(digits)}).", []
+        data["phone"] = digits
+
+    price = DESTINATIONS[data["location"]]["modules"][data["module_key"]]["price"]
+    total = price * data["guests"] * data["nights"]
+    data["total_cost"] = total
+
+    state["step"] = "CONFIRM"
+    return state, (
+        f"**Please Confirm Final Details:**\n"
+        f"📍 {data['location'].title()} | 📅 {data['date']}\n"
+        f"⛺ {data['module_name']}\n"
+        f"👥 {data['guests']} Guests | 💰 **Total: ₹{total}**\n\n"
+        f"👤 {data['name']} | 📞 {data['phone']}\n"
+        f"📧 {data['email']}\n\n"
+        f"Type **YES** to generate ticket."
+    ), []
+
+# --- 6. CONFIRM ---
+def _confirm_message(state, event):
+    if "yes" in event["text"].lower():
+        data = state["data"]
+        return state, None, [_cmd(
+            "create_booking", name=data["name"], email=data["email"], phone=data["phone"],
+            location=data["location"], module=data["module_name"], start_date=data["date"],
+            nights=data["nights"], guests=data["guests"], total_cost=data["total_cost"],
+        )]
+    return _reset(state), "Booking Cancelled.", []
+
+def _confirm_booking_created(state, event):
+    booking_id = event["booking_id"]
+    if not booking_id:
+        return state, "❌ Database Error. Please try again.", []
+    data = state["data"]
+    return state, None, [_cmd("send_booking_email", email=data["email"], name=data["name"], booking_id=booking_id, details=dict(data))]
+
+def _confirm_email_sent(state, event):
+    booking_id = event["command"]["booking_id"]
+    if event["ok"]:
+        return _reset(state), f"✅ **Success!** Booking ID: #{booking_id}. Check your email!", []
+    return state, "❌ Failed. Email could not be sent. Booking cancelled.", [_cmd("delete_booking", booking_id=booking_id)]
+
+# --- 7. UPDATE ---
+DONE_WORDS = ["no", "done", "update", "confirm", "proceed", "yes"]
+
+def _update_summary(state):
+    data = state["data"]
+    b_data = data["verified_booking"]
+    new_date = data.get("new_date") or b_data["booking_date"]
+    new_guests = data.get("new_guests") or b_data["guest_count"]
+
+    try:
+        old_total = float(b_data.get("total_cost", 0))
+        old_guests = int(b_data.get("guest_count", 1))
+        cost_per_person = old_total / old_guests if old_guests > 0 else 0
+        new_total = cost_per_person * new_guests
+        diff = new_total - old_total
+        data["new_total"] = new_total
+
+        if diff > 0:
+            price_msg = f"💰 **Price Update:** ₹{old_total:,.0f} ➝ **₹{new_total:,.0f}** (Extra to Pay: ₹{diff:,.0f})"
+        elif diff < 0:
+            price_msg = f"💰 **Price Update:** ₹{old_total:,.0f} ➝ **₹{new_total:,.0f}** (Refund: ₹{abs(diff):,.0f})"
+        else:
+            price_msg = f"💰 **Price:** No Change (₹{new_total:,.0f})"
+    except:
+        price_msg = "💰 **Price:** Could not calculate automatically."
+        data["new_total"] = b_data.get("total_cost", 0)
+
+    state["step"] = "CONFIRM_UPDATE"
+    return state, (
+        f"**🔒 Final Confirmation:**\n\n"
+        f"Updating Booking **#{b_data['id']}**\n"
+        f"📅 Date: {b_data['booking_date']} ➝ **{new_date}**\n"
+        f"👥 Guests: {b_data['guest_count']} ➝ **{new_guests}**\n"
+        f"{price_msg}\n\n"
+        f"Type **'CONFIRM'** to update."
+    ), []
+
+def _ask_update_message(state, event):
+    # A. Check if user is DONE
+    if any(w in event["text"].lower() for w in DONE_WORDS):
+        return _update_summary(state)
+    # B. Smart Extraction
+    return state, None, [_cmd("extract_details", text=event["text"], hint="Update Request")]
+
+def _ask_update_extracted(state, event):
+    data = state["data"]
+    ex = event["fields"]
+    user_input = event["command"]["text"]
+    updates_found = False
+
+    if ex.get("date"):
+        data["new_date"] = ex["date"]
+        updates_found = True
+
+    digits = re.findall(r'\d+', user_input)
+    if digits and not ex.get("date"):
+        data["new_guests"] = int(digits[0])
+        updates_found = True
+    elif ex.get("guests"):
+        data["new_guests"] = int(ex["guests"])
+        updates_found = True
+
+    if updates_found:
+        curr_date = data.get("new_date") or "Unchanged"
+        curr_guests = data.get("new_guests") or "Unchanged"
+        return state, f"Got it. New Draft: **{curr_date}** with **{curr_guests} guests**. \n\nAny other changes, or type 'Done'?", []
+
+    user_lower = user_input.lower()
+    if "date" in user_lower or "available" in user_lower or "reschedule" in user_lower:
+        loc_name = data["verified_booking"]["service_type"].split("|")[0].strip()
+        return state, None, [_cmd("get_availability", location=loc_name, module_key=None)]
+    return state, "I didn't catch a change. Please say 'Change guests to 5' or ask 'Show available dates'.", []
+
+def _ask_update_availability(state, event):
+    rows = _open_rows(event["rows"])
+    if rows:
+        state["options"] = rows
+        state["step"] = "WAITING_FOR_UPDATE_SELECTION"
+        return state, "Sure! Here are the available dates. \n\n **Please select a new date from the table:**", []
+    if event["rows"]:
+        return state, "Sorry, every upcoming date is sold out. You can still change the guest count, or type 'Done'.", []
+    return state, "I didn't catch a change. Please say 'Change guests to 5' or ask 'Show available dates'.", []
+
+def _update_selection_select(state, event):
+    state["data"]["new_date"] = event["row"]["raw_date"]
+    state["options"] = []
+    state["step"] = "ASK_UPDATE_DETAILS"
+    return state, f"Selected new date: **{state['data']['new_date']}**. \n\nAny other changes? (Type 'Done' to finish).", []
+
+def _update_selection_message(state, event):
+    return state, "Please click a row in the table to select your new date.", []
+
+def _confirm_update_message(state, event):
+    text = event["text"].lower()
+    if "confirm" in text or "yes" in text:
+        data = state["data"]
+        b_data = data["verified_booking"]
+        return state, None, [_cmd(
+            "update_booking", booking_id=b_data["id"],
+            date=data.get("new_date") or b_data["booking_date"],
+            guests=data.get("new_guests") or b_data["guest_count"],
+            total=data.get("new_total") or b_data["total_cost"],
+            old_date=b_data["booking_date"],
+        )]
+    return _reset(state), "Update Cancelled. Keeping original details.", []
+
+def _confirm_update_updated(state, event):
+    if not event["ok"]:
+        return state, "❌ Database Error. Update failed.", []
+    cmd = event["command"]
+    b_data = state["data"]["verified_booking"]
+    email = _cmd(
+        "send_update_email", email=b_data["email"], name=b_data["name"], booking_id=b_data["id"],
+        old_details={"date": b_data["booking_date"], "guests": b_data["guest_count"]},
+        new_details={"date": cmd["date"], "guests": cmd["guests"]},
+    )
+    return _reset(state), (
+        f"✅ **Update Complete!** Booking #{b_data['id']} is now set for {cmd['date']} with {cmd['guests']} guests."
+        f"\n\n💳 **Updated Cost:** ₹{cmd['total']:,.0f}. Email sent."
+    ), [email]
+
+# --- TRANSITION TABLE: (step, event type) -> handler(state, event) ---
+TRANSITIONS = {
+    ("IDLE", "message"): _idle_message,
+    ("IDLE", "extracted"): _idle_extracted,
+    ("IDLE", "availability"): _idle_availability,
+    ("WAITING_FOR_INVOICE", "invoice_verified"): _invoice_verified,
+    ("WAITING_FOR_INVOICE", "message"): _waiting_for_invoice_message,
+    ("CONFIRM_CANCEL", "message"): _confirm_cancel_message,
+    ("CONFIRM_CANCEL", "email_sent"): _confirm_cancel_email_sent,
+    ("WAITING_FOR_SELECTION", "select"): _selection_select,
+    ("WAITING_FOR_SELECTION", "message"): _selection_message,
+    ("VERIFY_SELECTION", "message"): _verify_selection_message,
+    ("CHECK_GUESTS", "message"): _check_guests_message,
+    ("CHECK_GUESTS", "extracted"): _check_guests_extracted,
+    ("CHECK_GUESTS", "capacity"): _check_guests_capacity,
+    ("CHECK_GUESTS", "availability"): _check_guests_availability,
+    ("GET_DETAILS", "message"): _get_details_message,
+    ("CONFIRM", "message"): _confirm_message,
+    ("CONFIRM", "booking_created"): _confirm_booking_created,
+    ("CONFIRM", "email_sent"): _confirm_email_sent,
+    ("ASK_UPDATE_DETAILS", "message"): _ask_update_message,
+    ("ASK_UPDATE_DETAILS", "extracted"): _ask_update_extracted,
+    ("ASK_UPDATE_DETAILS", "availability"): _ask_update_availability,
+    ("WAITING_FOR_UPDATE_SELECTION", "select"): _update_selection_select,
+    ("WAITING_FOR_UPDATE_SELECTION", "message"): _update_selection_message,
+    ("CONFIRM_UPDATE", "message"): _confirm_update_message,
+    ("CONFIRM_UPDATE", "booking_updated"): _confirm_update_updated,
+}
+
+def transition(state, event):
+    """One pure step. Never mutates `state`; unknown (step, event) pairs are a no-op with no reply."""
+    handler = TRANSITIONS.get((state["step"], event["type"]))
+    if handler is None:
+        return state, None, []
+    return handler(_copy(state), event)
+
+def run(state, event, execute):
+    """
+    Applies `event`, executing commands with execute(command) -> raw result dict (or None),
+    and feeding results back until the turn settles. Returns (state, reply).
+    """
+    reply = None
+    queue = [event]
+    while queue:
+        state, step_reply, commands = transition(state, queue.pop(0))
+        if step_reply is not None:
+            reply = step_reply
+        for command in commands:
+            result = execute(command)
+            result_type = COMMANDS[command["type"]]
+            if result_type is not None:
+                queue.append({**(result or {}), "type": result_type, "command": command})
+    return state, reply
+
+# --- SIMULATOR (regression + throughput, no I/O) ---
+def simulated_executor(log=None, fail=()):
+    """Canned results for every command. `fail` lists command types that should fail (a failed capacity check sells the slot out)."""
+    sold_out = set()
+    def execute(command):
+        if log is not None:
+            log.append(command["type"])
+        kind, ok = command["type"], command["type"] not in fail
+        if kind == "extract_details":
+            text = command["text"].lower()
+            loc = next((k for k in DESTINATIONS if k in text), None)
+            return {"fields": {"location": loc} if loc else {}}
+        if kind == "get_availability":
+            loc = DESTINATIONS.get(command["location"])
+            if not ok or not loc: return {"rows": None}
+            mods = [command["module_key"]] if command["module_key"] else list(loc["modules"])
+            return {"rows": [
+                {"Package": loc["modules"][m]["name"], "Date": d, "Price": f"₹{loc['modules'][m]['price']}",
+                 "Status": " Sold out" if (m, d) in sold_out else " 8 Slots", "raw_date": d, "module_key": m}
+                for m in mods for d in ("2030-01-04", "2030-01-11")
+            ]}
+        if kind == "check_availability":
+            if not ok: sold_out.add((command["module_key"], command["date"]))
+            return {"ok": ok, "message": "Available!" if ok else "Sorry, sold out!"}
+        if kind == "create_booking":
+            return {"booking_id": 4242 if ok else None}
+        return {"ok": ok}
+    return execute
+
+VERIFIED_BOOKING = {
+    "id": 4242, "name": "Sim User", "email": "sim@example.com", "booking_date": "2030-01-04 to 2030-01-05",
+    "service_type": "coorg | Kumara Parvatha Trek", "guest_count": 2, "total_cost": 7600, "status": "Confirmed",
+}
+
+def message(text, intent=None):
+    return {"type": "message", "text": text, "history": [], "intent": intent}
+
+# (name, events, expected final step, text the final reply must contain, failing commands)
+SCRIPTS = [
+    ("book", [message("book a trip to coorg"), {"type": "select", "row": 0}, message("yes"), message("2"),
+              message("Sim User"), message("sim@example.com"), message("9876543210"), message("yes")],
+     "IDLE", "Success", ()),
+    ("book, email fails", [message("book coorg"), {"type": "select", "row": 1}, message("correct"), message("3"),
+                           message("Sim User"), message("sim@example.com"), message("98765 43210"), message("yes")],
+     "CONFIRM", "Email could not be sent", ("send_booking_email",)),
+    ("book, bad inputs", [message("reserve wayanad"), message("hello?"), {"type": "select", "row": 0}, message("yes"),
+                          message("lots"), message("4"), message("x"), message("Sim User"), message("not-an-email")],
+     "GET_DETAILS", "valid email", ()),
+    ("book, sold out", [message("book kodaikanal"), {"type": "select", "row": 0}, message("yes"), message("5")],
+     "WAITING_FOR_SELECTION", "pick another slot", ("check_availability",)),
+    ("book, sold out, repick", [message("book kodaikanal"), {"type": "select", "row": 0}, message("yes"), message("5"),
+                                {"type": "select", "row": 0}, message("yes")],
+     "CHECK_GUESTS", "How many guests", ("check_availability",)),
+    ("book, leaves at guests", [message("book coorg"), {"type": "select", "row": 0}, message("yes"), message("no")],
+     "IDLE", "start over", ()),
+    ("book, switches place", [message("book coorg"), {"type": "select", "row": 0}, message("yes"),
+                              message("book wayanad instead")], "WAITING_FOR_SELECTION", "Wayanad", ()),
+    ("book, unknown place", [message("book a trip to mars")], "IDLE", None, ()),
+    ("cancel", [message("cancel my booking"), message("done?"), {"type": "invoice_verified", "booking": VERIFIED_BOOKING},
+                message("yes")], "IDLE", "Cancelled", ()),
+    ("cancel, aborted", [message("cancel"), {"type": "invoice_verified", "booking": VERIFIED_BOOKING}, message("no")],
+     "IDLE", "aborted", ()),
+    ("update", [message("change my booking"), {"type": "invoice_verified", "booking": VERIFIED_BOOKING},
+                message("make it 4 people"), message("show available dates"), {"type": "select", "row": 1},
+                message("done"), message("CONFIRM")], "IDLE", "Update Complete", ()),
+    ("update, db fails", [message("update booking"), {"type": "invoice_verified", "booking": VERIFIED_BOOKING},
+                          message("3 guests"), message("done"), message("confirm")],
+     "CONFIRM_UPDATE", "Update failed", ("update_booking",)),
+]
+
+def simulate(events, fail=(), log=None):
+    """Runs one scripted conversation. {"type": "select", "row": i} picks options[i]. Returns (state, replies)."""
+    state, replies, execute = new_state(), [], simulated_executor(log, fail)
+    for event in events:
+        if event["type"] == "select":
+            event = {"type": "select", "row": state["options"][event["row"]]}
+        state, reply = run(state, event, execute)
+        replies.append(reply)
+    return state, replies
+
+if __name__ == "__main__":
+    import time
+
+    failures = 0
+    for name, events, step, expect, fail in SCRIPTS:
+        state, replies = simulate(events, fail)
+        ok = state["step"] == step and (expect is None and replies[-1] is None or expect is not None and expect in (replies[-1] or ""))
+        failures += not ok
+        print(f"{'ok  ' if ok else 'FAIL'} {name:22s} -> {state['step']:20s} {(replies[-1] or '(no reply)')[:60]!r}")
+
+    n = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < 2:
+        for name, events, step, expect, fail in SCRIPTS:
+            simulate(events, fail)
+            n += 1
+    elapsed = time.perf_counter() - start
+    turns = sum(len(s[1]) for s in SCRIPTS) * n / len(SCRIPTS)
+    print(f"\n{n / elapsed:,.0f} conversations/s ({turns / elapsed:,.0f} turns/s) in-process")
+    raise SystemExit(1 if failures else 0)
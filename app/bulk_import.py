@@ -0,0 +1,104 @@
+import re
+import time
+from datetime import datetime
+import pandas as pd
+
+import tools as tools
+import db.database as database
+from booking_flow import DESTINATIONS
+
+REQUIRED_COLUMNS = ["name", "email", "phone", "location", "module_name", "start_date", "nights", "guests"]
+EMAIL_PATTERN = r"^[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+$"
+DEFAULT_CHUNK_SIZE = 500
+
+# --- VALIDATION ---
+def _module_price(location, module_name):
+    for mod in DESTINATIONS[location]["modules"].values():
+        if mod["name"].lower() == module_name.lower():
+            return mod["name"], mod["price"]
+    return None, None
+
+def validate_row(raw):
+    """Returns (booking_row, None) or (None, error message) for one CSV record."""
+    name = str(raw.get("name") or "").strip()
+    if len(name) < 2: return None, "missing name"
+
+    email = str(raw.get("email") or "").strip().lower()
+    if not re.match(EMAIL_PATTERN, email): return None, f"invalid email '{email}'"
+
+    phone = re.sub(r"\D", "", str(raw.get("phone") or ""))
+    if len(phone) != 10: return None, f"phone must be 10 digits (got {len(phone)})"
+
+    location = str(raw.get("location") or "").strip().lower()
+    if location not in DESTINATIONS: return None, f"unknown location '{location}'"
+
+    module_name, price = _module_price(location, str(raw.get("module_name") or "").strip())
+    if not module_name: return None, f"unknown module for {location}"
+
+    start_date = str(raw.get("start_date") or "").strip()
+    try:
+        datetime.strptime(start_date, "%Y-%m-%d")
+    except (ValueError, TypeError):
+        return None, f"start_date must be YYYY-MM-DD (got '{start_date}')"
+
+    try:
+        nights, guests = int(raw.get("nights")), int(raw.get("guests"))
+    except (ValueError, TypeError):
+        return None, "nights and guests must be whole numbers"
+    if guests < 1 or nights < 0: return None, "guests must be >= 1 and nights >= 0"
+
+    # Same pricing rule as the chat flow unless the agent supplied a total
+    total_cost = raw.get("total_cost")
+    try:
+        total_cost = float(total_cost) if total_cost not in (None, "") and not pd.isna(total_cost) else price * guests * nights
+    except (ValueError, TypeError):
+        return None, "total_cost must be a number"
+
+    end_date = tools.calculate_end_date(start_date, nights)
+    return {
+        "name": name.title(), "email": email, "phone": phone,
+        "service_type": f"{location} | {module_name}",
+        "location": location, "module_name": module_name,
+        "booking_date": f"{start_date} to {end_date}",
+        "guest_count": guests, "total_cost": total_cost,
+        "status": str(raw.get("status") or "Confirmed"),
+    }, None
+
+def validate_frame(df):
+    """Returns (valid booking rows, [{"row": csv line, "error": msg}])."""
+    missing = [c for c in REQUIRED_COLUMNS if c not in df.columns]
+    if missing:
+        return [], [{"row": None, "error": f"missing columns: {', '.join(missing)}"}]
+    df = df.astype(object).where(df.notna(), None)
+    valid, errors = [], []
+    for i, raw in enumerate(df.to_dict(orient="records")):
+        row, error = validate_row(raw)
+        if error:
+            errors.append({"row": i + 2, "error": error})  # +2: header line and 1-based numbering
+        else:
+            valid.append(row)
+    return valid, errors
+
+# --- IMPORT ---
+def import_bookings(df, repo=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Validates the frame and inserts valid rows in chunks (one request per chunk)."""
+    repo = repo or database.get_repository()
+    start = time.perf_counter()
+    valid, errors = validate_frame(df)
+    inserted = []
+    for i in range(0, len(valid), chunk_size):
+        inserted.extend(repo.bulk_create_bookings(valid[i:i + chunk_size]))
+    elapsed = time.perf_counter() - start
+    return {
+        "inserted": len(inserted), "rejected": len(errors), "errors": errors,
+        "chunks": -(-len(valid) // chunk_size), "seconds": elapsed,
+        "rows_per_sec": len(inserted) / elapsed if elapsed > 0 else 0.0,
+    }
+
+def update_status_batch(booking_ids, status, repo=None):
+    """One request for the whole selection. Returns a throughput report."""
+    repo = repo or database.get_repository()
+    start = time.perf_counter()
+    updated = repo.update_status_bulk(list(booking_ids), status)
+    elapsed = time.perf_counter() - start
+    return {"updated": updated, "seconds": elapsed, "rows_per_sec": updated / elapsed if elapsed > 0 else 0.0}
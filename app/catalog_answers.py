@@ -0,0 +1,200 @@
+import time
+
+import tracing
+from booking_engine import DESTINATIONS, CATALOG, detect_keyword_intent
+from catalog_index import normalize
+
+# --- CATALOG FAST PATH ---
+# "price of Chembra Peak Hike", "what food in Wayanad", "itinerary for 3-Day Vibe
+# Package": the answer is a field of logistics.json, so it is filled into a
+# template straight from the in-memory catalog. No rewrite, no FAISS, no LLM.
+#
+# A question qualifies when it names
+#   - an entity: a destination or module (fuzzy, via CatalogIndex), and
+#   - an attribute: price / food / policy / itinerary / capacity (trigger words),
+# and every other content word is covered by the catalog fields answered (not
+# the template wording). So "Is alcohol allowed in Coorg?" is served (the Coorg
+# policy mentions alcohol), while "Is alcohol allowed in Kodaikanal?" or "price
+# for 4 people in Coorg" go to the normal router/RAG path. Messages with a
+# booking verb ("book Chembra, price?") never take the fast path: the booking
+# flow handles them, as it did before.
+
+# attribute -> (generic triggers, topic triggers). Topics must also appear in the answer.
+ATTRIBUTES = {
+    "price": ({"price", "prices", "cost", "costs", "how much", "charge", "charges", "fee", "fees", "rate", "rates", "tariff"}, set()),
+    "food": ({"food", "meal", "meals", "menu", "eat", "cuisine"}, {"breakfast", "lunch", "dinner", "veg", "nonveg"}),
+    "policy": ({"policy", "policies", "rule", "rules"}, {"alcohol", "refund", "cancellation", "plastic", "permit", "music"}),
+    "itinerary": ({"itinerary", "schedule", "day plan", "day by day", "plan"}, set()),
+    "capacity": ({"capacity", "group size", "max group", "how many people", "how many guests"}, set()),
+}
+# Modules first where both readings exist ("Chembra price" = the module, not the destination)
+MODULE_ATTRIBUTES = {"price", "itinerary", "capacity"}
+
+STOPWORDS = set("""
+a an the of for in at to on and or with about is are was be it its this that there
+what whats which when how do does can could will would should i me my we us our you your
+tell show give list please trip tour per person allowed any all s fit take hold
+""".split())
+PACKAGE_WORDS = ("package", "3 day", "full trip", "combo")
+
+STATS = {"turns": 0, "served": 0, "total_us": 0.0, "attributes": {}}
+
+# --- TEMPLATES ---
+def price_list(loc):
+    """All module prices of a destination (also used by the router's price handler)."""
+    lines = [f"- **{m['name']}**: ₹{m['price']} per person" for m in DESTINATIONS[loc]["modules"].values()]
+    return f"Prices for **{loc.title()}**:\n" + "\n".join(lines)
+
+def _module_answer(attribute, loc, module):
+    if attribute == "price":
+        cost = "is free" if not module["price"] else f"costs ₹{module['price']:,} per person"
+        return f"**{module['name']}** ({loc.title()}) {cost}.\n\nSay **'book {loc.title()}'** to reserve a slot."
+    if attribute == "itinerary":
+        return f"**{module['name']}** ({loc.title()}) itinerary: {module['itinerary']}"
+    return f"**{module['name']}** ({loc.title()}) takes up to {module['capacity']} guests per slot."
+
+def _location_answer(attribute, loc):
+    details = DESTINATIONS[loc]
+    if attribute == "price":
+        return price_list(loc)
+    if attribute == "food":
+        return f"**Food at {loc.title()}:** {details['food_summary']}"
+    if attribute == "policy":
+        return f"**{loc.title()} policies:** {details['policy_summary']}"
+    if attribute == "itinerary":
+        lines = [f"- **{m['name']}**: {m['itinerary']}" for m in details["modules"].values()]
+        return f"Itineraries for **{loc.title()}**:\n" + "\n".join(lines)
+    lines = [f"- **{m['name']}**: up to {m['capacity']} guests" for m in details["modules"].values()]
+    return f"Group sizes for **{loc.title()}**:\n" + "\n".join(lines)
+
+def _source_text(attribute, loc, module):
+    """The catalog field values an answer is built from (what the question's other words are checked against)."""
+    details = DESTINATIONS[loc]
+    if attribute == "food":
+        return details["food_summary"]
+    if attribute == "policy":
+        return details["policy_summary"]
+    modules = [module] if module and attribute in MODULE_ATTRIBUTES else list(details["modules"].values())
+    field = {"price": "price", "itinerary": "itinerary", "capacity": "capacity"}[attribute]
+    return " ".join(f"{m['name']} {m[field]}" for m in modules)
+
+# --- MATCHING ---
+def _attribute(text):
+    """(attribute, trigger words to ignore) for the first attribute named in `text`, else None."""
+    padded = f" {text} "
+    for attribute, (generic, topics) in ATTRIBUTES.items():
+        used = [t for t in generic if f" {t} " in padded]
+        named = [t for t in topics if f" {t} " in padded]
+        if used or named:
+            # Topic words stay in the question, so lookup() checks the answer covers them
+            return attribute, {w for t in used for w in t.split()}
+    return None
+
+def _covered(word, source_words):
+    # Loose stemming: "refunds" ~ "refund", "cancel" ~ "cancellation"
+    return word in source_words or (len(word) >= 5 and any(s.startswith(word[:5]) for s in source_words))
+
+def _entity(text):
+    """(location, module key or None) named in `text`, else None."""
+    loc = CATALOG.find_location(text, partial=False)
+    if loc:
+        modules = DESTINATIONS[loc]["modules"]
+        if "module_combo" in modules and any(p in text for p in PACKAGE_WORDS):
+            return loc, "module_combo"
+        return loc, CATALOG.find_module(loc, text)
+    found = CATALOG.find_any_module(text)
+    return found if found else None
+
+def lookup(user_input):
+    """(attribute, answer) if `user_input` is a plain catalog lookup, else None."""
+    # Booking/cancel/update requests belong to the booking flow, even if they also ask a price
+    if detect_keyword_intent(user_input):
+        return None
+    text = normalize(user_input)
+    attribute = _attribute(text)
+    entity = _entity(text) if attribute else None
+    if not entity:
+        return None
+    attribute, ignored = attribute
+    loc, mod_key = entity
+    module = DESTINATIONS[loc]["modules"].get(mod_key) if mod_key else None
+    if module and attribute in MODULE_ATTRIBUTES:
+        reply = _module_answer(attribute, loc, module)
+    else:
+        reply = _location_answer(attribute, loc)
+
+    # Anything the question asks beyond entity + attribute must be in the catalog data answered
+    source_words = set(normalize(_source_text(attribute, loc, module)).split())
+    leftover = set(text.split()) - STOPWORDS - ignored - CATALOG.known_words(text)
+    if not all(_covered(w, source_words) for w in leftover):
+        return None
+    return attribute, reply
+
+def answer(user_input):
+    """Template answer from logistics.json for catalog lookups, else None (caller falls back to the router/RAG)."""
+    start = time.perf_counter()
+    with tracing.span("catalog.answer"):
+        found = lookup(user_input)
+    STATS["turns"] += 1
+    STATS["total_us"] += (time.perf_counter() - start) * 1e6
+    if not found:
+        return None
+    attribute, reply = found
+    STATS["served"] += 1
+    STATS["attributes"][attribute] = STATS["attributes"].get(attribute, 0) + 1
+    tracing.annotate(intent="catalog", attribute=attribute)
+    return reply
+
+def get_stats():
+    turns = STATS["turns"]
+    return {
+        **STATS,
+        "served_fraction": STATS["served"] / turns if turns else 0.0,
+        "avg_us": STATS["total_us"] / turns if turns else 0.0,
+    }
+
+# --- BENCHMARK ---
+SAMPLE_TRAFFIC = [
+    "price of Chembra Peak Hike", "what food in Wayanad", "itinerary for 3-Day Vibe Package",
+    "How much is the Kumara Parvatha trek?", "coorg prices", "what are the rules in wayanad?",
+    "Is alcohol allowed in Coorg?", "Is alcohol allowed in Kodaikanal?", "tadiandamol itinerary",
+    "how many people fit in cloud farm glamping", "what's the cost of 900 kandi", "kodai food menu",
+    "price for 4 people in Coorg", "What should I pack for the Coorg trek?", "Can I bring my dog?",
+    "I want to book Wayanad", "Cancel my booking", "Hi", "Which dates are available in Coorg?",
+    "Is it safe for solo female travellers?", "What is the cancellation policy?",
+    "cancellation policy for wayanad", "refund policy coorg", "wyanad glass bridge price",
+    "reserve wayanad package, what is the price", "book the Chembra Peak Hike, price?",
+]
+
+def _transcript_messages(path):
+    """User messages that reached the router (idle booking turns and RAG queries) in a transcript file."""
+    import json
+    seen, out = set(), []
+    with open(path) as f:
+        for line in f:
+            entry = json.loads(line)
+            if entry.get("kind") == "rag":
+                text = entry["query"]
+            elif entry.get("kind") == "booking" and entry["event"].get("type") == "message" and entry["before"]["step"] == "IDLE":
+                text = entry["event"]["text"]
+            else:
+                continue
+            if (entry.get("session"), text) not in seen:  # a fallback turn is recorded as both
+                seen.add((entry.get("session"), text))
+                out.append(text)
+    return out
+
+if __name__ == "__main__":
+    # python app/catalog_answers.py [transcripts.jsonl]
+    import sys
+    traffic = _transcript_messages(sys.argv[1]) if len(sys.argv) > 1 else SAMPLE_TRAFFIC
+    timings = []
+    for message in traffic:
+        start = time.perf_counter()
+        reply = answer(message)
+        timings.append((time.perf_counter() - start) * 1e6)
+        print(f"{'FAST' if reply else 'rag ':4s} {timings[-1]:7.1f} us  {message}")
+    timings.sort()
+    stats = get_stats()
+    print(f"\nserved {stats['served']}/{stats['turns']} ({stats['served_fraction']:.0%}) from the catalog; "
+          f"p50 {timings[len(timings) // 2]:.0f} us, p99 {timings[int(len(timings) * 0.99)]:.0f} us; by attribute {stats['attributes']}")
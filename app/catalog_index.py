@@ -0,0 +1,250 @@
+import re
+from bisect import bisect_left
+
+# --- CATALOG SEARCH INDEX ---
+# Fuzzy lookup of destinations and modules named in free text ("wyanad",
+# "Kodaikannal", "kumara parvata trek"). Every searchable term (destination
+# key, display name, aliases, module names, module keys) is normalized and
+# split into words.
+#
+# - Words: each distinct catalog word is indexed under every string left after
+#   deleting up to k of its letters ("symmetric delete"; k = 1 up to 8
+#   letters, 2 beyond, 0 under 5 letters). Two words within k edits always
+#   share such a string, so a query word only probes the dict with its own
+#   deletions: a fixed number of lookups, however big the catalog. A bounded
+#   edit distance then confirms each candidate.
+# - Terms: each term is filed under its rarest word. A term matches where that
+#   word matched and its other words line up around it.
+#
+# The cost grows with the length of the text, not the size of the catalog.
+#
+#   index = CatalogIndex(DESTINATIONS)
+#   index.find_location("2 people to wyanad")               -> "wayanad"
+#   index.find_module("coorg", "the tadiandamol leisure camp") -> "module b"
+#
+# `python app/catalog_index.py [sizes...]` benchmarks synthetic catalogs.
+
+def normalize(text):
+    return " ".join(re.findall(r"[a-z0-9]+", str(text).lower().replace("'", "")))
+
+def _deletions(word, k):
+    """`word` and every string obtained by deleting up to k of its letters."""
+    out, frontier = {word}, {word}
+    for _ in range(k):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))}
+        out |= frontier
+    return out
+
+def max_typos(word):
+    """Edits allowed in a word of this length (0 = exact only)."""
+    if len(word) < 5: return 0
+    return 1 if len(word) <= 8 else 2
+
+def bounded_distance(a, b, limit):
+    """Levenshtein distance of a and b, or limit + 1 as soon as it must exceed limit."""
+    if abs(len(a) - len(b)) > limit: return limit + 1
+    if a == b: return 0
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        # Only cells within `limit` of the diagonal can stay under the bound
+        lo, hi = max(1, i - limit), min(len(b), i + limit)
+        current = [limit + 1] * (len(b) + 1)
+        current[0] = i if i <= limit else limit + 1
+        for j in range(lo, hi + 1):
+            cost = 0 if ca == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+        if min(current[lo - 1:hi + 1]) > limit:
+            return limit + 1
+        previous = current
+    return min(previous[len(b)], limit + 1)
+
+class CatalogIndex:
+    """Word-level symmetric-delete + bounded-edit-distance index over the destinations/modules catalog."""
+
+    def __init__(self, destinations):
+        self.words = []          # word id -> word
+        self.word_ids = {}       # word -> word id
+        self.deletes = {}        # word with up to k letters deleted -> [word ids]
+        self.terms = []          # (text, kind, location, module_key, word ids, fuzzy)
+        self.by_anchor = {}      # word id -> [(term id, offset of that word in the term)]
+        seen = set()
+        for loc, details in destinations.items():
+            display = details.get("display_name", "")
+            for text in [loc, display, display.split("(")[0]] + list(details.get("aliases", [])):
+                self._add(seen, text, "location", loc, None)
+            for mod_key, module in details.get("modules", {}).items():
+                # Keys like "module a" / "module b" are one edit apart: never fuzzy
+                self._add(seen, mod_key, "module", loc, mod_key, fuzzy=False)
+                for text in [module["name"]] + list(module.get("aliases", [])):
+                    self._add(seen, text, "module", loc, mod_key)
+        self._file_terms()
+        self.sorted_texts = sorted((t[0], i) for i, t in enumerate(self.terms))
+
+    def _word_id(self, word):
+        word_id = self.word_ids.get(word)
+        if word_id is None:
+            word_id = self.word_ids[word] = len(self.words)
+            self.words.append(word)
+            if max_typos(word):
+                for variant in _deletions(word, max_typos(word)):
+                    self.deletes.setdefault(variant, []).append(word_id)
+        return word_id
+
+    def _add(self, seen, text, kind, location, module_key, fuzzy=True):
+        text = normalize(text)
+        if not text or (text, kind, location, module_key) in seen: return
+        seen.add((text, kind, location, module_key))
+        word_ids = tuple(self._word_id(w) for w in text.split())
+        self.terms.append((text, kind, location, module_key, word_ids, fuzzy))
+
+    def _file_terms(self):
+        # Anchor = the term's word shared by the fewest terms, so anchor lists stay short
+        usage = {}
+        for term in self.terms:
+            for word_id in set(term[4]):
+                usage[word_id] = usage.get(word_id, 0) + 1
+        for term_id, term in enumerate(self.terms):
+            offset = min(range(len(term[4])), key=lambda i: (usage[term[4][i]], -len(self.words[term[4][i]])))
+            self.by_anchor.setdefault(term[4][offset], []).append((term_id, offset))
+
+    # --- LOOKUP ---
+    def _similar_words(self, word):
+        """{word id: edits} for catalog words within the typo budget of `word`."""
+        out = {}
+        exact = self.word_ids.get(word)
+        if exact is not None:
+            out[exact] = 0
+        limit = max_typos(word)
+        if not limit: return out
+        for variant in _deletions(word, limit):
+            for word_id in self.deletes.get(variant, ()):
+                if word_id in out: continue
+                candidate = self.words[word_id]
+                budget = min(limit, max_typos(candidate))
+                distance = bounded_distance(word, candidate, budget)
+                if distance <= budget:
+                    out[word_id] = distance
+        return out
+
+    def matches(self, text, kind=None, location=None):
+        """[(edits, -length, term)] for every catalog term found in `text`, best first."""
+        words = normalize(text).split()
+        similar = {}
+        for word in set(words):
+            similar[word] = self._similar_words(word)
+
+        found = {}
+        for position, word in enumerate(words):
+            for anchor, edits in similar[word].items():
+                for term_id, offset in self.by_anchor.get(anchor, ()):
+                    text_, term_kind, term_loc, _, word_ids, fuzzy = self.terms[term_id]
+                    start = position - offset
+                    if start < 0 or start + len(word_ids) > len(words): continue
+                    if (kind and term_kind != kind) or (location and term_loc != location): continue
+                    total = 0
+                    for i, word_id in enumerate(word_ids):
+                        cost = similar[words[start + i]].get(word_id)
+                        if cost is None or (cost and not fuzzy):
+                            break
+                        total += cost
+                    else:
+                        if total < found.get(term_id, 99):
+                            found[term_id] = total
+        return sorted((edits, -len(self.terms[i][0]), self.terms[i][:4]) for i, edits in found.items())
+
+    def known_words(self, text):
+        """Words of `text` that are (or are typos of) catalog words."""
+        return {word for word in normalize(text).split() if self._similar_words(word)}
+
+    def prefix(self, text, kind=None):
+        """Terms that start with `text` (4+ letters), e.g. "kodai" -> kodaikanal."""
+        text = normalize(text)
+        if len(text) < 4: return []
+        out = []
+        position = bisect_left(self.sorted_texts, (text, -1))
+        while position < len(self.sorted_texts) and self.sorted_texts[position][0].startswith(text):
+            term = self.terms[self.sorted_texts[position][1]]
+            if kind is None or term[1] == kind:
+                out.append(term[:4])
+            position += 1
+        return out
+
+    def find_location(self, text, partial=True):
+        """Destination key named (or misspelled) in `text`, else None. partial: also accept a unique prefix ("kodai")."""
+        hits = self.matches(text, kind="location")
+        if hits:
+            return hits[0][2][2]
+        if not partial: return None
+        partial = {term[2] for term in self.prefix(text, kind="location")}
+        return partial.pop() if len(partial) == 1 else None
+
+    def find_module(self, location, text):
+        """Module key of `location` named (or misspelled) in `text`, else None."""
+        hits = self.matches(text, kind="module", location=location)
+        return hits[0][2][3] if hits else None
+
+    def find_any_module(self, text):
+        """(location, module key) for a module of any destination named in `text`, else None."""
+        # Keys ("module a") repeat across destinations, so only names and aliases count here
+        hits = [h for h in self.matches(text, kind="module") if h[2][0] != h[2][3]]
+        return (hits[0][2][2], hits[0][2][3]) if hits else None
+
+# --- BENCHMARK ---
+def synthetic_catalog(n_destinations, modules_per_destination=4, seed=7):
+    import random
+    rng = random.Random(seed)
+
+    def word(letters):
+        # Pronounceable consonant-vowel names ("Kalimora")
+        return "".join(rng.choice("bdgklmnprstvy") + rng.choice("aeiou") for _ in range(letters // 2))
+    catalog = {}
+    while len(catalog) < n_destinations:
+        key = word(rng.choice([6, 8, 10]))
+        catalog[key] = {
+            "display_name": f"{key.title()} ({word(6).title()} Hills)",
+            "modules": {f"module {chr(97 + i)}": {"name": f"{word(8).title()} {rng.choice(['Trek', 'Camp', 'Glamping', 'Hike'])}", "type": "Camping"}
+                        for i in range(modules_per_destination)},
+        }
+    return catalog
+
+def _typo(text, rng):
+    i = rng.randrange(1, len(text) - 1)
+    return text[:i] + text[i + 1:] if rng.random() < 0.5 else text[:i] + text[i] + text[i:]
+
+def _linear_find(catalog, text):
+    # The old match_location: substring checks against every key
+    text = text.lower()
+    return next((k for k in catalog if k in text or text in k), None)
+
+if __name__ == "__main__":
+    import sys
+    import time
+    import random
+    sizes = [int(s) for s in sys.argv[1:]] or [10, 100, 1000, 5000, 20000]
+    print(f"{'destinations':>12s} {'terms':>7s} {'build ms':>9s}  {'exact p50/p99 us':>17s} {'typo p50/p99 us':>16s} {'miss p50/p99 us':>16s} {'typo hit':>8s} {'linear p50 us':>13s}")
+    for size in sizes:
+        catalog = synthetic_catalog(size)
+        start = time.perf_counter()
+        index = CatalogIndex(catalog)
+        build_ms = (time.perf_counter() - start) * 1000
+        rng = random.Random(1)
+        keys = rng.sample(list(catalog), min(300, size))
+
+        def timed(queries, fn):
+            out, results = [], []
+            for q in queries:
+                t = time.perf_counter()
+                results.append(fn(q))
+                out.append((time.perf_counter() - t) * 1e6)
+            out.sort()
+            return out[len(out) // 2], out[int(len(out) * 0.99)], results
+
+        exact = [f"I want to book {k} for 2 people next weekend" for k in keys]
+        typos = [_typo(k, rng) for k in keys]
+        misses = ["what should I pack for the monsoon season?" for _ in keys]
+        e50, e99, _ = timed(exact, index.find_location)
+        t50, t99, found = timed([f"trip to {t} please" for t in typos], index.find_location)
+        m50, m99, _ = timed(misses, index.find_location)
+        l50, _, _ = timed(exact, lambda q: _linear_find(catalog, q))
+        hit = sum(f == k for f, k in zip(found, keys)) / len(keys)
+        print(f"{size:12d} {len(index.terms):7d} {build_ms:9.1f}  {e50:8.1f}/{e99:<8.1f} {t50:7.1f}/{t99:<8.1f} {m50:7.1f}/{m99:<8.1f} {hit:8.0%} {l50:13.1f}")
@@ -0,0 +1,201 @@
+import os
+import re
+import sys
+import json
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import config.config as config
+
+# --- STRUCTURE-AWARE CHUNKING ---
+# Our destination and policy PDFs are written in markdown and come out of pypdf
+# as one word per line, with the markers intact:
+#   # Destination: Coorg (Kodagu), Karnataka      -> document title
+#   ## 🧩 Activity Modules / ## 📜 Cancellation   -> section
+#   ### Module A: The "Hard" Trek                  -> module (itinerary days inside)
+#   * **Type:** ... / *Day 1:* ...                 -> bullets
+#   Facts and cheat sheet { "faq_quick_lookup": { "pets": {...} } }  -> JSON blocks
+# Each heading, and each entry of a JSON block, is one unit labelled with its
+# path inside the document ("Activity Modules > Module A: ...", "Facts and
+# cheat sheet > Pets"). JSON blocks stand on their own after the markdown, so
+# their parent is the document title, not the heading before them. Consecutive
+# units of the same document are packed whole into chunks of up to
+# CHUNK_MAX_CHARS under the document title, so a unit is never cut and chunks
+# never overlap. A unit longer than CHUNK_MAX_CHARS is split at bullet
+# boundaries, and every piece repeats its labels. Documents without headings
+# fall back to the plain recursive splitter.
+
+HEADING_LEVELS = {"#": 1, "##": 2, "###": 3}
+_EMOJI = re.compile(r"[\U0001F000-\U0001FFFF☀-➿️]")
+
+def _clean(words):
+    """Markdown tokens -> readable text: bullets on their own lines, bold/italic markers dropped."""
+    out = []
+    for word in words:
+        if word == "*":
+            out.append("\n-")
+        else:
+            word = word.replace("**", "").strip("*")
+            if word: out.append(word)
+    text = " ".join(out).replace(" \n", "\n").strip()
+    return re.sub(r"^- ?", "- ", text, flags=re.MULTILINE)
+
+def _title(words):
+    return " ".join(_EMOJI.sub("", " ".join(words)).split())
+
+def _split_heading(words):
+    """Heading words end where the body starts: the first bullet or bold label."""
+    for i, word in enumerate(words):
+        if word.startswith("*"):
+            return words[:i], words[i:]
+    return words, []
+
+def _json_blocks(words):
+    """Splits a body into (text words, None) and (title, parsed JSON) parts at balanced { ... } blocks."""
+    parts, text, i = [], [], 0
+    while i < len(words):
+        if words[i] != "{":
+            text.append(words[i]); i += 1
+            continue
+        depth, j = 0, i
+        while j < len(words):
+            depth += words[j].count("{") - words[j].count("}")
+            if depth == 0: break
+            j += 1
+        try:
+            block = json.loads(" ".join(words[i:j + 1]))
+        except ValueError:
+            text.extend(words[i:j + 1]); i = j + 1
+            continue
+        # The block's title is the text after the last full stop before it ("Facts and cheat sheet")
+        cut = max((k + 1 for k, w in enumerate(text) if w.endswith((".", ":", ")"))), default=0)
+        title = text[cut:]
+        if text[:cut]: parts.append((text[:cut], None))
+        parts.append((_title(title), block))
+        text, i = [], j + 1
+    if text: parts.append((text, None))
+    return parts
+
+def _flatten(value, prefix=""):
+    """Nested JSON -> "key: value" lines."""
+    if isinstance(value, dict):
+        lines = []
+        for key, item in value.items():
+            label = key.replace("_", " ")
+            if isinstance(item, (dict, list)):
+                lines.append(f"{prefix}{label}:")
+                lines.extend(_flatten(item, prefix + "  "))
+            else:
+                lines.append(f"{prefix}{label}: {item}")
+        return lines
+    if isinstance(value, list):
+        return [f"{prefix}- {', '.join(map(str, value))}"] if all(not isinstance(v, (dict, list)) for v in value) \
+            else [line for v in value for line in _flatten(v, prefix)]
+    return [f"{prefix}{value}"]
+
+def _sections(words):
+    """[(level, title, body words)] in document order; level 0 is text before the first heading."""
+    sections, level, title, body = [], 0, "", []
+    i = 0
+    while i < len(words):
+        if words[i] in HEADING_LEVELS:
+            sections.append((level, title, body))
+            j = i + 1
+            while j < len(words) and words[j] not in HEADING_LEVELS: j += 1
+            heading, body = _split_heading(words[i + 1:j])
+            level, title = HEADING_LEVELS[words[i]], _title(heading)
+            i = j
+        else:
+            body.append(words[i]); i += 1
+    sections.append((level, title, body))
+    return sections
+
+def _pieces(text, limit):
+    """Splits an oversized unit at bullet lines (never mid-bullet unless one bullet alone is too long)."""
+    if len(text) <= limit: return [text]
+    pieces, current = [], ""
+    for line in text.split("\n"):
+        if current and len(current) + len(line) + 1 > limit:
+            pieces.append(current); current = ""
+        current = f"{current}\n{line}" if current else line
+    if current: pieces.append(current)
+    return [p[i:i + limit] for p in pieces for i in range(0, len(p), limit)]
+
+def _pack(units, max_chars):
+    """[(document, path, text, meta)] -> [(content, meta)]: whole units of one document per chunk, greedily."""
+    packed, current = [], None
+    for document, path, text, meta in units:
+        label = " > ".join(path)
+        header = f"{document}\n" if document else ""
+        for piece in _pieces(text, max_chars - len(header) - len(label) - 1):
+            body = f"{label}\n{piece}" if label else piece
+            if current and current[0] == document and len(current[1]) + len(body) + 2 <= max_chars:
+                current[1] += f"\n\n{body}"
+                current[2]["section"] += f" | {path[-1] if path else document}"
+                continue
+            current = [document, header + body, {**meta, "section": path[-1] if path else document}]
+            packed.append(current)
+    return [(content, meta) for _, content, meta in packed]
+
+def chunk_document(pages, max_chars=None):
+    """One PDF's pages (langchain Documents, in order) -> structure-aware chunks, or None if it has no headings."""
+    from langchain_core.documents import Document
+    max_chars = max_chars or config.CHUNK_MAX_CHARS
+    words, page_of = [], []
+    for page in pages:
+        page_words = page.page_content.split()
+        words.extend(page_words)
+        page_of.extend([page.metadata.get("page", 0)] * len(page_words))
+    if not any(w in HEADING_LEVELS for w in words):
+        return None
+
+    source = pages[0].metadata.get("source", "")
+    units, trail, position = [], {}, 0
+    for level, title, body in _sections(words):
+        page = page_of[min(position, len(page_of) - 1)] if page_of else 0
+        position += len(body) + (len(title.split()) + 1 if level else 0)
+        if level == 0 and not trail:
+            trail[0] = title or _title(body)  # document title line, e.g. "Coorg, Karnataka"
+            continue
+        if level:
+            trail = {k: v for k, v in trail.items() if k < level}
+            trail[level] = title
+        document = trail.get(1) or trail.get(0, "")
+        path = [trail[k] for k in sorted(trail) if k > 1 and trail[k]]
+        meta = {"source": source, "page": page, "destination": re.sub(r"^Destination:\s*", "", document)}
+        for part, block in _json_blocks(body):
+            if block is None:
+                text = _clean(part)
+                if len(text.split()) >= 4 or text.startswith("-"):  # stray page titles are not units
+                    units.append((document, path, text, meta))
+                continue
+            # One unit per top-level entry (per FAQ, per protocol), under the document rather than the last heading
+            entries = next(iter(block.values())) if len(block) == 1 and isinstance(next(iter(block.values())), dict) else block
+            for key, value in entries.items():
+                units.append((document, [part or "Facts", key.replace("_", " ").title()], "\n".join(_flatten(value)), meta))
+            path = []  # text after a block is back at document level
+    return [Document(page_content=content, metadata=meta) for content, meta in _pack(units, max_chars)]
+
+def split_documents(pages):
+    """Chunks every document in `pages` (grouped by source). Structured when possible, recursive otherwise."""
+    by_source = {}
+    for page in pages:
+        by_source.setdefault(page.metadata.get("source"), []).append(page)
+    chunks, unstructured = [], []
+    for doc_pages in by_source.values():
+        structured = chunk_document(doc_pages) if config.CHUNKER == "structured" else None
+        if structured is None:
+            unstructured.extend(doc_pages)
+        else:
+            chunks.extend(structured)
+    if unstructured:
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
+        chunks.extend(RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200).split_documents(unstructured))
+    return chunks
+
+if __name__ == "__main__":
+    # Print the chunks made from docs/ (or the PDFs given)
+    import pdf_stream
+    paths = sys.argv[1:] or sorted(os.path.join(config.BASE_DIR, "docs", f) for f in os.listdir(os.path.join(config.BASE_DIR, "docs")) if f.endswith(".pdf"))
+    for path in paths:
+        for chunk in split_documents(list(pdf_stream.iter_pdf_pages(path, max_bytes=0))):
+            print(f"--- {chunk.metadata} ({len(chunk.page_content)} chars)\n{chunk.page_content}\n")
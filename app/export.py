@@ -0,0 +1,88 @@
+import os
+import sys
+import time
+import tempfile
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import db.database as database
+
+DEFAULT_CHUNK_SIZE = 5000
+
+# (source column, export column, pandas dtype)
+EXPORT_COLUMNS = [
+    ("id", "Booking_ID", "Int64"),
+    ("name", "Customer", "string"),
+    ("email", "Email", "string"),
+    ("location", "Destination", "string"),
+    ("module_name", "Module", "string"),
+    ("booking_date", "Date", "string"),
+    ("guest_count", "Guests", "Int64"),
+    ("total_cost", "Cost", "float64"),
+    ("status", "Status", "string"),
+    ("created_at", "Booked_On", "string"),
+]
+
+EXPORT_FORMATS = {"CSV": ("bookings.csv", "text/csv"), "Parquet": ("bookings.parquet", "application/vnd.apache.parquet")}
+
+EXPORT_STATS = {"exports": 0, "rows": 0, "seconds": 0.0}
+
+# --- CHUNK STREAM ---
+def iter_export_frames(filters=None, chunk_size=DEFAULT_CHUNK_SIZE, repo=None):
+    """Yields one typed DataFrame per chunk; memory stays O(chunk_size) regardless of table size."""
+    repo = repo or database.get_repository()
+    for rows in repo.iter_bookings(filters, chunk_size=chunk_size):
+        df = pd.DataFrame(rows)
+        frame = pd.DataFrame({
+            dst: (df[src] if src in df.columns else pd.Series([None] * len(df))).astype(dtype)
+            for src, dst, dtype in EXPORT_COLUMNS
+        })
+        yield frame
+
+# --- WRITERS ---
+def write_csv(frames, fh):
+    header = True
+    rows = 0
+    for frame in frames:
+        frame.to_csv(fh, index=False, header=header, encoding="utf-8")
+        header = False
+        rows += len(frame)
+    if header:  # no rows: still emit the header line
+        pd.DataFrame(columns=[dst for _, dst, _ in EXPORT_COLUMNS]).to_csv(fh, index=False)
+    return rows
+
+def write_parquet(frames, fh):
+    """One row group per chunk, written with a fixed schema."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    empty = pd.DataFrame({dst: pd.Series(dtype=dtype) for _, dst, dtype in EXPORT_COLUMNS})
+    schema = pa.Schema.from_pandas(empty, preserve_index=False)
+    rows = 0
+    with pq.ParquetWriter(fh, schema, compression="snappy") as writer:
+        for frame in frames:
+            writer.write_table(pa.Table.from_pandas(frame, schema=schema, preserve_index=False))
+            rows += len(frame)
+    return rows
+
+# --- ON-DEMAND EXPORT ---
+def build_export(filters=None, fmt="CSV", chunk_size=DEFAULT_CHUNK_SIZE, repo=None):
+    """
+    Streams matching bookings through a temp file (closed before returning) and returns
+    the file's contents: str for CSV, bytes for Parquet. Meant to be passed (wrapped in
+    a lambda) as st.download_button's data, so it only runs when someone clicks download.
+    Building stays O(chunk_size) in memory, but st.download_button holds the finished
+    file in memory to serve it, so the export itself is not bounded.
+    """
+    start = time.perf_counter()
+    frames = iter_export_frames(filters, chunk_size=chunk_size, repo=repo)
+    mode = {"mode": "w+b"} if fmt == "Parquet" else {"mode": "w+", "encoding": "utf-8", "newline": ""}
+    with tempfile.TemporaryFile(**mode) as fh:
+        rows = write_parquet(frames, fh) if fmt == "Parquet" else write_csv(frames, fh)
+        fh.seek(0)
+        data = fh.read()
+
+    EXPORT_STATS["exports"] += 1
+    EXPORT_STATS["rows"] += rows
+    EXPORT_STATS["seconds"] += time.perf_counter() - start
+    return data
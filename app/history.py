@@ -0,0 +1,189 @@
+import os
+import sys
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import config.config as config
+import models.llm as llm
+import tracing
+
+# --- BOUNDED CHAT HISTORY ---
+# state["messages"] keeps the recent turns verbatim. Once it is CHAT_COMPACT_BATCH
+# messages past CHAT_HISTORY_WINDOW, the oldest ones move to
+# state["history_pending"], and a background worker folds them into
+# state["history_summary"] (LLM summary, with an extractive fallback). The
+# result is applied on a later compact() call, so no chat turn waits for it.
+# Pending messages stay verbatim until their summary lands, so nothing is lost
+# in between.
+#
+# context(state) is what the router, booking flow and RAG see: the summary
+# entry (role "summary") first, then the pending and recent messages.
+
+SUMMARY_ROLE = "summary"
+MAX_PENDING_BATCHES = 4  # summarizer stuck or failing: fold the backlog extractively
+MAX_JOBS = 1024
+
+_executor = None
+_jobs = {}  # job id -> Future of (summary, messages folded)
+_jobs_lock = threading.Lock()
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _jobs_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="history-summary")
+    return _executor
+
+# --- SUMMARIZATION ---
+def _transcript(messages):
+    return "\n".join(f"{'User' if m['role'] == 'user' else 'Bot'}: {m['content']}" for m in messages)
+
+def _clip(text):
+    # Keeps the newest part: later facts supersede earlier ones
+    limit = config.CHAT_SUMMARY_MAX_CHARS
+    return text if len(text) <= limit else "..." + text[-limit:]
+
+def extractive_summary(previous, messages):
+    """No-LLM fallback: what the user asked, one line per message, appended to the old summary."""
+    lines = [f"User: {' '.join(m['content'].split())[:160]}" for m in messages if m["role"] == "user"]
+    return _clip("\n".join(([previous] if previous else []) + lines))
+
+def summarize(previous, messages):
+    """Folds `messages` into the rolling summary `previous`. Runs on the background executor."""
+    from langchain_core.messages import SystemMessage
+    prompt = f"""
+    You are a Conversation Summarizer for a camping booking assistant.
+    Update the SUMMARY with the NEW MESSAGES. Keep destinations, packages, dates,
+    guest counts, booking IDs and open questions; drop greetings and small talk.
+    Reply with the updated summary only, under {config.CHAT_SUMMARY_MAX_CHARS // 6} words.
+
+    SUMMARY:
+    {previous or "(empty)"}
+
+    NEW MESSAGES:
+    {_transcript(messages)}
+    """
+    try:
+        model = llm.get_chatgroq_model()
+        if model is None:
+            return extractive_summary(previous, messages)
+        summary = model.invoke([SystemMessage(content=prompt)]).content.strip()
+        return _clip(summary) if summary else extractive_summary(previous, messages)
+    except Exception as e:
+        print(f"Summary Error: {e}")
+        return extractive_summary(previous, messages)
+
+def _run_job(previous, messages):
+    with tracing.span("history.summarize", kind="background", messages=len(messages)):
+        return summarize(previous, messages), len(messages)
+
+def _submit(state):
+    job_id = uuid.uuid4().hex
+    future = _get_executor().submit(_run_job, state.get("history_summary", ""), list(state["history_pending"]))
+    with _jobs_lock:
+        if len(_jobs) >= MAX_JOBS:
+            # Results nobody came back for (abandoned sessions); a returning session just resubmits
+            for stale in [k for k, f in _jobs.items() if f.done()]:
+                del _jobs[stale]
+        _jobs[job_id] = future
+    state["history_job"] = job_id
+
+def _forget(state):
+    with _jobs_lock:
+        _jobs.pop(state.pop("history_job", None), None)
+
+# --- COMPACTION ---
+def compact(state):
+    """
+    Applies a finished summary, then moves overflow out of state["messages"] and
+    schedules its summary. Cheap; call it once per turn (main.py, api.py).
+    """
+    messages = state.get("messages")
+    if not messages: return
+
+    # 1. Apply the summary a worker finished since the last turn
+    job_id = state.get("history_job")
+    if job_id:
+        with _jobs_lock:
+            future = _jobs.get(job_id)
+        if future is None:
+            # Submitted by another process or before a restart: schedule it again here
+            state.pop("history_job")
+        elif future.done():
+            _forget(state)
+            try:
+                summary, folded = future.result()
+            except Exception as e:
+                print(f"Summary Error: {e}")
+                summary, folded = extractive_summary(state.get("history_summary", ""), state["history_pending"]), len(state["history_pending"])
+            state["history_summary"] = summary
+            state["history_pending"] = state["history_pending"][folded:]
+
+    # 2. Move overflow out of the verbatim window
+    window, batch = config.CHAT_HISTORY_WINDOW, config.CHAT_COMPACT_BATCH
+    if len(messages) >= window + batch:
+        overflow = len(messages) - window
+        state["history_pending"] = state.get("history_pending", []) + messages[:overflow]
+        del messages[:overflow]
+
+    pending = state.get("history_pending")
+    if not pending: return
+    if len(pending) > MAX_PENDING_BATCHES * batch:
+        # Keep memory bounded even if summaries keep failing or lag far behind
+        backlog = len(pending) - batch
+        state["history_summary"] = extractive_summary(state.get("history_summary", ""), pending[:backlog])
+        state["history_pending"] = pending[backlog:]
+        _forget(state)  # its result would fold messages that are already folded
+    if not state.get("history_job"):
+        _submit(state)
+
+def context(state):
+    """The compacted history for routing and answering: summary entry, pending, then recent messages."""
+    summary = state.get("history_summary")
+    head = [{"role": SUMMARY_ROLE, "content": summary}] if summary else []
+    return head + list(state.get("history_pending", [])) + list(state.get("messages", []))
+
+def split_summary(chat_history):
+    """(summary text or "", messages without the summary entry)."""
+    if chat_history and chat_history[0]["role"] == SUMMARY_ROLE:
+        return chat_history[0]["content"], chat_history[1:]
+    return "", chat_history
+
+def tail(chat_history, n):
+    """The last n messages, keeping the summary entry in front if there is one."""
+    summary, messages = split_summary(chat_history)
+    return (chat_history[:1] if summary else []) + messages[-n:]
+
+def wait(timeout=None):
+    """Blocks until every scheduled summary is done (benchmarks and scripts)."""
+    with _jobs_lock:
+        futures = list(_jobs.values())
+    for future in futures:
+        future.exception(timeout=timeout)
+
+if __name__ == "__main__":
+    # Memory and per-turn cost of a long session, compacted vs. unbounded
+    import time
+    config.LLM_BACKEND = "stub"  # measures compaction, not the LLM
+    turns = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    bounded, unbounded = {"messages": []}, {"messages": []}
+    compact_ms = []
+    for i in range(turns):
+        for role, text in (("user", f"Turn {i}: what about coorg glamping for {i % 6 + 1} guests?"),
+                           ("assistant", "Here is what I found. " * 20)):
+            bounded["messages"].append({"role": role, "content": text})
+            unbounded["messages"].append({"role": role, "content": text})
+        start = time.perf_counter()
+        compact(bounded)
+        compact_ms.append((time.perf_counter() - start) * 1000)
+    wait()
+    compact(bounded)
+
+    def size(state):
+        return sum(len(m["content"]) for m in context(state))
+    print(f"{turns} turns: unbounded {len(unbounded['messages'])} messages / {size(unbounded) / 1024:.0f} KB, "
+          f"compacted {len(context(bounded))} entries / {size(bounded) / 1024:.1f} KB")
+    print(f"compact() p50 {sorted(compact_ms)[len(compact_ms) // 2]:.3f} ms, max {max(compact_ms):.3f} ms")
@@ -0,0 +1,150 @@
+import os
+import sys
+import time
+import shutil
+import threading
+import contextlib
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import config.config as config
+
+try:
+    import fcntl
+except ImportError:  # Windows: writers are only serialized within the process
+    fcntl = None
+
+# --- VERSIONED INDEX SNAPSHOTS ---
+# VECTOR_DB_PATH holds immutable versions plus a pointer to the live one:
+#
+#   faiss_index/
+#     CURRENT                 "v1792365210123456789"   (replaced atomically)
+#     v1792365210123456789/   index.faiss, index.pkl
+#     v1792365100987654321/   previous version, kept until GC
+#
+# A writer builds the new index in a temp directory, renames it into place,
+# then flips CURRENT with os.replace. Readers never see a half-written index.
+# Readers take no lock, so writes never block them. A query pins the version
+# it started with. Writers serialize on a lock file, so concurrent rebuilds or
+# uploads never interleave. After each publish, GC deletes old versions: it
+# keeps the newest INDEX_KEEP_VERSIONS, anything pinned in this process, and
+# anything superseded less than INDEX_GC_GRACE_SECONDS ago (another process
+# may still be loading it).
+#
+# An index saved by older builds straight into faiss_index/ is read as the
+# version "." until the first publish.
+
+POINTER = "CURRENT"
+LEGACY = "."
+LEGACY_FILES = ("index.faiss", "index.pkl")
+
+_pins = {}
+_pins_lock = threading.Lock()
+_write_lock = threading.Lock()
+
+def _root():
+    return config.VECTOR_DB_PATH
+
+def current_version():
+    """Name of the live version, or None if no index has been published."""
+    try:
+        with open(os.path.join(_root(), POINTER)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        pass
+    return LEGACY if os.path.exists(os.path.join(_root(), "index.faiss")) else None
+
+def version_path(version):
+    return os.path.normpath(os.path.join(_root(), version))
+
+def versions():
+    """Published version directories, oldest first."""
+    if not os.path.isdir(_root()): return []
+    return sorted(d for d in os.listdir(_root()) if d.startswith("v") and os.path.isdir(os.path.join(_root(), d)))
+
+# --- READERS ---
+@contextlib.contextmanager
+def pinned(version):
+    """Keeps `version` out of GC (in this process) while the block runs."""
+    with _pins_lock:
+        _pins[version] = _pins.get(version, 0) + 1
+    try:
+        yield version
+    finally:
+        with _pins_lock:
+            _pins[version] -= 1
+            if not _pins[version]: del _pins[version]
+
+# --- WRITERS ---
+@contextlib.contextmanager
+def writer():
+    """Serializes writers (threads and processes). Yields the version current when the lock was taken."""
+    os.makedirs(_root(), exist_ok=True)
+    with _write_lock, open(os.path.join(_root(), ".lock"), "a") as lock_file:
+        if fcntl: fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield current_version()
+        finally:
+            if fcntl: fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def _flip(version):
+    tmp = os.path.join(_root(), f".{POINTER}.{os.getpid()}.tmp")
+    with open(tmp, "w") as f:
+        f.write(version or "")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, os.path.join(_root(), POINTER))
+
+def publish(vector_store):
+    """Saves `vector_store` as a new version and makes it current. Call inside writer(). Returns the version."""
+    version = f"v{time.time_ns()}"
+    tmp = os.path.join(_root(), f".{version}.tmp")
+    vector_store.save_local(tmp)
+    os.rename(tmp, version_path(version))
+    _flip(version)
+    print(f"Index version {version} published")
+    try:
+        gc()
+    except OSError as e:
+        print(f"Index GC Error: {e}")  # the new version is live either way; the next publish retries
+    return version
+
+def clear():
+    """Unpublishes the index (last document removed). Call inside writer(); GC removes the files."""
+    _flip(None)
+    try:
+        gc()
+    except OSError as e:
+        print(f"Index GC Error: {e}")
+
+def gc(keep=None, grace_seconds=None):
+    """Deletes superseded versions (see above). Returns the names removed."""
+    keep = config.INDEX_KEEP_VERSIONS if keep is None else keep
+    grace_seconds = config.INDEX_GC_GRACE_SECONDS if grace_seconds is None else grace_seconds
+    current = current_version()
+    published = versions()
+    with _pins_lock:
+        protected = set(published[-keep:] if keep else []) | set(_pins) | {current}
+    removed = []
+    now = time.time()
+    legacy_superseded_at = os.path.getmtime(version_path(published[0])) if published else now
+    for i, version in enumerate(published):
+        if version in protected: continue
+        # A version is superseded when the next one was created
+        superseded_at = os.path.getmtime(version_path(published[i + 1])) if i + 1 < len(published) else now
+        if now - superseded_at < grace_seconds: continue
+        shutil.rmtree(version_path(version), ignore_errors=True)
+        removed.append(version)
+    # Leftovers: crashed writers' temp dirs and a pre-versioning index in the root
+    for name in os.listdir(_root()) if os.path.isdir(_root()) else []:
+        path = os.path.join(_root(), name)
+        if name.startswith(".v") and now - os.path.getmtime(path) > max(grace_seconds, 3600):
+            shutil.rmtree(path, ignore_errors=True)
+    if current != LEGACY and LEGACY not in _pins and now - legacy_superseded_at >= grace_seconds:
+        for name in LEGACY_FILES:
+            path = os.path.join(_root(), name)
+            if os.path.exists(path):
+                os.remove(path)
+                removed.append(name)
+    if removed:
+        print(f"Index GC removed: {', '.join(removed)}")
+    return removed
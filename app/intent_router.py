@@ -0,0 +1,173 @@
+import time
+import threading
+
+import booking_flow as booking
+import catalog_answers
+import rag_pipeline as rag
+import tools as tools
+import tracing
+import config.config as config
+
+# --- INTENT EXAMPLES (averaged into one centroid per intent) ---
+INTENT_EXAMPLES = {
+    "book": [
+        "I want to book a trip", "Reserve a camping spot for us",
+        "Book the glamping package", "Can I book Coorg for next weekend?",
+        "Sign me up for the trek", "I'd like to make a reservation",
+    ],
+    "cancel": [
+        "Cancel my booking", "I want to cancel my trip",
+        "Please cancel the reservation", "I can't make it, call off my booking",
+    ],
+    "update": [
+        "Change the date of my booking", "Update my reservation",
+        "Reschedule my trip", "Add two more guests to my booking",
+        "Modify my booking details",
+    ],
+    "availability": [
+        "Which dates are available?", "Are there slots this weekend?",
+        "Is Wayanad available next Friday?", "When is the next open date?",
+        "Do you have availability in December?",
+    ],
+    "price": [
+        "How much does it cost?", "What is the price of the trek?",
+        "Price of the 3-day package", "How expensive is glamping?",
+        "What are the charges per person?",
+    ],
+    "policy": [
+        "What is the cancellation policy?", "Can I bring my dog?",
+        "Is alcohol allowed?", "What food do you serve?",
+        "Tell me about the itinerary", "Is it safe for kids?",
+        "What should I pack?",
+    ],
+    "small_talk": [
+        "Hi", "Hello there", "Thanks!", "Thank you so much",
+        "Good morning", "Who are you?", "Bye",
+    ],
+}
+
+SMALL_TALK_REPLY = "Hi! I'm Scout AI 🏕️ Ask me about Coorg, Wayanad or Kodaikanal, or say **'book'** to plan a trip."
+
+_labels = None
+_centroids = None
+_centroids_lock = threading.Lock()
+
+ROUTER_STATS = {"turns": 0, "fallbacks": 0, "total_ms": 0.0, "intents": {}}
+
+# --- CENTROIDS ---
+def _normalize(vectors):
+    import numpy as np
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+def load_centroids():
+    """Embeds the intent examples once per process and caches the unit-length centroids."""
+    global _labels, _centroids
+    if _centroids is None:
+        with _centroids_lock:  # the warm-up thread and a first chat turn may race here
+            if _centroids is None:
+                embeddings = rag.get_embedding_model()
+                labels, rows = [], []
+                for intent, examples in INTENT_EXAMPLES.items():
+                    vectors = _normalize(embeddings.embed_documents(examples))
+                    labels.append(intent)
+                    rows.append(vectors.mean(axis=0))
+                _labels, _centroids = labels, _normalize(rows)
+    return _labels, _centroids
+
+# --- ROUTING ---
+def route_intent(user_input):
+    """Returns {"intent", "confidence", "latency_ms"} for one message."""
+    start = time.perf_counter()
+    with tracing.span("router.intent"):
+        labels, centroids = load_centroids()
+        query = _normalize(rag.get_embedding_model().embed_documents([user_input]))[0]
+        scores = centroids @ query
+    best = int(scores.argmax())
+    latency_ms = (time.perf_counter() - start) * 1000
+    return {"intent": labels[best], "confidence": float(scores[best]), "latency_ms": latency_ms}
+
+def _record(intent, latency_ms, fallback):
+    ROUTER_STATS["turns"] += 1
+    ROUTER_STATS["total_ms"] += latency_ms
+    if fallback:
+        ROUTER_STATS["fallbacks"] += 1
+    ROUTER_STATS["intents"][intent] = ROUTER_STATS["intents"].get(intent, 0) + 1
+
+def get_router_stats():
+    turns = ROUTER_STATS["turns"]
+    return {
+        **ROUTER_STATS,
+        "avg_ms": ROUTER_STATS["total_ms"] / turns if turns else 0.0,
+        "fallback_rate": ROUTER_STATS["fallbacks"] / turns if turns else 0.0,
+    }
+
+# --- HANDLERS (cheapest first) ---
+def _find_location(user_input, chat_history):
+    context = booking.scan_history_for_intent([{"role": "user", "content": user_input}])
+    if not context:
+        context = booking.scan_history_for_intent(chat_history)
+    return context.get("location")
+
+def _handle_availability(user_input, chat_history):
+    loc = _find_location(user_input, chat_history)
+    if not loc: return None
+    # Same table (and booked occupancy) the booking flow shows for this destination
+    df = tools.get_availability_df(loc)
+    if df is None or df.empty: return None
+    open_rows = df[df["Status"].str.strip() != "Sold out"]
+    if open_rows.empty:
+        return f"**{loc.title()}** is sold out on the next dates ({', '.join(dict.fromkeys(df['Date']))}). Ask me about another destination!"
+    dates = ", ".join(dict.fromkeys(open_rows["Date"]))
+    return f"Next open dates for **{loc.title()}**: {dates}. \n\nSay **'book {loc.title()}'** to pick a slot."
+
+def _handle_price(user_input, chat_history):
+    loc = _find_location(user_input, chat_history)
+    if not loc: return None
+    return catalog_answers.price_list(loc)
+
+def dispatch(user_input, chat_history=[]):
+    """Routes one chat message to the cheapest handler that can answer it."""
+    booking.init_booking_state()
+    with tracing.span("chat.turn", step=booking.session().booking_step):
+        return _dispatch(user_input, chat_history)
+
+def _dispatch(user_input, chat_history):
+    # Mid-flow turns always belong to the state machine
+    if booking.session().booking_step != "IDLE":
+        return booking.process_booking_input(user_input, chat_history)
+
+    # Plain catalog lookups ("price of Chembra Peak Hike") are answered from logistics.json
+    reply = catalog_answers.answer(user_input)
+    if reply:
+        return reply
+
+    try:
+        route = route_intent(user_input)
+    except Exception as e:
+        print(f"Router Error: {e}")
+        route = {"intent": None, "confidence": 0.0, "latency_ms": 0.0}
+
+    intent = route["intent"]
+    fallback = route["confidence"] < config.INTENT_MIN_CONFIDENCE
+    _record(intent if not fallback else "fallback", route["latency_ms"], fallback)
+    tracing.annotate(intent=intent if not fallback else "fallback")
+    print(f"🧭 Intent: {intent} ({route['confidence']:.2f}) in {route['latency_ms']:.1f} ms{' [fallback]' if fallback else ''}")
+
+    if fallback:
+        response = booking.process_booking_input(user_input, chat_history)
+        return response if response else rag.query_rag(user_input, chat_history)
+
+    if intent in ["book", "cancel", "update"]:
+        response = booking.process_booking_input(user_input, chat_history, intent=intent)
+    elif intent == "availability":
+        response = _handle_availability(user_input, chat_history)
+    elif intent == "price":
+        response = _handle_price(user_input, chat_history)
+    elif intent == "small_talk":
+        response = SMALL_TALK_REPLY
+    else:
+        response = None
+
+    return response if response else rag.query_rag(user_input, chat_history)
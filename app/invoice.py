@@ -0,0 +1,152 @@
+import io
+import os
+import re
+import sys
+import hmac
+import hashlib
+import secrets
+from datetime import datetime
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import config.config as config
+
+# --- SIGNED INVOICE TAG ---
+# Every generated invoice carries "scout-booking:v1:<booking_id>:<hmac>" in the PDF
+# Keywords (document info dictionary). The HMAC binds the booking ID to the
+# customer's email, so the verifier only needs the trailer/info object, never the pages.
+
+TAG_PREFIX = "scout-booking:v1"
+TAG_PATTERN = re.compile(r"scout-booking:v1:(\d+):([0-9a-f]{32})")
+
+_stub_secret = secrets.token_hex(32)  # LLM_BACKEND=stub only: tags verify within this process
+
+def _secret():
+    if config.INVOICE_SECRET:
+        return config.INVOICE_SECRET
+    if config.LLM_BACKEND == "stub":
+        return _stub_secret
+    raise RuntimeError("INVOICE_SECRET is not set: invoice tags can't be signed or verified")
+
+def require_secret():
+    """Startup check (warmup.start): raises unless INVOICE_SECRET is set or LLM_BACKEND=stub."""
+    _secret()
+
+def sign(booking_id, email):
+    message = f"{int(booking_id)}|{(email or '').strip().lower()}".encode("utf-8")
+    return hmac.new(_secret().encode("utf-8"), message, hashlib.sha256).hexdigest()[:32]
+
+def make_tag(booking_id, email):
+    return f"{TAG_PREFIX}:{int(booking_id)}:{sign(booking_id, email)}"
+
+def read_tag(pdf_bytes):
+    """
+    Returns (booking_id, signature) from the PDF metadata, or None if the file has no tag.
+    Accepts bytes or a seekable binary file (e.g. a Streamlit upload).
+    Reads the info dictionary only; cost does not grow with page count.
+    """
+    from pypdf import PdfReader
+    if hasattr(pdf_bytes, "read"):
+        pdf_bytes.seek(0)
+        stream = pdf_bytes
+    else:
+        stream = io.BytesIO(pdf_bytes)
+    meta = PdfReader(stream).metadata or {}
+    match = TAG_PATTERN.search(str(meta.get("/Keywords") or ""))
+    return (int(match.group(1)), match.group(2)) if match else None
+
+def check_signature(booking_id, signature, email):
+    return hmac.compare_digest(signature, sign(booking_id, email))
+
+# --- GENERATOR ---
+def _latin1(text):
+    # Core PDF fonts are Latin-1 only
+    return str(text).replace("₹", "INR ").encode("latin-1", "replace").decode("latin-1")
+
+def generate_invoice(booking_id, name, email, details):
+    """
+    Renders the booking invoice (same fields as the confirmation email) and returns PDF bytes.
+    details: booking_data from the chat flow (location, module_name, date, nights, guests, total_cost, ...).
+    """
+    from fpdf import FPDF
+
+    end_date = details.get("end_date")
+    if not end_date:
+        from tools import calculate_end_date
+        end_date = calculate_end_date(details["date"], details["nights"])
+
+    pdf = FPDF()
+    pdf.set_title(f"Scout AI Invoice #{booking_id}")
+    pdf.set_author("Scout AI")
+    pdf.set_subject(f"Booking ID #{booking_id}")
+    pdf.set_keywords(make_tag(booking_id, email))
+    pdf.set_creator("Scout AI invoice generator")
+    pdf.add_page()
+
+    pdf.set_font("Helvetica", "B", 18)
+    pdf.set_text_color(27, 77, 62)
+    pdf.cell(0, 12, "Scout AI - Booking Invoice", new_x="LMARGIN", new_y="NEXT")
+    pdf.set_text_color(0, 0, 0)
+    pdf.set_font("Helvetica", "", 10)
+    pdf.cell(0, 6, f"Issued: {datetime.now().strftime('%Y-%m-%d')}", new_x="LMARGIN", new_y="NEXT")
+    pdf.ln(4)
+
+    # Kept in the page text so the legacy text-extraction verifier still works
+    pdf.set_font("Helvetica", "B", 12)
+    pdf.cell(0, 8, f"Booking ID: #{booking_id}", new_x="LMARGIN", new_y="NEXT")
+    pdf.ln(2)
+
+    rows = [
+        ("Name", name),
+        ("Email", email),
+        ("Destination", str(details.get("location", "")).title()),
+        ("Module", details.get("module_name", "")),
+        ("Dates", f"{details['date']} to {end_date} ({details['nights']} Nights)"),
+        ("Guests", details.get("guests", "")),
+        ("Total Paid", f"INR {float(details.get('total_cost') or 0):,.0f}"),
+    ]
+    for label, value in rows:
+        pdf.set_font("Helvetica", "B", 11)
+        pdf.cell(45, 8, _latin1(label), border=1)
+        pdf.set_font("Helvetica", "", 11)
+        pdf.cell(0, 8, _latin1(value), border=1, new_x="LMARGIN", new_y="NEXT")
+
+    for label in ("itinerary", "food", "policy"):
+        if details.get(label):
+            pdf.ln(3)
+            pdf.set_font("Helvetica", "B", 11)
+            pdf.cell(0, 7, label.title(), new_x="LMARGIN", new_y="NEXT")
+            pdf.set_font("Helvetica", "", 10)
+            pdf.multi_cell(0, 5, _latin1(details[label]))
+
+    pdf.ln(6)
+    pdf.set_font("Helvetica", "I", 8)
+    pdf.multi_cell(0, 4, "Keep this PDF: upload it in the chat to update or cancel your booking.")
+    return bytes(pdf.output())
+
+# --- BENCHMARK ---
+if __name__ == "__main__":
+    import time
+    from pypdf import PdfReader, PdfWriter
+
+    details = {"location": "coorg", "module_name": "Kumara Parvatha Trek", "date": "2025-12-19",
+               "end_date": "2025-12-20", "nights": 1, "guests": 2, "total_cost": 7600,
+               "itinerary": "Day 1: trek. " * 40, "food": "Veg meals", "policy": "Free cancellation up to 48h."}
+    one_page = generate_invoice(4242, "Bench User", "bench@example.com", details)
+
+    # Pad to many pages to show the metadata path doesn't scale with page count
+    writer = PdfWriter(clone_from=PdfReader(io.BytesIO(one_page)))
+    for _ in range(199):
+        writer.add_page(writer.pages[0])
+    buf = io.BytesIO()
+    writer.write(buf)
+    many_pages = buf.getvalue()
+
+    for label, data in (("1 page", one_page), ("200 pages", many_pages)):
+        start = time.perf_counter()
+        tag = read_tag(data)
+        meta_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        text = "\n".join(p.extract_text() for p in PdfReader(io.BytesIO(data)).pages)
+        text_ms = (time.perf_counter() - start) * 1000
+        ok = tag and check_signature(tag[0], tag[1], "bench@example.com")
+        print(f"{label:10s} metadata {meta_ms:8.2f} ms (valid={ok})   full text {text_ms:9.2f} ms")
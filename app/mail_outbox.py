@@ -0,0 +1,437 @@
+import os
+import sys
+import time
+import queue
+import random
+import smtplib
+import sqlite3
+import threading
+import socketserver
+from contextlib import contextmanager
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import config.config as config
+import tracing
+
+# --- EMAIL OUTBOX ---
+# Chat turns only enqueue: the rendered message goes into a local SQLite (WAL)
+# queue and background workers deliver it over pooled, already-authenticated
+# SMTP connections, several messages per connection, with retry and backoff.
+
+MAIL_SCHEMA = """
+CREATE TABLE IF NOT EXISTS mail_queue (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    sender TEXT,
+    recipient TEXT NOT NULL,
+    subject TEXT,
+    booking_id INTEGER,
+    message TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL DEFAULT 0,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    sent_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_mail_due ON mail_queue(status, next_attempt_at);
+"""
+
+LEASE_SECONDS = 60
+SENT_RETENTION_SECONDS = 7 * 24 * 3600
+
+# Errors that mean "this message", not "this connection"
+MESSAGE_ERRORS = (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError)
+
+# Called as fn(booking_id, error) when a booking's confirmation fails for good (app/tools.py marks the booking)
+FAILURE_LISTENERS = []
+
+def _is_permanent(error):
+    """5xx = retrying won't help. SMTPRecipientsRefused carries its codes per recipient, not in smtp_code."""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        codes = [code for code, _ in error.recipients.values()]
+        return bool(codes) and all(code >= 500 for code in codes)
+    code = getattr(error, "smtp_code", None)
+    return bool(code and code >= 500)
+
+# --- CONNECTION POOL ---
+class SMTPPool:
+    """Keeps up to `size` logged-in SMTP connections and hands them out one at a time."""
+
+    def __init__(self, host, port, username=None, password=None, starttls=True, size=2, timeout=30, idle_check_seconds=30):
+        self.host, self.port = host, port
+        self.username, self.password = username, password
+        self.starttls = starttls
+        self.timeout = timeout
+        self.idle_check_seconds = idle_check_seconds
+        self.stats = {"connects": 0, "reused": 0, "dropped": 0}
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+
+    def _connect(self):
+        with tracing.span("smtp.connect"):
+            conn = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+            if self.starttls:
+                conn.starttls()
+            if self.username and self.password:
+                conn.login(self.username, self.password)
+        self.stats["connects"] += 1
+        return conn
+
+    def _checkout(self):
+        while True:
+            try:
+                conn, last_used = self._idle.get_nowait()
+            except queue.Empty:
+                return self._connect()
+            # Servers drop idle sessions; probe only connections that sat for a while
+            if time.time() - last_used < self.idle_check_seconds:
+                self.stats["reused"] += 1
+                return conn
+            try:
+                if conn.noop()[0] == 250:
+                    self.stats["reused"] += 1
+                    return conn
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._close(conn)
+
+    def _close(self, conn):
+        self.stats["dropped"] += 1
+        try:
+            conn.quit()
+        except (smtplib.SMTPException, OSError):
+            conn.close()
+
+    @contextmanager
+    def connection(self):
+        """Yields a ready connection. It goes back to the pool unless a connection-level error escapes."""
+        self._slots.acquire()
+        try:
+            conn = self._checkout()
+            try:
+                yield conn
+            except Exception:
+                self._close(conn)
+                raise
+            self._idle.put((conn, time.time()))
+        finally:
+            self._slots.release()
+
+    def close_all(self):
+        while True:
+            try:
+                conn, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._close(conn)
+
+# --- PERSISTENT QUEUE + DISPATCHER ---
+class MailOutbox:
+    """Durable email queue drained by background workers through an SMTPPool."""
+
+    def __init__(self, pool, path=None, batch_size=None, flush_interval=None, max_attempts=None, max_backoff=None, workers=None):
+        self.pool = pool
+        self.path = path or config.MAIL_OUTBOX_DB_PATH
+        self.batch_size = batch_size or config.MAIL_BATCH_SIZE
+        self.flush_interval = flush_interval if flush_interval is not None else config.MAIL_FLUSH_INTERVAL_SECONDS
+        self.max_attempts = max_attempts or config.MAIL_MAX_ATTEMPTS
+        self.max_backoff = max_backoff or config.MAIL_MAX_BACKOFF_SECONDS
+        self.workers = workers or config.SMTP_POOL_SIZE
+        self.stats = {"enqueued": 0, "enqueue_ms": 0.0, "sent": 0, "batches": 0, "retries": 0, "failed": 0, "last_error": None}
+        self._local = threading.local()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads = []
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(MAIL_SCHEMA)
+        # Queues created before booking_id was tracked
+        if "booking_id" not in {r[1] for r in conn.execute("PRAGMA table_info(mail_queue)")}:
+            conn.execute("ALTER TABLE mail_queue ADD COLUMN booking_id INTEGER")
+
+    def _conn(self):
+        # sqlite3 connections can't be shared across threads; keep one per thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def enqueue(self, recipient, msg, sender=None, booking_id=None):
+        """
+        Queues a rendered email.message (or raw string). Returns the queue ID; no network I/O.
+        booking_id: the booking this message confirms; FAILURE_LISTENERS hear about it if it fails for good.
+        """
+        start = time.perf_counter()
+        sender = sender or (msg["From"] if hasattr(msg, "get") else None) or config.SENDER_EMAIL
+        subject = msg["Subject"] if hasattr(msg, "get") else None
+        raw = msg.as_string() if hasattr(msg, "as_string") else str(msg)
+        cur = self._conn().execute(
+            "INSERT INTO mail_queue (sender, recipient, subject, message, booking_id, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (sender, recipient, subject, raw, booking_id, time.time()),
+        )
+        self.stats["enqueued"] += 1
+        self.stats["enqueue_ms"] += (time.perf_counter() - start) * 1000
+        self._wake.set()
+        return cur.lastrowid
+
+    def _claim(self, now):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute(
+                "SELECT id, sender, recipient, message, attempts, booking_id FROM mail_queue"
+                " WHERE status = 'pending' AND next_attempt_at <= ? ORDER BY id LIMIT ?", (now, self.batch_size),
+            ).fetchall()
+            if rows:
+                ids = [r["id"] for r in rows]
+                conn.execute(
+                    f"UPDATE mail_queue SET next_attempt_at = ? WHERE id IN ({', '.join('?' for _ in ids)})",
+                    [now + LEASE_SECONDS] + ids,
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return rows
+
+    def _mark_sent(self, row_id):
+        self._conn().execute("UPDATE mail_queue SET status = 'sent', sent_at = ? WHERE id = ?", (time.time(), row_id))
+        self.stats["sent"] += 1
+
+    def _retry_later(self, row, error, permanent=False):
+        """Backs off exponentially (with jitter); gives up after max_attempts or on a permanent (5xx) error."""
+        attempts = row["attempts"] + 1
+        if permanent or attempts >= self.max_attempts:
+            self._conn().execute(
+                "UPDATE mail_queue SET status = 'failed', attempts = ?, last_error = ? WHERE id = ?",
+                (attempts, error[:500], row["id"]),
+            )
+            self.stats["failed"] += 1
+            if row["booking_id"] is not None:
+                for listener in FAILURE_LISTENERS:
+                    try:
+                        listener(row["booking_id"], error)
+                    except Exception as e:
+                        print(f"Mail failure listener error: {e}")
+            return
+        delay = min(self.flush_interval * 2 ** attempts, self.max_backoff) * (0.5 + random.random() / 2)
+        self._conn().execute(
+            "UPDATE mail_queue SET attempts = ?, next_attempt_at = ?, last_error = ? WHERE id = ?",
+            (attempts, time.time() + delay, error[:500], row["id"]),
+        )
+        self.stats["retries"] += 1
+
+    def send_batch(self):
+        """Delivers one leased batch over a single pooled connection. Returns messages sent."""
+        rows = self._claim(time.time())
+        if not rows: return 0
+        self.stats["batches"] += 1
+        with tracing.span("smtp.send_batch", kind="background", messages=len(rows)):
+            return self._deliver(rows)
+
+    def _deliver(self, rows):
+        sent = 0
+        try:
+            with self.pool.connection() as smtp:
+                for row in rows:
+                    try:
+                        with tracing.span("smtp.sendmail"):
+                            smtp.sendmail(row["sender"], [row["recipient"]], row["message"].encode("utf-8"))
+                    except MESSAGE_ERRORS as e:
+                        self._retry_later(row, str(e), permanent=_is_permanent(e))
+                        continue
+                    self._mark_sent(row["id"])
+                    sent += 1
+        except Exception as e:
+            # Connection-level failure: everything not yet delivered is retried later
+            self.stats["last_error"] = str(e)
+            done = {r["id"] for r in self._conn().execute(
+                f"SELECT id FROM mail_queue WHERE status != 'pending' AND id IN ({', '.join('?' for _ in rows)})",
+                [r["id"] for r in rows],
+            )}
+            for row in rows:
+                if row["id"] not in done:
+                    self._retry_later(row, str(e))
+        return sent
+
+    def flush(self):
+        """Sends everything currently due. Returns the number of messages sent."""
+        total = 0
+        while True:
+            sent = self.send_batch()
+            if not sent: return total
+            total += sent
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                self.stats["last_error"] = str(e)
+                print(f"Mail dispatcher error: {e}")
+
+    def start(self):
+        self._threads = [t for t in self._threads if t.is_alive()]
+        self._stop.clear()
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(target=self._run, name=f"mail-outbox-{len(self._threads)}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self, drain=True):
+        self._stop.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join(timeout=5)
+        self._threads = []
+        if drain:
+            self.flush()
+        self.pool.close_all()
+
+    def prune(self, older_than=SENT_RETENTION_SECONDS):
+        self._conn().execute("DELETE FROM mail_queue WHERE status = 'sent' AND sent_at < ?", (time.time() - older_than,))
+
+    def get_stats(self):
+        counts = dict(self._conn().execute("SELECT status, COUNT(*) FROM mail_queue GROUP BY status").fetchall())
+        return {
+            **self.stats, **{f"smtp_{k}": v for k, v in self.pool.stats.items()},
+            "pending": counts.get("pending", 0), "failed_total": counts.get("failed", 0),
+            "avg_enqueue_ms": self.stats["enqueue_ms"] / self.stats["enqueued"] if self.stats["enqueued"] else 0.0,
+        }
+
+_mail_outbox = None
+_mail_lock = threading.Lock()
+
+def get_mail_outbox():
+    """Process-wide email outbox (configured from config.SMTP_*) with its workers running."""
+    global _mail_outbox
+    with _mail_lock:
+        if _mail_outbox is None:
+            pool = SMTPPool(
+                config.SMTP_HOST, config.SMTP_PORT,
+                username=config.SENDER_EMAIL, password=config.SENDER_PASSWORD,
+                starttls=config.SMTP_STARTTLS, size=config.SMTP_POOL_SIZE,
+            )
+            _mail_outbox = MailOutbox(pool).start()
+            _mail_outbox.prune()
+    return _mail_outbox
+
+# --- LOCAL SMTP SINK (tests / benchmarks) ---
+class _SinkHandler(socketserver.StreamRequestHandler):
+    def _reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        sink = self.server
+        time.sleep(sink.connect_delay)  # stands in for TCP + TLS + AUTH round-trips
+        self._reply("220 localhost Scout AI SMTP sink")
+        sender, recipients = None, []
+        while True:
+            line = self.rfile.readline()
+            if not line: return
+            command = line.decode("utf-8", "replace").strip()
+            verb = command[:4].upper()
+            if verb == "EHLO":
+                self._reply("250-localhost"); self._reply("250 8BITMIME")
+            elif verb == "HELO":
+                self._reply("250 localhost")
+            elif verb == "MAIL":
+                sender, recipients = command.split(":", 1)[1].strip().strip("<>"), []
+                self._reply("250 OK")
+            elif verb == "RCPT":
+                recipients.append(command.split(":", 1)[1].strip().strip("<>"))
+                self._reply("250 OK")
+            elif verb == "DATA":
+                self._reply("354 End data with <CR><LF>.<CR><LF>")
+                lines = []
+                while True:
+                    data = self.rfile.readline()
+                    if not data or data in (b".\r\n", b".\n"): break
+                    lines.append(data[1:] if data.startswith(b"..") else data)
+                sink.deliver(sender, recipients, b"".join(lines))
+                self._reply("250 OK queued")
+            elif verb in ("RSET", "NOOP"):
+                self._reply("250 OK")
+            elif verb == "QUIT":
+                self._reply("221 Bye")
+                return
+            else:
+                self._reply("502 Command not implemented")
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    """
+    Minimal in-process SMTP server that records every message it receives.
+    Point SMTP_HOST/SMTP_PORT at it (with SMTP_STARTTLS=0) to run the app without sending mail.
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host="127.0.0.1", port=0, connect_delay=0.0):
+        super().__init__((host, port), _SinkHandler)
+        self.connect_delay = connect_delay
+        self.messages = []
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def deliver(self, sender, recipients, data):
+        with self._lock:
+            self.messages.append({"from": sender, "to": recipients, "data": data})
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, name="smtp-sink", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+# --- BENCHMARK ---
+if __name__ == "__main__":
+    import tempfile
+    from email.mime.text import MIMEText
+
+    n = 200
+    sink = SMTPSink(connect_delay=0.02).start()
+
+    def make(i):
+        msg = MIMEText(f"Booking #{i} confirmed.", "plain")
+        msg["From"], msg["To"], msg["Subject"] = "bench@example.com", f"guest{i}@example.com", f"Booking #{i}"
+        return msg
+
+    # Old path: a fresh connection per email, inline
+    start = time.perf_counter()
+    for i in range(n):
+        server = smtplib.SMTP("127.0.0.1", sink.port)
+        server.sendmail("bench@example.com", f"guest{i}@example.com", make(i).as_string())
+        server.quit()
+    inline_s = time.perf_counter() - start
+
+    pool = SMTPPool("127.0.0.1", sink.port, starttls=False, size=2)
+    box = MailOutbox(pool, path=os.path.join(tempfile.mkdtemp(), "mail.db"), flush_interval=0.05, workers=2)
+    start = time.perf_counter()
+    for i in range(n):
+        box.enqueue(f"guest{i}@example.com", make(i))
+    enqueue_s = time.perf_counter() - start
+    box.start()
+    while box.get_stats()["pending"]:
+        time.sleep(0.01)
+    pooled_s = time.perf_counter() - start
+    box.stop()
+    stats = box.get_stats()
+
+    print(f"inline (connect per email)  {n / inline_s:8.0f} emails/s   {inline_s / n * 1000:7.2f} ms blocking per email")
+    print(f"outbox enqueue              {enqueue_s / n * 1000:7.3f} ms blocking per email")
+    print(f"pooled delivery             {n / pooled_s:8.0f} emails/s   {stats['smtp_connects']} connections, {stats['batches']} batches")
+    print(f"sink received               {len(sink.messages)} / {2 * n}")
+    sink.stop()
@@ -7,7 +7,11 @@ import booking_flow as booking
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 import config.config as config
 import rag_pipeline as rag
-import admin_dashboard as admin
+import intent_router as router
+import session_store
+import warmup
+import transcripts
+import history
 
 st.set_page_config(page_title="Scout AI", page_icon="assets/logo.png", layout="wide")
 
@@ -19,14 +23,43 @@ def crop_to_circle(image):
     output.paste(image, (0, 0), mask=mask)
     return output
 
+def show_readiness():
+    status = warmup.get_status()
+    if status["state"] == "warming":
+        st.caption(f"⏳ Warming up ({status['step'] or 'starting'})... first answers may be slower.")
+    elif status["state"] == "ready":
+        st.caption("🟢 Ready")
+    elif status["state"] == "error":
+        st.caption(f"🟠 Ready with errors: {status['error']}")
+
+def show_history():
+    """Draws the latest CHAT_RENDER_RECENT messages; older ones (and the summary) only on request."""
+    summary = st.session_state.get("history_summary")
+    verbatim = st.session_state.get("history_pending", []) + st.session_state.messages
+    shown = st.session_state.get("history_shown", config.CHAT_RENDER_RECENT)
+    hidden = len(verbatim) - shown
+
+    if summary and hidden <= 0:
+        with st.expander("📜 Earlier in this conversation (summary)"):
+            st.markdown(summary)
+    if hidden > 0 and st.button(f"⬆️ Show earlier messages ({hidden} more)"):
+        st.session_state.history_shown = shown + config.CHAT_RENDER_RECENT
+        st.rerun()
+
+    for msg in verbatim[-shown:]:
+        with st.chat_message(msg["role"]):
+            st.markdown(msg["content"])
+
 def main():
-    rag.initialize_knowledge_base()
+    # Once per server process (no-op on reruns): index check, models and workers load in the background
+    warmup.start()
 
     with st.sidebar:
         logo_path = "assets/logo.png"
         if os.path.exists(logo_path):
             st.image(crop_to_circle(Image.open(logo_path)), width=180)
         st.markdown("<p style='text-align: center; color: #555;'>Your Camping & Travel Companion</p>", unsafe_allow_html=True)
+        show_readiness()
         st.divider()
         menu = st.radio("Menu", ["Chat", "Admin Dashboard"])
         st.divider()
@@ -43,12 +76,8 @@ def main():
                     
                     if is_valid:
                         st.success("Invoice Verified!")
-                        # Store verified data in session
-                        if "booking_data" not in st.session_state: booking.init_booking_state()
-                        st.session_state.booking_data["verified_booking"] = b_data
-                        
-                        # Advance the Chat Flow
-                        response = booking.process_booking_input("INVOICE_VERIFIED", st.session_state.messages)
+                        # Store verified data in session and advance the Chat Flow
+                        response = booking.invoice_verified(b_data, history.context(st.session_state))
                         st.session_state.messages.append({"role": "assistant", "content": response})
                         st.rerun()
                     else:
@@ -61,6 +90,7 @@ def main():
                     st.success(result)
 
     if menu == "Admin Dashboard":
+        import admin_dashboard as admin  # pandas/plotly/export only load for the admin page
         admin.show_admin_panel()
     else:
         st.markdown("""<h1 style='color: #1B4D3E; font-size: 3rem;'>Hi, I'm Scout AI. 🏕️</h1>
@@ -70,9 +100,7 @@ def main():
         if "messages" not in st.session_state:
             st.session_state.messages = [{"role": "assistant", "content": "Hello! Ask me about Coorg, Wayanad, or Kodaikanal."}]
 
-        for msg in st.session_state.messages:
-            with st.chat_message(msg["role"]):
-                st.markdown(msg["content"])
+        show_history()
 
         # --- INTERACTIVE TABLE LOGIC ---
         if "selection_df" in st.session_state and st.session_state.booking_step == "WAITING_FOR_SELECTION":
@@ -94,20 +122,13 @@ def main():
                 st.info(f"You selected: **{selected_row['Package']}** on **{selected_row['Date']}**")
                 
                 if st.button("✅ Confirm Selection", type="primary"):
-                    # 1. Update Data
-                    st.session_state.booking_data["module_key"] = selected_row["module_key"]
-                    st.session_state.booking_data["date"] = selected_row["raw_date"]
-                    
-                    # 2. Add Visual Message
+                    # 1. Add Visual Message
                     user_msg = f"I select {selected_row['Package']} on {selected_row['Date']}"
                     st.session_state.messages.append({"role": "user", "content": user_msg})
                     
-                    # 3. Advance Flow (Send Secret Code)
-                    response = booking.process_booking_input("CONFIRMED_SELECTION", st.session_state.messages)
+                    # 2. Update Data, Advance Flow and Clean up
+                    response = booking.select_package(selected_row, history.context(st.session_state))
                     st.session_state.messages.append({"role": "assistant", "content": response})
-                    
-                    # 4. Clean up
-                    del st.session_state.selection_df
                     st.rerun()
                 # CHECK 2: Update Booking Table (THE NEW PART)
                 
@@ -130,20 +151,13 @@ def main():
                 st.info(f"New Date Selected: **{selected_row['Date']}**")
                 
                 if st.button("✅ Confirm New Date", type="primary"):
-                    # 1. Update the "new_date" field
-                    st.session_state.booking_data["new_date"] = selected_row["raw_date"]
-                    
-                    # 2. Add Visual Message
+                    # 1. Add Visual Message
                     user_msg = f"I select date: {selected_row['Date']}"
                     st.session_state.messages.append({"role": "user", "content": user_msg})
                     
-                    # 3. Advance Flow
-                    response = booking.process_booking_input("UPDATE_SELECTED", st.session_state.messages)
+                    # 2. Update "new_date", Advance Flow and Clean up
+                    response = booking.select_update_date(selected_row, history.context(st.session_state))
                     st.session_state.messages.append({"role": "assistant", "content": response})
-                    
-                    # 4. Clean up
-                    st.session_state.booking_step = "ASK_UPDATE_DETAILS" 
-                    del st.session_state.selection_df
                     st.rerun()
 
         # Chat Input
@@ -153,8 +167,7 @@ def main():
             
             with st.chat_message("assistant"):
                 with st.spinner("Thinking..."):
-                    booking_response = booking.process_booking_input(prompt, st.session_state.messages)
-                    final = booking_response if booking_response else rag.query_rag(prompt, st.session_state.messages)
+                    final = router.dispatch(prompt, history.context(st.session_state))
                     st.markdown(final)
                     st.session_state.messages.append({"role": "assistant", "content": final})
             
@@ -163,4 +176,11 @@ def main():
                 st.rerun()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    session_store.restore(st.session_state, st.query_params)
+    try:
+        with transcripts.session(st.session_state.get("_session_id")):
+            main()
+    finally:
+        # Runs on st.rerun() too, so every turn is compacted and saved before the script stops
+        history.compact(st.session_state)
+        session_store.persist(st.session_state)
\ No newline at end of file
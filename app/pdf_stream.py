@@ -0,0 +1,68 @@
+import io
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import config.config as config
+
+# --- IN-MEMORY PDF LOADING ---
+# Parses uploads straight from their buffer (no temp files) and extracts text one
+# page at a time, so callers that only need the first page never touch the rest.
+
+class PdfTooLarge(ValueError):
+    """The upload exceeds PDF_MAX_BYTES."""
+
+def _stream(source):
+    """A seekable binary stream over `source` without copying the upload's bytes where possible."""
+    if isinstance(source, str):
+        return open(source, "rb")
+    if isinstance(source, (bytes, bytearray)):
+        return io.BytesIO(source)  # shares the bytes object until written to
+    if isinstance(source, memoryview):
+        return io.BytesIO(source.tobytes())
+    # File-like (Streamlit's UploadedFile is a BytesIO): read it in place
+    source.seek(0)
+    return source
+
+def _size(stream):
+    if hasattr(stream, "getbuffer"):
+        return stream.getbuffer().nbytes
+    pos = stream.tell()
+    size = stream.seek(0, io.SEEK_END)
+    stream.seek(pos)
+    return size
+
+def iter_pdf_pages(source, name=None, max_pages=None, max_bytes=None):
+    """
+    Yields one langchain Document per page (metadata: source, page, total_pages), lazily.
+    source: path, bytes, memoryview or binary file-like. Stops after max_pages
+    (default config.PDF_MAX_PAGES); raises PdfTooLarge above max_bytes (default config.PDF_MAX_BYTES).
+    """
+    from pypdf import PdfReader
+    from langchain_core.documents import Document
+
+    max_pages = config.PDF_MAX_PAGES if max_pages is None else max_pages
+    max_bytes = config.PDF_MAX_BYTES if max_bytes is None else max_bytes
+    name = name or (source if isinstance(source, str) else getattr(source, "name", "upload.pdf"))
+
+    stream = _stream(source)
+    try:
+        size = _size(stream)
+        if max_bytes and size > max_bytes:
+            raise PdfTooLarge(f"{name} is {size / 1e6:.1f} MB (limit {max_bytes / 1e6:.0f} MB)")
+        reader = PdfReader(stream)
+        if reader.is_encrypted:
+            reader.decrypt("")
+        total = len(reader.pages)
+        for i in range(min(total, max_pages) if max_pages else total):
+            yield Document(
+                page_content=reader.pages[i].extract_text() or "",
+                metadata={"source": name, "page": i, "total_pages": total},
+            )
+    finally:
+        if isinstance(source, str):
+            stream.close()
+
+def load_pdf(source, name=None, max_pages=None, max_bytes=None):
+    """All pages (up to the cap) as a list, for callers that split the whole document."""
+    return list(iter_pdf_pages(source, name=name, max_pages=max_pages, max_bytes=max_bytes))
@@ -1,23 +1,48 @@
 import os
 import sys
+import threading
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 import config.config as config
 import models.llm as llm
+import pdf_stream
+import doc_chunker
+import index_snapshots
+import transcripts
+import tracing
+from history import split_summary, tail
 
-from langchain_community.document_loaders import PyPDFLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_community.vectorstores import FAISS
-from langchain_community.embeddings.fastembed import FastEmbedEmbeddings
-from langchain_core.messages import SystemMessage, HumanMessage, AIMessage
+# langchain / FAISS / FastEmbed are imported inside the functions that use them,
+# so importing this module (e.g. from main.py) stays cheap.
 
 # 1. SETUP EMBEDDINGS
+_embedding_model = None
+_embedding_lock = threading.Lock()
+
 def get_embedding_model():
-    return FastEmbedEmbeddings(model_name=config.EMBEDDING_MODEL)
+    """Returns the shared FastEmbed model (loaded once per process; other threads wait for it)."""
+    global _embedding_model
+    if _embedding_model is None:
+        with _embedding_lock, tracing.span("embed.model_load"):
+            if _embedding_model is None and config.EMBEDDING_BACKEND == "stub":
+                # Hash-based vectors (same size as bge-small) for offline load tests
+                from langchain_core.embeddings.fake import DeterministicFakeEmbedding
+                _embedding_model = DeterministicFakeEmbedding(size=384)
+            elif _embedding_model is None:
+                from langchain_community.embeddings.fastembed import FastEmbedEmbeddings
+                _embedding_model = FastEmbedEmbeddings(model_name=config.EMBEDDING_MODEL)
+    return _embedding_model
+
+def embedding_model_loaded():
+    return _embedding_model is not None
+
+# 2. INITIALIZE KNOWLEDGE BASE
+_kb_ready = False
+_kb_lock = threading.Lock()
 
-# 2. INITIALIZE KNOWLEDGE BASE (Same as before)
-def initialize_knowledge_base():
-    if os.path.exists(config.VECTOR_DB_PATH):
+def initialize_knowledge_base(force=False):
+    """Builds the FAISS index from docs/*.pdf and publishes it as a new version. Skipped if an index exists, unless force=True (admin re-index)."""
+    if index_snapshots.current_version() and not force:
         print(f"Knowledge Base found at {config.VECTOR_DB_PATH}")
         return
 
@@ -32,41 +57,119 @@ def initialize_knowledge_base():
     for filename in os.listdir(docs_folder):
         if filename.endswith(".pdf"):
             file_path = os.path.join(docs_folder, filename)
-            loader = PyPDFLoader(file_path)
-            all_docs.extend(loader.load())
+            all_docs.extend(pdf_stream.iter_pdf_pages(file_path, max_bytes=0))
 
-    if not all_docs: return
+    if not all_docs:
+        # Last document removed: drop the stale index rather than keep serving it
+        if force:
+            with index_snapshots.writer() as current:
+                if current:
+                    index_snapshots.clear()
+                reset_vector_store()
+        return
 
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-    chunks = text_splitter.split_documents(all_docs)
+    from langchain_community.vectorstores import FAISS
+    # One chunk per destination / module / policy section (see doc_chunker.py)
+    chunks = doc_chunker.split_documents(all_docs)
 
     embeddings = get_embedding_model()
-    vector_store = FAISS.from_documents(chunks, embeddings)
-    vector_store.save_local(config.VECTOR_DB_PATH)
+    with tracing.span("faiss.build", chunks=len(chunks)):
+        vector_store = FAISS.from_documents(chunks, embeddings)
+    with index_snapshots.writer() as current:
+        if current and not force:
+            return  # another process published one while we were building
+        with tracing.span("faiss.save"):
+            version = index_snapshots.publish(vector_store)
+        set_vector_store(vector_store, version)
     print(" Knowledge Base Built!")
 
+def ensure_knowledge_base():
+    """Process-level bootstrap: checks/builds the index once, not on every Streamlit rerun."""
+    global _kb_ready
+    if _kb_ready: return
+    with _kb_lock:
+        if not _kb_ready:
+            initialize_knowledge_base()
+            _kb_ready = True
+
+# --- SHARED VECTOR STORE ---
+# The index on disk is a series of immutable versions (index_snapshots.py). Each
+# process keeps one loaded (version, store) pair. Writers publish a new version
+# and swap the pair, so a query in flight keeps the store it started with. A
+# version published by another process (API vs. Streamlit) is picked up on the
+# next read.
+_snapshot = None  # (version, FAISS store)
+_store_lock = threading.Lock()
+
+def get_snapshot():
+    """(version, store) for the live index version, or None if no index has been built yet."""
+    global _snapshot
+    version = index_snapshots.current_version()
+    snapshot = _snapshot
+    if version is None:
+        return None
+    if snapshot and snapshot[0] == version:
+        return snapshot
+    # Newer version on disk: one thread loads it, the rest keep serving the one they have
+    if not _store_lock.acquire(blocking=snapshot is None):
+        return snapshot
+    try:
+        if _snapshot is None or _snapshot[0] != version:
+            from langchain_community.vectorstores import FAISS
+            embeddings = get_embedding_model()
+            with index_snapshots.pinned(version), tracing.span("faiss.load", version=version):
+                store = FAISS.load_local(index_snapshots.version_path(version), embeddings, allow_dangerous_deserialization=True)
+            _snapshot = (version, store)
+        return _snapshot
+    except Exception as e:
+        if snapshot is None: raise
+        print(f"Index load failed for {version}, serving {snapshot[0]}: {e}")
+        return snapshot
+    finally:
+        _store_lock.release()
+
+def get_vector_store():
+    """The loaded FAISS store of the live version, or None if no index has been built yet."""
+    snapshot = get_snapshot()
+    return snapshot[1] if snapshot else None
+
+def set_vector_store(vector_store, version):
+    global _snapshot
+    _snapshot = (version, vector_store) if vector_store is not None else None
+
+def reset_vector_store():
+    """Forces the next get_vector_store() to reload from disk."""
+    set_vector_store(None, None)
+
+def vector_store_loaded():
+    return _snapshot is not None
+
 # 3. ADD USER PDF 
 def add_user_pdf_to_db(uploaded_file):
     try:
-        temp_path = f"temp_{uploaded_file.name}"
-        with open(temp_path, "wb") as f:
-            f.write(uploaded_file.getbuffer())
-        
-        loader = PyPDFLoader(temp_path)
-        docs = loader.load()
-        os.remove(temp_path)
+        from langchain_community.vectorstores import FAISS
+        # Parsed straight from the upload buffer, capped at PDF_MAX_BYTES / PDF_MAX_PAGES
+        with tracing.span("pdf.parse"):
+            docs = pdf_stream.load_pdf(uploaded_file, name=uploaded_file.name)
 
-        text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-        new_chunks = text_splitter.split_documents(docs)
+        new_chunks = doc_chunker.split_documents(docs)
 
         embeddings = get_embedding_model()
-        if os.path.exists(config.VECTOR_DB_PATH):
-            vector_store = FAISS.load_local(config.VECTOR_DB_PATH, embeddings, allow_dangerous_deserialization=True)
-            vector_store.add_documents(new_chunks)
-        else:
-            vector_store = FAISS.from_documents(new_chunks, embeddings)
-        
-        vector_store.save_local(config.VECTOR_DB_PATH)
+        # Copy-on-write: load the live version, add to the copy, publish it as a new
+        # version. The shared store keeps serving queries until the swap.
+        with index_snapshots.writer() as base:
+            if base:
+                with index_snapshots.pinned(base), tracing.span("faiss.load", version=base):
+                    vector_store = FAISS.load_local(index_snapshots.version_path(base), embeddings, allow_dangerous_deserialization=True)
+                with tracing.span("faiss.add", chunks=len(new_chunks)):
+                    vector_store.add_documents(new_chunks)
+            else:
+                with tracing.span("faiss.build", chunks=len(new_chunks)):
+                    vector_store = FAISS.from_documents(new_chunks, embeddings)
+
+            with tracing.span("faiss.save"):
+                version = index_snapshots.publish(vector_store)
+            set_vector_store(vector_store, version)
         return "Document added to knowledge base!"
     except Exception as e:
         return f"Error adding document: {e}"
@@ -76,14 +179,16 @@ def rewrite_query(user_query, chat_history):
     """
     Uses LLM to rewrite "How much is it?" -> "How much is Kodaikanal Glamping?"
     """
+    from langchain_core.messages import SystemMessage
     groq = llm.get_chatgroq_model()
     
     # If no history, no need to rewrite
-    if not chat_history:
+    summary, chat_history = split_summary(chat_history)
+    if not chat_history and not summary:
         return user_query
 
-    # Convert last 3 messages to text for context
-    history_text = ""
+    # Convert last 3 messages (and the summary of older ones) to text for context
+    history_text = f"Earlier: {summary}\n" if summary else ""
     for msg in chat_history[-3:]:
         role = "User" if msg["role"] == "user" else "Bot"
         history_text += f"{role}: {msg['content']}\n"
@@ -101,55 +206,115 @@ def rewrite_query(user_query, chat_history):
     """
     
     try:
-        response = groq.invoke([SystemMessage(content=system_prompt)])
-        return response.content.strip()
+        with tracing.span("rag.rewrite"):
+            return transcripts.call("llm.rewrite", {"query": user_query},
+                                    lambda: groq.invoke([SystemMessage(content=system_prompt)]).content.strip())
     except:
         return user_query
 
 # 5. CONVERSATIONAL SEARCH (Updated)
+NO_KB_REPLY = "I don't have a knowledge base yet."
+ERROR_REPLY = "I'm having trouble thinking right now."
+
+def build_rag_messages(query_text, chat_history=[]):
+    """Rewrites the query, retrieves context and returns the prompt messages (None if there is no index)."""
+    # Replays stub the search, so they don't need an index on disk
+    snapshot = None if transcripts.replaying() else get_snapshot()
+    if snapshot is None and not transcripts.replaying():
+        return None
+    # The whole query reads the version it started with, even if a new one is published meanwhile
+    version, vector_store = snapshot or (None, None)
+
+    from langchain_core.messages import SystemMessage, HumanMessage, AIMessage
+
+    # A. REWRITE QUERY (The Fix)
+    search_query = rewrite_query(query_text, chat_history)
+    print(f"🔍 Searching PDF for: '{search_query}'") 
+
+    # B. Retrieve Context
+    with tracing.span("rag.retrieve"), index_snapshots.pinned(version):
+        texts = transcripts.call("vector_search", {"query": search_query, "k": 3, "rerank": config.RERANK_ENABLED},
+                                 lambda: retrieve(search_query, vector_store=vector_store))
+    context_text = "\n\n".join(texts)
+
+    # C. Build Prompt
+    system_prompt = f"""
+    You are Scout AI. Answer based on the CONTEXT below.
+    
+    CONTEXT:
+    {context_text}
+    
+    RULES:
+    1. Answer naturally.
+    2. If context mentions "Module B: Cloud Farm", and user asks about "Glamping", connect them.
+    3. Be honest about policies (No alcohol in forests).
+    """
+    summary, chat_history = split_summary(chat_history)
+    if summary:
+        system_prompt += f"""
+    EARLIER IN THIS CONVERSATION (summary):
+    {summary}
+    """
+
+    messages = [SystemMessage(content=system_prompt)]
+    for msg in chat_history[-5:]: 
+        if msg["role"] == "user":
+            messages.append(HumanMessage(content=msg["content"]))
+        else:
+            messages.append(AIMessage(content=msg["content"]))
+    messages.append(HumanMessage(content=query_text))
+    return messages
+
+def _search(search_query, k, vector_store=None):
+    # Embedding and the FAISS lookup are timed separately (similarity_search does both)
+    vector_store = vector_store or get_vector_store()
+    with tracing.span("embed.query"):
+        vector = get_embedding_model().embed_query(search_query)
+    with tracing.span("faiss.search", k=k):
+        return [doc.page_content for doc in vector_store.similarity_search_by_vector(vector, k=k)]
+
+def retrieve(search_query, k=3, vector_store=None):
+    """Context chunks for the prompt: the top k by vector search, or the reranked best of a wider set."""
+    if not config.RERANK_ENABLED:
+        return _search(search_query, k=k, vector_store=vector_store)
+    import reranker
+    candidates = _search(search_query, k=max(k, config.RERANK_CANDIDATES), vector_store=vector_store)
+    return reranker.rerank(search_query, candidates, baseline_k=k)
+
 def query_rag(query_text, chat_history=[]):
-    if not os.path.exists(config.VECTOR_DB_PATH):
-        return "I don't have a knowledge base yet."
+    entry = {"query": query_text, "history": tail(chat_history, 5)}
+    with transcripts.turn("rag", entry), tracing.span("rag.query"):
+        entry["reply"] = _answer(query_text, chat_history)
+    return entry["reply"]
 
+def _answer(query_text, chat_history):
     try:
-        # A. REWRITE QUERY (The Fix)
-        search_query = rewrite_query(query_text, chat_history)
-        print(f"🔍 Searching PDF for: '{search_query}'") 
+        messages = build_rag_messages(query_text, chat_history)
+        if messages is None:
+            return NO_KB_REPLY
+        with tracing.span("rag.answer"):
+            return transcripts.call("llm.answer", {"query": query_text}, lambda: llm.get_chatgroq_model().invoke(messages).content)
 
-        # B. Retrieve Context
-        embeddings = get_embedding_model()
-        vector_store = FAISS.load_local(config.VECTOR_DB_PATH, embeddings, allow_dangerous_deserialization=True)
-        docs = vector_store.similarity_search(search_query, k=3) 
-        context_text = "\n\n".join([doc.page_content for doc in docs])
-
-        # C. Generate Answer
-        groq = llm.get_chatgroq_model()
-        system_prompt = f"""
-        You are Scout AI. Answer based on the CONTEXT below.
-        
-        CONTEXT:
-        {context_text}
-        
-        RULES:
-        1. Answer naturally.
-        2. If context mentions "Module B: Cloud Farm", and user asks about "Glamping", connect them.
-        3. Be honest about policies (No alcohol in forests).
-        """
-
-        messages = [SystemMessage(content=system_prompt)]
-        for msg in chat_history[-5:]: 
-            if msg["role"] == "user":
-                messages.append(HumanMessage(content=msg["content"]))
-            else:
-                messages.append(AIMessage(content=msg["content"]))
-        messages.append(HumanMessage(content=query_text))
+    except Exception as e:
+        print(f"RAG Error: {e}")
+        return ERROR_REPLY
 
-        response = groq.invoke(messages)
-        return response.content
+def stream_rag(query_text, chat_history=[]):
+    """Same answer as query_rag, yielded as text chunks while the model generates it."""
+    try:
+        # Only the preparation is traced: a span must not stay open across yields
+        with tracing.span("rag.stream.prepare"):
+            messages = build_rag_messages(query_text, chat_history)
+        if messages is None:
+            yield NO_KB_REPLY
+            return
+        for chunk in llm.get_chatgroq_model().stream(messages):
+            if chunk.content:
+                yield chunk.content
 
     except Exception as e:
         print(f"RAG Error: {e}")
-        return "I'm having trouble thinking right now."
+        yield ERROR_REPLY
 
 if __name__ == "__main__":
     initialize_knowledge_base()
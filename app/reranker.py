@@ -0,0 +1,96 @@
+import os
+import re
+import sys
+import time
+import hashlib
+import threading
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import config.config as config
+from db.cache import TTLCache
+import tracing
+
+# --- CROSS-ENCODER RERANK (optional, RERANK_ENABLED) ---
+# Retrieval fetches RERANK_CANDIDATES chunks with the bi-encoder (cheap). A small
+# local cross-encoder (FastEmbed TextCrossEncoder) then scores each (query, chunk)
+# pair, and only the best RERANK_TOP_N chunks go into the prompt. Scores are
+# cached per (query, chunk), so repeated questions and follow-up rewrites skip
+# the model.
+
+STATS = {
+    "calls": 0, "pairs": 0, "scored": 0, "rerank_ms": 0.0,
+    "candidate_chars": 0, "kept_chars": 0, "baseline_chars": 0,
+}
+
+_model = None
+_model_lock = threading.Lock()
+_scores = TTLCache(maxsize=config.RERANK_CACHE_SIZE, ttl=config.RERANK_CACHE_TTL_SECONDS)
+
+class StubReranker:
+    """Offline stand-in (EMBEDDING_BACKEND=stub): word-overlap score, same interface as TextCrossEncoder."""
+
+    def rerank(self, query, documents, batch_size=64):
+        words = set(re.findall(r"\w+", query.lower()))
+        for doc in documents:
+            doc_words = set(re.findall(r"\w+", doc.lower()))
+            yield len(words & doc_words) / (len(words) or 1)
+
+def get_reranker():
+    """Returns the shared cross-encoder (loaded once per process)."""
+    global _model
+    if _model is None:
+        with _model_lock, tracing.span("rerank.model_load"):
+            if _model is None and config.EMBEDDING_BACKEND == "stub":
+                _model = StubReranker()
+            elif _model is None:
+                from fastembed.rerank.cross_encoder import TextCrossEncoder
+                _model = TextCrossEncoder(model_name=config.RERANK_MODEL)
+    return _model
+
+def _key(query, text):
+    return (query, hashlib.sha1(text.encode("utf-8")).hexdigest())
+
+def rerank(query, texts, top_n=None, baseline_k=3):
+    """
+    The top_n of `texts` by cross-encoder score, best first.
+    `baseline_k` is what would have been sent without reranking (for the token metrics).
+    """
+    top_n = top_n or config.RERANK_TOP_N
+    if len(texts) <= 1:
+        return list(texts)
+    start = time.perf_counter()
+    with tracing.span("rerank", candidates=len(texts)):
+        scores = {}
+        missing = []
+        for text in dict.fromkeys(texts):
+            found, score = _scores.get(_key(query, text))
+            if found:
+                scores[text] = score
+            else:
+                missing.append(text)
+        if missing:
+            for text, score in zip(missing, get_reranker().rerank(query, missing)):
+                scores[text] = float(score)
+                _scores.set(_key(query, text), float(score))
+        kept = sorted(dict.fromkeys(texts), key=lambda t: -scores[t])[:top_n]
+
+    STATS["calls"] += 1
+    STATS["pairs"] += len(texts)
+    STATS["scored"] += len(missing)
+    STATS["rerank_ms"] += (time.perf_counter() - start) * 1000
+    STATS["candidate_chars"] += sum(len(t) for t in texts)
+    STATS["kept_chars"] += sum(len(t) for t in kept)
+    STATS["baseline_chars"] += sum(len(t) for t in texts[:baseline_k])
+    return kept
+
+def get_stats():
+    calls = STATS["calls"]
+    baseline = STATS["baseline_chars"]
+    return {
+        **STATS,
+        "avg_rerank_ms": STATS["rerank_ms"] / calls if calls else 0.0,
+        "cache": _scores.stats(),
+        # ~4 characters per token for English text
+        "context_tokens_saved_per_answer": (baseline - STATS["kept_chars"]) / 4 / calls if calls else 0.0,
+        "context_reduction_vs_top_k": 1 - STATS["kept_chars"] / baseline if baseline else 0.0,
+    }
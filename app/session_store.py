@@ -0,0 +1,276 @@
+import os
+import sys
+import json
+import time
+import uuid
+import zlib
+import sqlite3
+import threading
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import config.config as config
+
+# Conversation keys that must survive restarts and move between worker processes
+SESSION_KEYS = ["booking_step", "booking_data", "selection_df", "messages",
+                "history_summary", "history_pending", "history_job"]
+
+STORE_STATS = {"reads": 0, "read_ms": 0.0, "writes": 0, "write_ms": 0.0, "skipped_writes": 0, "conflicts": 0}
+
+class VersionConflict(Exception):
+    """Raised when another process saved the session after we loaded it."""
+
+class SessionState(dict):
+    """A plain dict with attribute access, standing in for st.session_state outside Streamlit (HTTP API)."""
+
+    def __getattr__(self, key):
+        try:
+            return self[key]
+        except KeyError:
+            raise AttributeError(key)
+
+    def __setattr__(self, key, value):
+        self[key] = value
+
+    def __delattr__(self, key):
+        try:
+            del self[key]
+        except KeyError:
+            raise AttributeError(key)
+
+# --- SERIALIZATION (compact JSON + zlib, DataFrames as 'split' dicts) ---
+def _encode_value(value):
+    pd = sys.modules.get("pandas")  # no pandas import yet means no DataFrame to encode
+    if pd is not None and isinstance(value, pd.DataFrame):
+        return {"__df__": value.to_dict(orient="split")}
+    return value
+
+def _decode_value(value):
+    if isinstance(value, dict) and "__df__" in value:
+        import pandas as pd
+        split = value["__df__"]
+        return pd.DataFrame(split["data"], index=split["index"], columns=split["columns"])
+    return value
+
+def serialize_state(state):
+    payload = {k: _encode_value(state[k]) for k in SESSION_KEYS if k in state}
+    raw = json.dumps(payload, separators=(",", ":"), default=str, ensure_ascii=False)
+    return zlib.compress(raw.encode("utf-8"))
+
+def deserialize_state(blob):
+    payload = json.loads(zlib.decompress(blob).decode("utf-8"))
+    return {k: _decode_value(v) for k, v in payload.items()}
+
+# --- CONFLICT MERGE ---
+# A turn's side effects (booking created, email queued) have already happened by
+# the time it saves, so a lost save race must not drop the turn. The turn's own
+# changes (local vs. the base it loaded) win; keys it didn't touch take the other
+# writer's value, and messages both sides appended are kept, theirs first.
+
+def _same(a, b):
+    dump = lambda v: json.dumps(_encode_value(v), separators=(",", ":"), default=str, sort_keys=True)
+    return dump(a) == dump(b)
+
+def merge_states(base, local, remote):
+    merged = dict(remote)
+    for key in SESSION_KEYS:
+        if key == "messages" or _same(local.get(key), base.get(key)):
+            continue
+        if key in local:
+            merged[key] = local[key]
+        else:
+            merged.pop(key, None)
+    base_msgs, local_msgs = base.get("messages") or [], local.get("messages") or []
+    if _same(local_msgs[:len(base_msgs)], base_msgs):
+        merged["messages"] = (remote.get("messages") or []) + local_msgs[len(base_msgs):]
+    else:
+        merged["messages"] = local_msgs  # rewritten this turn (compaction): ours is the consistent copy
+    return merged
+
+def save_merged(session_id, state, attempts=3):
+    """
+    Saves the conversation keys of `state` at its loaded version; on VersionConflict merges
+    the newer copy into `state` (merge_states) and retries. Returns the blob written.
+    `state` carries "_session_version" and "_session_base" (the blob it was loaded from).
+    """
+    store = get_session_store()
+    blob = serialize_state(state)
+    for attempt in range(attempts):
+        try:
+            state["_session_version"] = store.save(session_id, blob, state.get("_session_version", 0))
+            state["_session_base"] = blob
+            return blob
+        except VersionConflict as e:
+            STORE_STATS["conflicts"] += 1
+            if attempt == attempts - 1:
+                raise
+            print(f"Session Conflict: {e}; merging this turn into the newer copy")
+            version, remote_blob = store.load(session_id)
+            base = deserialize_state(state["_session_base"]) if state.get("_session_base") else {}
+            remote = deserialize_state(remote_blob) if remote_blob is not None else {}
+            merged = merge_states(base, {k: state[k] for k in SESSION_KEYS if k in state}, remote)
+            for key in SESSION_KEYS:
+                if key not in merged and key in state:
+                    del state[key]
+            state.update(merged)
+            state["_session_version"], state["_session_base"] = version, remote_blob
+            blob = serialize_state(state)
+
+# --- BACKENDS ---
+class InMemorySessionStore:
+    """Process-local store. Default; survives reconnects but not restarts."""
+
+    def __init__(self):
+        self._rows = {}
+        self._lock = threading.Lock()
+
+    def load(self, session_id):
+        """Returns (version, blob). Version 0 means the session is new."""
+        with self._lock:
+            return self._rows.get(session_id, (0, None))
+
+    def save(self, session_id, blob, expected_version):
+        """Writes only if nobody saved since `expected_version`. Returns the new version."""
+        with self._lock:
+            current, _ = self._rows.get(session_id, (0, None))
+            if current != expected_version:
+                raise VersionConflict(f"Session {session_id}: expected v{expected_version}, found v{current}")
+            self._rows[session_id] = (current + 1, blob)
+            return current + 1
+
+    def delete(self, session_id):
+        with self._lock:
+            self._rows.pop(session_id, None)
+
+class SQLiteSessionStore:
+    """Durable store shared by every app process on the host (SQLite in WAL mode)."""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            " session_id TEXT PRIMARY KEY, version INTEGER NOT NULL,"
+            " payload BLOB NOT NULL, updated_at REAL NOT NULL)"
+        )
+        conn.commit()
+
+    def _conn(self):
+        # sqlite3 connections can't be shared across threads; keep one per thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def load(self, session_id):
+        row = self._conn().execute(
+            "SELECT version, payload FROM sessions WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        return (row[0], row[1]) if row else (0, None)
+
+    def save(self, session_id, blob, expected_version):
+        conn = self._conn()
+        with conn:
+            if expected_version == 0:
+                cur = conn.execute(
+                    "INSERT OR IGNORE INTO sessions (session_id, version, payload, updated_at) VALUES (?, 1, ?, ?)",
+                    (session_id, blob, time.time()),
+                )
+            else:
+                cur = conn.execute(
+                    "UPDATE sessions SET version = version + 1, payload = ?, updated_at = ?"
+                    " WHERE session_id = ? AND version = ?",
+                    (blob, time.time(), session_id, expected_version),
+                )
+        if cur.rowcount != 1:
+            raise VersionConflict(f"Session {session_id}: v{expected_version} is stale")
+        return expected_version + 1
+
+    def delete(self, session_id):
+        conn = self._conn()
+        with conn:
+            conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+_store = None
+
+def get_session_store():
+    """Returns the configured backend (SESSION_BACKEND = 'memory' | 'sqlite')."""
+    global _store
+    if _store is None:
+        if config.SESSION_BACKEND == "sqlite":
+            _store = SQLiteSessionStore(config.SESSION_DB_PATH)
+        else:
+            _store = InMemorySessionStore()
+    return _store
+
+# --- STREAMLIT ADAPTER ---
+def _apply(session_state, blob):
+    restored = deserialize_state(blob)
+    for key in SESSION_KEYS:
+        if key not in restored and key in session_state:
+            del session_state[key]
+    session_state.update(restored)
+    session_state["_session_blob_crc"] = zlib.crc32(blob)
+    session_state["_session_base"] = blob
+
+def get_session_id(query_params):
+    """Session IDs travel in the URL (?sid=...) so any worker can pick the conversation up."""
+    session_id = query_params.get("sid")
+    if not session_id:
+        session_id = uuid.uuid4().hex
+        query_params["sid"] = session_id
+    return session_id
+
+def restore(session_state, query_params):
+    """Loads the shared copy into st.session_state if another process wrote a newer version."""
+    session_id = get_session_id(query_params)
+    session_state["_session_id"] = session_id
+
+    start = time.perf_counter()
+    version, blob = get_session_store().load(session_id)
+    if blob is not None and version != session_state.get("_session_version"):
+        _apply(session_state, blob)
+    session_state["_session_version"] = version
+    elapsed = (time.perf_counter() - start) * 1000
+
+    STORE_STATS["reads"] += 1
+    STORE_STATS["read_ms"] += elapsed
+    return elapsed
+
+def persist(session_state):
+    """Saves the conversation keys; skips the write when nothing changed this turn."""
+    session_id = session_state.get("_session_id")
+    if not session_id: return 0.0
+
+    start = time.perf_counter()
+    blob = serialize_state(session_state)
+    crc = zlib.crc32(blob)
+    if crc == session_state.get("_session_blob_crc"):
+        STORE_STATS["skipped_writes"] += 1
+        return 0.0
+
+    try:
+        # Another worker saved first: this turn is merged into its copy, never dropped
+        session_state["_session_blob_crc"] = zlib.crc32(save_merged(session_id, session_state))
+    except VersionConflict as e:
+        # Still racing after the retries: keep this turn in memory and tell the user
+        print(f"Session Conflict: {e}")
+        session_state.setdefault("messages", []).append({"role": "assistant", "content": (
+            "⚠️ This conversation was changed from another tab or window at the same time, "
+            "so this turn could not be saved. Please reload before continuing.")})
+    elapsed = (time.perf_counter() - start) * 1000
+
+    STORE_STATS["writes"] += 1
+    STORE_STATS["write_ms"] += elapsed
+    return elapsed
+
+def get_store_stats():
+    reads, writes = STORE_STATS["reads"], STORE_STATS["writes"]
+    return {
+        **STORE_STATS,
+        "avg_read_ms": STORE_STATS["read_ms"] / reads if reads else 0.0,
+        "avg_write_ms": STORE_STATS["write_ms"] / writes if writes else 0.0,
+    }
@@ -1,26 +1,48 @@
-import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
+from email.mime.application import MIMEApplication
 import os
 import sys
 import json
 from datetime import datetime, timedelta
-import pandas as pd
-from langchain_community.document_loaders import PyPDFLoader
 import re
-from supabase import create_client, Client # Added for Supabase
 
 # Add parent directory to path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 import config.config as config
+import db.database as database
+from db.outbox import get_outbox
+import mail_outbox
+import invoice
+import pdf_stream
+import tracing
 
-# --- INITIALIZE SUPABASE CLIENT ---
-# Uses the credentials you added to config.py
-try:
-    supabase: Client = create_client(config.SUPABASE_URL, config.SUPABASE_KEY)
-except Exception as e:
-    print(f"Warning: Supabase client init failed: {e}")
-    supabase = None
+# --- DATA LAYER (created on first use, not at import) ---
+# Backend (Supabase or local SQLite) is chosen by config.DB_BACKEND
+def get_repo():
+    return database.get_repository()
+
+_outbox_unavailable = False
+
+def get_booking_outbox():
+    """
+    New bookings are acknowledged from a local outbox and flushed to the backend in the background.
+    Returns None when disabled or when the outbox can't be opened (writes then go direct).
+    """
+    global _outbox_unavailable
+    if not config.OUTBOX_ENABLED or _outbox_unavailable:
+        return None
+    try:
+        return get_outbox()
+    except Exception as e:
+        print(f"Warning: Booking outbox unavailable, writing directly: {e}")
+        _outbox_unavailable = True
+        return None
+
+def resolve_booking_id(booking_id):
+    """The ID a booking is stored under: the outbox re-keys a booking whose ID another host already used."""
+    outbox = get_booking_outbox()
+    return outbox.resolve(booking_id) if outbox is not None else booking_id
 
 # --- HELPER: CALCULATE END DATE ---
 def calculate_end_date(start_date_str, nights):
@@ -31,7 +53,30 @@ def calculate_end_date(start_date_str, nights):
         return end.strftime("%Y-%m-%d")
     except: return start_date_str
 
-# --- DB TOOLS (MODIFIED FOR SUPABASE) ---
+# --- EMAIL DELIVERY ---
+# Confirmations are delivered after the chat turn, so a booking is rolled back only
+# if its email can't even be queued. One whose email later fails for good (bad
+# address, retries exhausted) is kept but marked EMAIL_FAILED_STATUS for the admin.
+EMAIL_FAILED_STATUS = "Email Failed"
+
+def queue_email(to_email, msg, booking_id=None):
+    """Hands a rendered message to the background mail dispatcher (local disk write, no SMTP round-trip)."""
+    with tracing.span("smtp.enqueue"):
+        mail_outbox.get_mail_outbox().enqueue(to_email, msg, booking_id=booking_id)
+    return True
+
+def mark_email_failed(booking_id, error):
+    print(f"Confirmation email for booking #{booking_id} failed: {error}")
+    booking_id = resolve_booking_id(booking_id)
+    # Still queued locally (backend slow or down): the flush stores it with the new status
+    outbox = get_booking_outbox()
+    if outbox is not None and outbox.patch(booking_id, {"status": EMAIL_FAILED_STATUS}):
+        return
+    get_repo().update_booking(booking_id, {"status": EMAIL_FAILED_STATUS})
+
+mail_outbox.FAILURE_LISTENERS.append(mark_email_failed)
+
+# --- DB TOOLS (via db/database.py repository) ---
 def create_booking(name, email, phone, location, module, start_date, nights, guests, total_cost):
     try:
         # 1. Prepare Data
@@ -41,77 +86,89 @@ def create_booking(name, email, phone, location, module, start_date, nights, gue
         # Construct the 'service_type' string required by your logic
         service_details = f"{location} | {module}"
         
-        # 2. Handle Customer (Check if exists)
-        response = supabase.table("customers").select("id").eq("email", email).execute()
-        
-        if response.data:
-            customer_id = response.data[0]['id']
-        else:
-            # Create new customer
-            new_customer = {"name": name, "email": email, "phone": phone}
-            cust_res = supabase.table("customers").insert(new_customer).execute()
-            customer_id = cust_res.data[0]['id']
+        # 2. Customer is upserted by email in the same round-trip as the booking
+        customer = {"name": name, "email": email, "phone": phone}
             
         # 3. Insert Booking
         new_booking = {
-            "customer_id": customer_id,
             "service_type": service_details, # Kept for compatibility
             "location": location,
             "module_name": module,
-            "booking_date": date_range_str, # Storing range as string
-            # "start_date": start_date, # Optional: Add these columns to Supabase if needed
-            # "end_date": end_date,
+            "booking_date": date_range_str, # Display string, kept for compatibility
+            "start_date": start_date,
+            "end_date": end_date,
             "guest_count": guests,
             "total_cost": total_cost,
             "status": "Confirmed"
         }
         
-        book_res = supabase.table("bookings").insert(new_booking).execute()
-        booking_id = book_res.data[0]['id']
+        outbox = get_booking_outbox()
+        if outbox is not None:
+            return outbox.enqueue_booking(customer, new_booking)
+        booking_id = get_repo().create_booking_with_customer(customer, new_booking)
         
         return booking_id
     except Exception as e:
-        print(f"Supabase DB Error: {e}")
+        print(f"DB Error: {e}")
         return None
 
 def delete_booking(booking_id):
     try:
-        supabase.table("bookings").delete().eq("id", booking_id).execute()
-        return True
+        # Not flushed yet: dropping it locally is enough (a flush in flight reverts it)
+        booking_id = resolve_booking_id(booking_id)
+        outbox = get_booking_outbox()
+        if outbox is not None and outbox.discard(booking_id):
+            return True
+        return get_repo().delete_booking(booking_id)
     except: return False
 
 def get_bookings_by_email(email):
     try:
-        # Get Customer ID
-        res = supabase.table("customers").select("id").eq("email", email).execute()
-        if not res.data: return []
-        cust_id = res.data[0]['id']
-        
-        # Get Bookings
-        book_res = supabase.table("bookings").select("id, service_type, booking_date, status").eq("customer_id", cust_id).execute()
-        return book_res.data
+        return get_repo().get_bookings_by_email(email)
     except: return []
 
-# --- AVAILABILITY TOOL (Mock Logic - Unchanged) ---
+# --- AVAILABILITY TOOL (static capacity minus guests already booked) ---
+def _occupies(stay, day):
+    """A stay holds its nights: start_date up to, not including, the checkout day (a one-day stay holds its day)."""
+    return stay["start_date"] <= day < stay["end_date"] or stay["start_date"] == day
+
+def _slots_left(module, day, booked_guests):
+    slots = module["capacity"]
+    if day.endswith("1"): slots = 2
+    return max(slots - booked_guests, 0)
+
+def _booked_stays(start, end, location, module_name=None):
+    try:
+        return get_repo().query_bookings_in_range(start, end, location=location, module_name=module_name)
+    except Exception as e:
+        print(f"Occupancy Lookup Error: {e}")
+        return []
+
 def check_availability(location, module_key, date, guests_requested):
     try:
         base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
         with open(os.path.join(base_dir, "app", "data", "logistics.json"), "r") as f:
             data = json.load(f)
         
-        max_cap = data["destinations"][location]["modules"][module_key]["capacity"]
+        module = data["destinations"][location]["modules"][module_key]
+        max_cap = module["capacity"]
         
         if date.endswith("05") or date.endswith("25"):
             return False, f"Sorry, {date} is sold out! (Max capacity: {max_cap})"
-        
-        if guests_requested > max_cap:
-            return False, f"We only have {max_cap} slots left. You asked for {guests_requested}."
+
+        # Same occupancy rule as the availability table
+        booked = sum(b["guest_count"] or 0 for b in _booked_stays(date, date, location, module["name"]) if _occupies(b, date))
+        slots = _slots_left(module, date, booked)
+        if guests_requested > slots:
+            if not slots:
+                return False, f"Sorry, {module['name']} is sold out on {date}."
+            return False, f"We only have {slots} slots left. You asked for {guests_requested}."
             
-        return True, f"Available! ({max_cap} slots open)"
+        return True, f"Available! ({slots} slots open)"
     except:
         return True, "Available" 
 
-# --- RICH EMAIL TOOL (Unchanged) ---
+# --- RICH EMAIL TOOL ---
 def send_rich_email(to_email, name, booking_id, details):
     if "your_email" in config.SENDER_EMAIL:
         print(f" [SIMULATION] Rich Email sent to {to_email}")
@@ -121,7 +178,7 @@ def send_rich_email(to_email, name, booking_id, details):
         # Calculate End Date for display
         end_date = calculate_end_date(details['date'], details['nights'])
         
-        msg = MIMEMultipart("alternative")
+        msg = MIMEMultipart("mixed")
         msg['From'] = config.SENDER_EMAIL
         msg['To'] = to_email
         msg['Subject'] = f"Booking Confirmed! (ID: #{booking_id}) - Scout AI"
@@ -142,35 +199,28 @@ def send_rich_email(to_email, name, booking_id, details):
                 <p><strong>Itinerary:</strong> {details['itinerary']}</p>
                 <p><strong>Food:</strong> {details['food']}</p>
                 <p style="color: #666; font-size: 12px;">Policy: {details['policy']}</p>
+                <p>Your invoice is attached. Upload it in the chat to update or cancel this booking.</p>
             </div>
         </body>
         </html>
         """
         msg.attach(MIMEText(html_content, 'html'))
+
+        # Signed invoice PDF (booking ID + checksum in its metadata, see app/invoice.py)
+        try:
+            with tracing.span("invoice.render"):
+                pdf_bytes = invoice.generate_invoice(booking_id, name, to_email, {**details, "end_date": end_date})
+            attachment = MIMEApplication(pdf_bytes, _subtype="pdf")
+            attachment.add_header("Content-Disposition", "attachment", filename=f"ScoutAI_Invoice_{booking_id}.pdf")
+            msg.attach(attachment)
+        except Exception as e:
+            print(f"Invoice Error: {e}")
         
-        server = smtplib.SMTP('smtp.gmail.com', 587)
-        server.starttls()
-        server.login(config.SENDER_EMAIL, config.SENDER_PASSWORD)
-        server.sendmail(config.SENDER_EMAIL, to_email, msg.as_string())
-        server.quit()
-        return True
+        return queue_email(to_email, msg, booking_id=booking_id)
     except Exception as e:
         print(f"Email Error: {e}")
         return False
 
-# --- UPDATED: GET UPCOMING DATES (Unchanged) ---
-def get_availability_preview():
-    today = datetime.now()
-    available_dates = []
-    for i in range(30):
-        future_date = today + timedelta(days=i)
-        if future_date.weekday() in [4, 5]: # Fri, Sat
-            d_str = future_date.strftime("%Y-%m-%d")
-            if not (d_str.endswith("05") or d_str.endswith("25")):
-                available_dates.append(future_date.strftime("%d-%b (%a)"))
-                if len(available_dates) >= 4: break
-    return ", ".join(available_dates)
-
 # --- UPDATED: GENERATE AVAILABILITY TABLE (Unchanged) ---
 def get_availability_df(location, filter_module=None):
     try:
@@ -198,11 +248,20 @@ def get_availability_df(location, filter_module=None):
         if filter_module and filter_module in modules_to_show:
             modules_to_show = {filter_module: modules_to_show[filter_module]}
 
+        # Guests already booked per (module, date): one indexed range lookup for the window
+        booked = {}
+        if valid_dates:
+            stays = _booked_stays(valid_dates[0][0], valid_dates[-1][0], location.lower())
+            for b in stays:
+                for d_raw, _ in valid_dates:
+                    if _occupies(b, d_raw):
+                        key = (b["module_name"], d_raw)
+                        booked[key] = booked.get(key, 0) + (b["guest_count"] or 0)
+
         for mod_key, mod_val in modules_to_show.items():
             for d_raw, d_pretty in valid_dates:
-                slots = mod_val["capacity"]
-                if d_raw.endswith("1"): slots = 2
-                status = f" {slots} Slots" if slots > 5 else f" Only {slots} left"
+                slots = _slots_left(mod_val, d_raw, booked.get((mod_val["name"], d_raw), 0))
+                status = f" {slots} Slots" if slots > 5 else (f" Only {slots} left" if slots else " Sold out")
                 
                 table_rows.append({
                     "Package": mod_val["name"],
@@ -213,55 +272,51 @@ def get_availability_df(location, filter_module=None):
                     "module_key": mod_key
                 })
 
+        import pandas as pd
         return pd.DataFrame(table_rows)
     except Exception as e:
         print(f"Table Error: {e}")
         return None
     
-# --- PDF VERIFICATION TOOL (MODIFIED FOR SUPABASE) ---
+# --- PDF VERIFICATION TOOL ---
 def verify_booking_from_pdf(uploaded_file):
     try:
-        # 1. Save Temp File
-        temp_path = f"temp_invoice_{uploaded_file.name}"
-        with open(temp_path, "wb") as f:
-            f.write(uploaded_file.getbuffer())
-            
-        # 2. Extract Text
-        loader = PyPDFLoader(temp_path)
-        pages = loader.load()
-        full_text = "\n".join([p.page_content for p in pages])
-        os.remove(temp_path) 
-        
-        booking_id = None
-        # 3. Find Booking ID
-        match = re.search(r"Booking\s*ID.*?#\s*(\d+)", full_text, re.IGNORECASE | re.DOTALL)
-        
-        if not match:
-            # Fallback: Sometimes PDFs extract as "Booking ID: 22" (No hash)
-            match = re.search(r"Booking\s*ID[^\d]+(\d+)", full_text, re.IGNORECASE | re.DOTALL)
+        # 1. Fast path: signed tag in the metadata of invoices we generated (no page parsing)
+        with tracing.span("invoice.read_tag"):
+            tag = invoice.read_tag(uploaded_file)
+        if tag:
+            booking_id, signature = tag
+        else:
+            # 2. Legacy invoices: scan page text in memory, stopping at the first page with a match
+            signature = None
+            match = None
+            with tracing.span("pdf.scan_pages"):
+                for page in pdf_stream.iter_pdf_pages(uploaded_file, name=uploaded_file.name):
+                    match = re.search(r"Booking\s*ID.*?#\s*(\d+)", page.page_content, re.IGNORECASE | re.DOTALL)
 
-        if not match:
-            return False, None, "Could not find 'Booking ID' followed by a number in this document."
-            
-        booking_id = int(match.group(1))
+                    if not match:
+                        # Fallback: Sometimes PDFs extract as "Booking ID: 22" (No hash)
+                        match = re.search(r"Booking\s*ID[^\d]+(\d+)", page.page_content, re.IGNORECASE | re.DOTALL)
+                    if match: break
+
+            if not match:
+                return False, None, "Could not find 'Booking ID' followed by a number in this document."
+                
+            booking_id = int(match.group(1))
         
-        # 4. Verify in Supabase
-        # Join requires explicit 2-step fetch in Supabase unless using views/RPC
-        # Step A: Get Booking
-        book_res = supabase.table("bookings").select("*").eq("id", booking_id).execute()
-        if not book_res.data:
+        # 3. Verify in DB (booking + customer in one joined read)
+        stored_id = resolve_booking_id(booking_id)
+        full_details = get_repo().get_booking_with_customer(stored_id)
+        outbox = get_booking_outbox()
+        if not full_details and outbox is not None:
+            full_details = outbox.lookup(stored_id)  # confirmed moments ago, still queued locally
+        if not full_details:
             return False, None, f"Booking ID #{booking_id} not found."
-            
-        booking = book_res.data[0]
-        
-        # Step B: Get Customer
-        cust_res = supabase.table("customers").select("email, name").eq("id", booking['customer_id']).execute()
-        customer = cust_res.data[0] if cust_res.data else {}
-        
-        # Combine
-        full_details = {**booking, **customer}
+
+        if signature and not invoice.check_signature(booking_id, signature, full_details.get("email")):
+            return False, None, "This invoice's signature does not match our records."
         
-        if booking["status"] == "Cancelled":
+        if full_details["status"] == "Cancelled":
             return False, None, f"Booking #{booking_id} is already cancelled."
 
         return True, full_details, f" Verified Invoice for Booking #{booking_id}."
@@ -269,7 +324,7 @@ def verify_booking_from_pdf(uploaded_file):
     except Exception as e:
         return False, None, f"Verification Error: {e}"
 
-# --- SEND CANCELLATION EMAIL (Unchanged) ---
+# --- SEND CANCELLATION EMAIL ---
 def send_cancellation_email(to_email, name, booking_id):
     if "your_email" in config.SENDER_EMAIL:
         return True 
@@ -290,31 +345,40 @@ def send_cancellation_email(to_email, name, booking_id):
         """
         msg.attach(MIMEText(body, 'plain'))
         
-        server = smtplib.SMTP('smtp.gmail.com', 587)
-        server.starttls()
-        server.login(config.SENDER_EMAIL, config.SENDER_PASSWORD)
-        server.sendmail(config.SENDER_EMAIL, to_email, msg.as_string())
-        server.quit()
-        return True
+        return queue_email(to_email, msg)
     except: return False
 
-# --- UPDATE BOOKING (MODIFIED FOR SUPABASE) ---
-def update_booking_details(booking_id, new_date, new_guests, new_total):
-    """Updates the date, guests, and total cost for an existing booking."""
+# --- UPDATE BOOKING ---
+def update_booking_details(booking_id, new_date, new_guests, new_total, old_date=None):
+    """
+    Updates the date, guests, and total cost for an existing booking.
+    A bare new start date keeps the stay length of old_date ("start to end").
+    """
     try:
+        start_date, end_date = database.parse_date_range(new_date)
+        old_start, old_end = database.parse_date_range(old_date)
+        if start_date and start_date == end_date and " to " not in str(new_date) and old_start:
+            nights = (datetime.strptime(old_end, "%Y-%m-%d") - datetime.strptime(old_start, "%Y-%m-%d")).days
+            end_date = calculate_end_date(start_date, nights)
+        # Still queued locally: push it out first so the update has a row to hit
+        booking_id = resolve_booking_id(booking_id)
+        outbox = get_booking_outbox()
+        if outbox is not None and outbox.lookup(booking_id):
+            outbox.flush()
         update_data = {
-            "booking_date": new_date, # Assuming simple string update
+            "booking_date": f"{start_date} to {end_date}" if start_date else new_date,
+            "start_date": start_date,
+            "end_date": end_date,
             "guest_count": new_guests,
             "total_cost": new_total
         }
         
-        supabase.table("bookings").update(update_data).eq("id", booking_id).execute()
-        return True
+        return get_repo().update_booking(booking_id, update_data)
     except Exception as e:
-        print(f"Supabase Update Error: {e}")
+        print(f"DB Update Error: {e}")
         return False
 
-# --- SEND UPDATE EMAIL (Unchanged) ---
+# --- SEND UPDATE EMAIL ---
 def send_update_email(to_email, name, booking_id, old_details, new_details):
     if "your_email" in config.SENDER_EMAIL:
         return True
@@ -345,12 +409,7 @@ def send_update_email(to_email, name, booking_id, old_details, new_details):
         """
         msg.attach(MIMEText(html_content, 'html'))
         
-        server = smtplib.SMTP('smtp.gmail.com', 587)
-        server.starttls()
-        server.login(config.SENDER_EMAIL, config.SENDER_PASSWORD)
-        server.sendmail(config.SENDER_EMAIL, to_email, msg.as_string())
-        server.quit()
-        return True
+        return queue_email(to_email, msg)
     except Exception as e:
         print(f"Email Error: {e}")
         return False
\ No newline at end of file
@@ -0,0 +1,157 @@
+import os
+import sys
+import json
+import time
+import uuid
+import threading
+import contextlib
+import contextvars
+from collections import deque
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import config.config as config
+import db.database as database
+
+# --- PER-TURN TRACING ---
+# `with tracing.span("rag.answer"):` times a stage. Spans opened inside another
+# span nest under it; a span with no parent is the root of a trace (a chat turn,
+# or background work such as an SMTP batch). Finished traces go to a bounded
+# ring buffer per kind (TRACE_BUFFER_SIZE) and, if TRACE_FILE_PATH is set, are
+# appended to that JSONL file. Admin Dashboard -> Traces reads the buffer.
+
+_current = contextvars.ContextVar("trace_span", default=None)
+_buffers = {}
+_lock = threading.Lock()
+
+class _Span:
+    __slots__ = ("trace", "name", "parent", "start", "attrs", "index")
+
+    def __init__(self, trace, name, parent, attrs):
+        self.trace, self.name, self.parent, self.attrs = trace, name, parent, attrs
+        self.start = time.perf_counter()
+        self.index = None
+
+def _new_trace(name, kind, attrs):
+    return {
+        "id": uuid.uuid4().hex[:12], "name": name, "kind": kind, "attrs": attrs,
+        "started_at": time.time(), "t0": time.perf_counter(), "spans": [],
+    }
+
+def _close(span, error=None):
+    trace = span.trace
+    record = {
+        "name": span.name, "parent": span.parent.index if span.parent else None,
+        "start_ms": round((span.start - trace["t0"]) * 1000, 3),
+        "duration_ms": round((time.perf_counter() - span.start) * 1000, 3),
+    }
+    if span.attrs: record["attrs"] = span.attrs
+    if error: record["error"] = error
+    trace["spans"][span.index] = record
+
+@contextlib.contextmanager
+def span(name, kind="turn", **attrs):
+    """Times a stage. `kind` only matters for roots ("turn", "background", ...)."""
+    if not config.TRACING_ENABLED:
+        yield
+        return
+    parent = _current.get()
+    trace = parent.trace if parent else _new_trace(name, kind, attrs)
+    current = _Span(trace, name, parent, attrs)
+    current.index = len(trace["spans"])
+    trace["spans"].append(None)  # reserve the slot so spans stay in start order
+    token = _current.set(current)
+    error = None
+    try:
+        yield
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current.reset(token)
+        _close(current, error)
+        if parent is None:
+            _finish(trace)
+
+def record(name, start, duration_ms, **attrs):
+    """Adds an already-timed stage (start = perf_counter() value) under the current span, if any."""
+    parent = _current.get()
+    if parent is None or not config.TRACING_ENABLED: return
+    trace = parent.trace
+    entry = {
+        "name": name, "parent": parent.index,
+        "start_ms": round((start - trace["t0"]) * 1000, 3), "duration_ms": round(duration_ms, 3),
+    }
+    if attrs: entry["attrs"] = attrs
+    trace["spans"].append(entry)
+
+def annotate(**attrs):
+    """Adds attributes to the innermost open span (e.g. the routed intent)."""
+    current = _current.get()
+    if current is not None:
+        current.attrs.update(attrs)
+
+def _finish(trace):
+    trace.pop("t0")
+    trace["duration_ms"] = trace["spans"][0]["duration_ms"]
+    trace["spans"] = [s for s in trace["spans"] if s is not None]
+    with _lock:
+        buffer = _buffers.get(trace["kind"])
+        if buffer is None:
+            buffer = _buffers[trace["kind"]] = deque(maxlen=config.TRACE_BUFFER_SIZE)
+        buffer.append(trace)
+    if config.TRACE_FILE_PATH:
+        try:
+            line = json.dumps(trace, default=str, ensure_ascii=False)
+            with _lock, open(config.TRACE_FILE_PATH, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+        except Exception as e:
+            print(f"Trace Sink Error: {e}")
+
+# Every repository call (db/database.py _timed) becomes a db.<op> span
+def _on_db_call(backend, op, start, elapsed_ms):
+    record(f"db.{op}", start, elapsed_ms, backend=backend)
+
+database.TIMING_LISTENERS.append(_on_db_call)
+
+# --- READ SIDE (admin Traces view) ---
+def get_traces(kind="turn"):
+    """Finished traces of one kind, oldest first."""
+    with _lock:
+        return list(_buffers.get(kind, ()))
+
+def kinds():
+    with _lock:
+        return sorted(_buffers)
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))] if values else 0.0
+
+def stage_stats(traces):
+    """Per stage name: calls, share of traced time, and latency percentiles (inclusive of nested stages)."""
+    durations = {}
+    for trace in traces:
+        for s in trace["spans"][1:]:
+            durations.setdefault(s["name"], []).append(s["duration_ms"])
+    total = sum(t["duration_ms"] for t in traces) or 1.0
+    rows = []
+    for name, values in durations.items():
+        rows.append({
+            "stage": name, "calls": len(values), "total_ms": round(sum(values), 1),
+            "share": round(sum(values) / total, 3),
+            "p50_ms": round(percentile(values, 50), 1), "p90_ms": round(percentile(values, 90), 1),
+            "p99_ms": round(percentile(values, 99), 1), "max_ms": round(max(values), 1),
+        })
+    return sorted(rows, key=lambda r: -r["total_ms"])
+
+def slowest(traces, n=20):
+    return sorted(traces, key=lambda t: -t["duration_ms"])[:n]
+
+def top_stage(trace):
+    """The stage with the most self time (its duration minus its children's) in one trace."""
+    spans = trace["spans"]
+    self_ms = [s["duration_ms"] for s in spans]
+    for s in spans:
+        if s["parent"] is not None:
+            self_ms[s["parent"]] -= s["duration_ms"]
+    return spans[max(range(len(spans)), key=lambda i: self_ms[i])]["name"]
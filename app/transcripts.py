@@ -0,0 +1,146 @@
+import os
+import sys
+import json
+import time
+import threading
+import contextlib
+import contextvars
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import config.config as config
+
+# --- CONVERSATION TRANSCRIPTS ---
+# With TRANSCRIPT_PATH set, every booking-flow turn (booking_flow._handle) and
+# every knowledge-base answer (rag.query_rag) is appended to a JSONL file with
+# its input, the booking state before/after, the reply, and the result of each
+# external call made on the way (LLM, vector search, DB, SMTP).
+# scripts/replay_transcripts.py feeds those turns back through the same
+# functions with the recorded results stubbed in.
+#
+# Seams call `transcripts.call(kind, args, fn)` instead of `fn()`. Outside a
+# recorded or replayed turn that is just fn().
+
+# Call kind -> category used in reports
+CALL_CATEGORIES = {
+    "extract_details": "llm", "llm.rewrite": "llm", "llm.answer": "llm",
+    "vector_search": "vector",
+    "get_availability": "db", "check_availability": "db", "create_booking": "db",
+    "update_booking": "db", "delete_booking": "db",
+    "send_booking_email": "smtp", "send_cancellation_email": "smtp", "send_update_email": "smtp",
+}
+
+class ReplayMiss(RuntimeError):
+    """The replayed code made a call the transcript has no recorded result for."""
+
+_active = contextvars.ContextVar("transcript_turn", default=None)
+_session = contextvars.ContextVar("transcript_session", default=None)
+_write_lock = threading.Lock()
+
+class _Turn:
+    def __init__(self, mode, calls=None):
+        self.mode = mode          # "record" | "replay"
+        self.calls = calls or []  # record: appended; replay: consumed in order
+        self.position = 0
+        self.depth = 0            # only outermost calls are recorded/stubbed
+        self.used = []            # replay: kinds actually requested
+
+def recording_enabled():
+    return bool(config.TRANSCRIPT_PATH)
+
+def replaying():
+    turn = _active.get()
+    return turn is not None and turn.mode == "replay"
+
+def _jsonable(value):
+    return json.loads(json.dumps(value, default=str))
+
+def call(kind, args, fn):
+    """Runs fn() (recording its result), or returns the recorded result when replaying."""
+    turn = _active.get()
+    if turn is None or turn.depth:
+        return fn()
+
+    if turn.mode == "replay":
+        turn.used.append(kind)
+        if turn.position >= len(turn.calls) or turn.calls[turn.position]["kind"] != kind:
+            expected = turn.calls[turn.position]["kind"] if turn.position < len(turn.calls) else "nothing"
+            raise ReplayMiss(f"call {kind} (recorded: {expected})")
+        recorded = turn.calls[turn.position]
+        turn.position += 1
+        if "error" in recorded:
+            raise RuntimeError(recorded["error"])
+        return recorded["result"]
+
+    start = time.perf_counter()
+    turn.depth += 1
+    record = {"kind": kind, "args": _jsonable(args)}
+    try:
+        result = fn()
+        record["result"] = _jsonable(result)
+        return result
+    except Exception as e:
+        record["error"] = str(e)  # replayed as a raise, so error handling is exercised too
+        raise
+    finally:
+        turn.depth -= 1
+        record["ms"] = round((time.perf_counter() - start) * 1000, 2)
+        turn.calls.append(record)
+
+@contextlib.contextmanager
+def turn(kind, entry):
+    """
+    Records one turn. `entry` holds the inputs (and "before" state for booking turns);
+    the caller adds "reply" (and "after") before the block ends.
+    """
+    if not recording_enabled() or _active.get() is not None:
+        yield entry
+        return
+    current = _Turn("record")
+    token = _active.set(current)
+    start = time.perf_counter()
+    try:
+        yield entry
+    finally:
+        _active.reset(token)
+        entry.update(kind=kind, session=current_session(), calls=current.calls, ms=round((time.perf_counter() - start) * 1000, 2), at=time.time())
+        _append(entry)
+
+def _append(entry):
+    try:
+        line = json.dumps(entry, default=str, ensure_ascii=False)
+        with _write_lock, open(config.TRANSCRIPT_PATH, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+    except Exception as e:
+        print(f"Transcript Error: {e}")
+
+@contextlib.contextmanager
+def replay(calls):
+    """Stubs every seam with `calls` (in order) for the duration of the block. Yields the replay turn."""
+    current = _Turn("replay", calls)
+    token = _active.set(current)
+    try:
+        yield current
+    finally:
+        _active.reset(token)
+
+@contextlib.contextmanager
+def session(session_id):
+    """Tags turns recorded inside the block with `session_id` (set per rerun in main.py, per request in api.py)."""
+    token = _session.set(session_id)
+    try:
+        yield
+    finally:
+        _session.reset(token)
+
+def current_session():
+    return _session.get()
+
+def load(path):
+    """Recorded turns grouped by session, in recording order: {session_id: [entry, ...]}."""
+    sessions = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                sessions.setdefault(entry.get("session") or "local", []).append(entry)
+    return sessions
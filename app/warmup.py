@@ -0,0 +1,105 @@
+import os
+import sys
+import time
+import threading
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import config.config as config
+
+# --- PROCESS WARM-UP ---
+# Streamlit re-runs main.py on every interaction, but modules (and their globals)
+# live for the whole server process. start() runs the expensive one-time setup in
+# a daemon thread on the first run; later runs only read STATUS. Every step is a
+# cached accessor, so a chat turn that arrives mid warm-up waits on the same lock
+# instead of loading a second copy.
+
+STATUS = {
+    "state": "not_started",  # not_started | warming | ready | error
+    "step": None,
+    "error": None,
+    "started_at": None,
+    "ready_at": None,
+    "timings_ms": {},
+}
+
+_thread = None
+_lock = threading.Lock()
+
+def _knowledge_base():
+    import rag_pipeline as rag
+    rag.ensure_knowledge_base()
+
+def _embedding_model():
+    import rag_pipeline as rag
+    rag.get_embedding_model().embed_query("warm-up")  # first call loads the ONNX session
+
+def _vector_store():
+    import rag_pipeline as rag
+    rag.get_vector_store()
+
+def _reranker():
+    if config.RERANK_ENABLED:
+        import reranker
+        reranker.get_reranker()
+
+def _intent_router():
+    import intent_router as router
+    router.load_centroids()
+
+def _outboxes():
+    import tools
+    import mail_outbox
+    tools.get_booking_outbox()
+    mail_outbox.get_mail_outbox()
+
+STEPS = [
+    ("knowledge_base", _knowledge_base),
+    ("embedding_model", _embedding_model),
+    ("vector_store", _vector_store),
+    ("reranker", _reranker),
+    ("intent_router", _intent_router),
+    ("outboxes", _outboxes),
+]
+
+def _run():
+    for name, step in STEPS:
+        STATUS["step"] = name
+        start = time.perf_counter()
+        try:
+            step()
+        except Exception as e:
+            # Keep going: a failed step is retried lazily by the first request that needs it
+            STATUS["error"] = f"{name}: {e}"
+            print(f"Warm-up error in {name}: {e}")
+        STATUS["timings_ms"][name] = (time.perf_counter() - start) * 1000
+    STATUS["step"] = None
+    STATUS["ready_at"] = time.time()
+    STATUS["state"] = "error" if STATUS["error"] else "ready"
+    print(f"🔥 Warm-up {STATUS['state']} in {(STATUS['ready_at'] - STATUS['started_at']):.1f} s")
+
+def start():
+    """Starts the warm-up thread once per process. Safe to call on every rerun."""
+    global _thread
+    import invoice
+    invoice.require_secret()  # refuse to serve with forgeable invoice tags
+    if not config.WARMUP_ENABLED:
+        _knowledge_base()  # only the index check, inline (once per process); the rest loads on first use
+        return
+    with _lock:
+        if _thread is None:
+            STATUS["state"] = "warming"
+            STATUS["started_at"] = time.time()
+            _thread = threading.Thread(target=_run, name="warmup", daemon=True)
+            _thread.start()
+
+def wait(timeout=None):
+    """Blocks until warm-up finishes (for scripts and benchmarks). Returns True if it finished."""
+    if _thread is None: return False
+    _thread.join(timeout)
+    return not _thread.is_alive()
+
+def is_ready():
+    return STATUS["state"] == "ready"
+
+def get_status():
+    return {**STATUS, "timings_ms": dict(STATUS["timings_ms"])}
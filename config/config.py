@@ -11,16 +11,95 @@ GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 # 2. MODEL SETTINGS
 GROQ_MODEL_NAME = "llama-3.3-70b-versatile" 
 EMBEDDING_MODEL = "BAAI/bge-small-en-v1.5"  
+INTENT_MIN_CONFIDENCE = 0.75  # Below this cosine score the router falls back to keyword matching
+# "stub" swaps in offline stand-ins (no API key, no model download) for load tests; see models/llm.py
+LLM_BACKEND = os.getenv("LLM_BACKEND", "groq")
+LLM_STUB_LATENCY_MS = float(os.getenv("LLM_STUB_LATENCY_MS", "50"))
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "fastembed")
 
 # 3. PATHS
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
-DB_PATH = os.path.join(BASE_DIR, "db", "camping.db")
+DB_PATH = os.getenv("DB_PATH", os.path.join(BASE_DIR, "db", "camping.db"))
 PDF_PATH = os.path.join(BASE_DIR, "docs", "Camping_Guide.pdf")
-VECTOR_DB_PATH = os.path.join(BASE_DIR, "faiss_index")
+VECTOR_DB_PATH = os.getenv("VECTOR_DB_PATH", os.path.join(BASE_DIR, "faiss_index"))
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", os.path.join(BASE_DIR, "db", "sessions.db"))
+MAIL_OUTBOX_DB_PATH = os.getenv("MAIL_OUTBOX_DB_PATH", os.path.join(BASE_DIR, "db", "mail_outbox.db"))
+OUTBOX_DB_PATH = os.getenv("OUTBOX_DB_PATH", os.path.join(BASE_DIR, "db", "outbox.db"))
+
+# 4. SESSION STORE ("memory" = per-process, "sqlite" = shared across worker processes)
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "memory")
 
 SENDER_EMAIL = os.getenv("SENDER_EMAIL")
 SENDER_PASSWORD = os.getenv("SENDER_PASSWORD")
+SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "1") == "1"  # 0 for a local sink (see app/mail_outbox.py)
+
+# Signs the booking tag embedded in generated invoice PDFs (app/invoice.py). No default: startup fails
+# without it unless LLM_BACKEND=stub, which signs with a random per-process key
+INVOICE_SECRET = os.getenv("INVOICE_SECRET")
 
 # 5. SUPABASE CREDENTIALS
 SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
\ No newline at end of file
+SUPABASE_KEY = os.getenv("SUPABASE_KEY")
+
+# 6. DATA LAYER ("supabase" = production, "sqlite" = local DB_PATH for tests and benchmarks)
+DB_BACKEND = os.getenv("DB_BACKEND", "supabase")
+DB_CACHE_TTL_SECONDS = int(os.getenv("DB_CACHE_TTL_SECONDS", "300"))  # 0 disables the read-through cache
+DB_CACHE_MAX_ENTRIES = int(os.getenv("DB_CACHE_MAX_ENTRIES", "2048"))
+
+# 7. BOOKING OUTBOX (confirmations are written locally first, then flushed to DB_BACKEND in batches)
+OUTBOX_ENABLED = os.getenv("OUTBOX_ENABLED", "1") == "1"
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "50"))
+OUTBOX_FLUSH_INTERVAL_SECONDS = float(os.getenv("OUTBOX_FLUSH_INTERVAL_SECONDS", "1.0"))
+OUTBOX_MAX_BACKOFF_SECONDS = float(os.getenv("OUTBOX_MAX_BACKOFF_SECONDS", "60"))
+# 0-63, unique per writer process; unset = derived from hostname + pid (see db/outbox.py)
+OUTBOX_NODE_ID = int(os.environ["OUTBOX_NODE_ID"]) if os.getenv("OUTBOX_NODE_ID") else None
+
+# 8. EMAIL OUTBOX (chat turns enqueue; background workers deliver over pooled SMTP connections)
+SMTP_POOL_SIZE = int(os.getenv("SMTP_POOL_SIZE", "2"))
+MAIL_BATCH_SIZE = int(os.getenv("MAIL_BATCH_SIZE", "20"))
+MAIL_FLUSH_INTERVAL_SECONDS = float(os.getenv("MAIL_FLUSH_INTERVAL_SECONDS", "1.0"))
+MAIL_MAX_ATTEMPTS = int(os.getenv("MAIL_MAX_ATTEMPTS", "8"))
+MAIL_MAX_BACKOFF_SECONDS = float(os.getenv("MAIL_MAX_BACKOFF_SECONDS", "300"))
+
+# 9. PDF UPLOADS (parsed in memory, page by page; see app/pdf_stream.py)
+PDF_MAX_BYTES = int(os.getenv("PDF_MAX_BYTES", str(20 * 1024 * 1024)))
+PDF_MAX_PAGES = int(os.getenv("PDF_MAX_PAGES", "200"))
+
+# 10. WARM-UP (knowledge base, embedding model, vector store and intent centroids load in a background thread at server start)
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "1") == "1"
+
+# 11. HTTP API (app/api.py; sessions use SESSION_BACKEND, so set it to "sqlite" when running several workers)
+API_HOST = os.getenv("API_HOST", "127.0.0.1")
+API_PORT = int(os.getenv("API_PORT", "8000"))
+
+# 12. TRANSCRIPTS (JSONL of booking/RAG turns with external call results, for scripts/replay_transcripts.py; empty = off)
+TRANSCRIPT_PATH = os.getenv("TRANSCRIPT_PATH", "")
+
+# 13. TRACING (per-turn stage timings; Admin Dashboard -> Traces. TRACE_FILE_PATH appends finished traces as JSONL)
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "1") == "1"
+TRACE_BUFFER_SIZE = int(os.getenv("TRACE_BUFFER_SIZE", "500"))
+TRACE_FILE_PATH = os.getenv("TRACE_FILE_PATH", "")
+
+# 14. CHAT HISTORY (recent messages kept verbatim; older ones are folded into a rolling summary in the background; see app/history.py)
+CHAT_HISTORY_WINDOW = int(os.getenv("CHAT_HISTORY_WINDOW", "20"))
+CHAT_COMPACT_BATCH = int(os.getenv("CHAT_COMPACT_BATCH", "10"))
+CHAT_SUMMARY_MAX_CHARS = int(os.getenv("CHAT_SUMMARY_MAX_CHARS", "2000"))
+CHAT_RENDER_RECENT = int(os.getenv("CHAT_RENDER_RECENT", "12"))  # messages drawn per rerun; older ones on demand
+
+# 15. RERANK (retrieve RERANK_CANDIDATES chunks, keep the RERANK_TOP_N best by cross-encoder score; see app/reranker.py)
+RERANK_ENABLED = os.getenv("RERANK_ENABLED", "0") == "1"
+RERANK_MODEL = os.getenv("RERANK_MODEL", "Xenova/ms-marco-MiniLM-L-6-v2")
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "10"))
+RERANK_TOP_N = int(os.getenv("RERANK_TOP_N", "2"))
+RERANK_CACHE_SIZE = int(os.getenv("RERANK_CACHE_SIZE", "4096"))
+RERANK_CACHE_TTL_SECONDS = int(os.getenv("RERANK_CACHE_TTL_SECONDS", "86400"))
+
+# 16. CHUNKING ("recursive" = 1000-char windows with 200 overlap; "structured" = whole modules/policy sections/FAQ entries packed per document, see app/doc_chunker.py; opt-in until scripts/benchmark_chunking.py reports its hit rate with the real embedding model)
+CHUNKER = os.getenv("CHUNKER", "recursive")
+CHUNK_MAX_CHARS = int(os.getenv("CHUNK_MAX_CHARS", "1200"))
+
+# 17. INDEX SNAPSHOTS (each rebuild/upload publishes a new version under VECTOR_DB_PATH; see app/index_snapshots.py)
+INDEX_KEEP_VERSIONS = int(os.getenv("INDEX_KEEP_VERSIONS", "2"))
+INDEX_GC_GRACE_SECONDS = int(os.getenv("INDEX_GC_GRACE_SECONDS", "300"))
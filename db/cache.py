@@ -0,0 +1,141 @@
+import time
+import threading
+from collections import OrderedDict
+
+# --- BOUNDED TTL CACHE ---
+class TTLCache:
+    """LRU-bounded dict whose entries expire after `ttl` seconds."""
+
+    def __init__(self, maxsize=1024, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Returns (found, value)."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._data.move_to_end(key)
+                self.hits += 1
+                return True, entry[1]
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return False, None
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+            "size": len(self._data), "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+# --- READ-THROUGH REPOSITORY ---
+class CachedRepository:
+    """
+    Wraps a BookingRepository backend with two read-through caches:
+      email -> customer_id, booking_id -> booking+customer.
+    Every write that goes through this wrapper invalidates the affected booking.
+    Caches are per process; the TTL bounds staleness from writes made elsewhere.
+    Methods not defined here are delegated to the backend unchanged.
+    """
+
+    def __init__(self, backend, ttl=300, maxsize=1024):
+        self.backend = backend
+        self.name = backend.name
+        self.customers = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.bookings = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def __getattr__(self, attr):
+        # Anything not cached here goes straight to the backend
+        if attr == "backend": raise AttributeError(attr)
+        return getattr(self.backend, attr)
+
+    def get_customer_id(self, email):
+        found, customer_id = self.customers.get(email)
+        if found: return customer_id
+        customer_id = self.backend.get_customer_id(email)
+        if customer_id is not None:
+            self.customers.set(email, customer_id)
+        return customer_id
+
+    def create_booking_with_customer(self, customer, booking):
+        # Known customer: a plain insert skips the upsert
+        found, customer_id = self.customers.get(customer["email"])
+        if found:
+            return self.backend.insert_booking(customer_id, booking)
+        return self.backend.create_booking_with_customer(customer, booking)
+
+    def insert_booking(self, customer_id, booking):
+        return self.backend.insert_booking(customer_id, booking)
+
+    def get_booking_with_customer(self, booking_id):
+        found, row = self.bookings.get(booking_id)
+        if found: return dict(row)
+        row = self.backend.get_booking_with_customer(booking_id)
+        if row is not None:
+            self.bookings.set(booking_id, dict(row))
+            if row.get("email") and row.get("customer_id") is not None:
+                self.customers.set(row["email"], row["customer_id"])
+        return row
+
+    def get_bookings_by_email(self, email):
+        found, customer_id = self.customers.get(email)
+        if found:
+            return self.backend.get_bookings_by_customer(customer_id)
+        rows = self.backend.get_bookings_by_email(email)
+        if rows:
+            self.customers.set(email, rows[0]["customer_id"])
+        return rows
+
+    def get_bookings_by_customer(self, customer_id):
+        return self.backend.get_bookings_by_customer(customer_id)
+
+    def update_booking(self, booking_id, fields):
+        try:
+            return self.backend.update_booking(booking_id, fields)
+        finally:
+            self.bookings.invalidate(booking_id)
+
+    def delete_booking(self, booking_id):
+        try:
+            return self.backend.delete_booking(booking_id)
+        finally:
+            self.bookings.invalidate(booking_id)
+
+    def update_status_bulk(self, booking_ids, status):
+        try:
+            return self.backend.update_status_bulk(booking_ids, status)
+        finally:
+            for booking_id in booking_ids:
+                self.bookings.invalidate(booking_id)
+
+    def cache_stats(self):
+        return {"customers_by_email": self.customers.stats(), "bookings_by_id": self.bookings.stats()}
+
+def get_cache_stats():
+    """Hit-rate stats for the process-wide repository (empty if caching is disabled)."""
+    from db.database import get_repository
+    repo = get_repository()
+    return repo.cache_stats() if isinstance(repo, CachedRepository) else {}
@@ -0,0 +1,735 @@
+import os
+import sys
+import time
+import sqlite3
+import threading
+from datetime import datetime
+from contextlib import contextmanager
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import config.config as config
+
+# Latency per backend and operation: {"sqlite": {"create_booking_with_customer": [count, total_ms]}}
+LATENCY_STATS = {}
+# Called as fn(backend, op, start, elapsed_ms) after every timed repository call (app/tracing.py adds one)
+TIMING_LISTENERS = []
+
+# --- STAY DATES ---
+def parse_date_range(text):
+    """
+    '2025-12-19 to 2025-12-20' -> ('2025-12-19', '2025-12-20'). A single date is a one-day stay.
+    Returns (None, None) when the string is not in that format.
+    """
+    parts = [p.strip() for p in str(text or "").split(" to ")]
+    try:
+        days = [datetime.strptime(p, "%Y-%m-%d").strftime("%Y-%m-%d") for p in parts]
+    except ValueError:
+        return None, None
+    if len(days) == 1: return days[0], days[0]
+    if len(days) == 2: return min(days), max(days)
+    return None, None
+
+def with_stay_dates(fields):
+    """Fills start_date/end_date from booking_date when the caller only sent the string."""
+    if "booking_date" not in fields or "start_date" in fields:
+        return fields
+    start, end = parse_date_range(fields["booking_date"])
+    return {**fields, "start_date": start, "end_date": end}
+
+# --- BACKEND INTERFACE ---
+class BookingRepository:
+    """
+    Data-access interface for customers and bookings.
+    Every method is a single round-trip to the backing store.
+    """
+    name = "base"
+
+    @contextmanager
+    def _timed(self, op):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            stats = LATENCY_STATS.setdefault(self.name, {}).setdefault(op, [0, 0.0])
+            stats[0] += 1
+            stats[1] += elapsed
+            for listener in TIMING_LISTENERS:
+                listener(self.name, op, start, elapsed)
+
+    def get_customer_id(self, email):
+        raise NotImplementedError
+
+    def create_booking_with_customer(self, customer, booking):
+        """Upserts the customer (by email) and inserts the booking atomically. Returns the booking ID."""
+        raise NotImplementedError
+
+    def get_booking_with_customer(self, booking_id):
+        """Returns the booking row merged with the customer's name and email, or None."""
+        raise NotImplementedError
+
+    def insert_booking(self, customer_id, booking):
+        """Inserts a booking for a known customer. Returns the booking ID."""
+        raise NotImplementedError
+
+    def get_bookings_by_email(self, email):
+        raise NotImplementedError
+
+    def get_bookings_by_customer(self, customer_id):
+        raise NotImplementedError
+
+    def update_booking(self, booking_id, fields):
+        raise NotImplementedError
+
+    def update_status_bulk(self, booking_ids, status):
+        """Sets the status of many bookings in one request. Returns the number of IDs sent."""
+        raise NotImplementedError
+
+    def bulk_create_bookings(self, rows):
+        """
+        Inserts one chunk of bookings in one request. Each row carries the customer
+        fields (name, email, phone) plus BOOKING_COLUMNS; customers are upserted by email.
+        Returns the new booking IDs.
+        """
+        raise NotImplementedError
+
+    def upsert_bookings(self, rows):
+        """
+        Idempotent batch insert for the local outbox (db/outbox.py). Each row is a
+        bulk_create_bookings row plus a client-assigned "id" and "idempotency_key";
+        rows whose key or id already exist are skipped. Returns the IDs stored under
+        the rows' keys, so a row skipped because its id belongs to another booking
+        is missing from the result.
+        """
+        raise NotImplementedError
+
+    def delete_booking(self, booking_id):
+        raise NotImplementedError
+
+    def query_bookings(self, filters=None, offset=0, limit=50):
+        """
+        Server-side filtered page of bookings joined with customer name/email, newest first.
+        filters: {"status", "location", "search"}. Returns (rows, total_matching).
+        """
+        raise NotImplementedError
+
+    def fetch_bookings_page_after(self, filters=None, before_id=None, limit=5000):
+        """
+        Keyset-paginated filtered rows (joined like query_bookings), newest ID first,
+        starting below `before_id`. Used to stream large exports without OFFSET scans.
+        """
+        raise NotImplementedError
+
+    def iter_bookings(self, filters=None, chunk_size=5000):
+        """Yields lists of joined booking rows (at most chunk_size each) matching filters."""
+        before_id = None
+        while True:
+            rows = self.fetch_bookings_page_after(filters, before_id, limit=chunk_size)
+            if not rows: return
+            yield rows
+            if len(rows) < chunk_size: return
+            before_id = rows[-1]["id"]
+
+    def query_bookings_in_range(self, start, end, location=None, module_name=None, include_cancelled=False):
+        """
+        Joined booking rows whose stay overlaps [start, end] (inclusive, YYYY-MM-DD),
+        ordered by start date. Served from the interval index, not a scan.
+        """
+        raise NotImplementedError
+
+    def query_customers(self, offset=0, limit=50):
+        """Returns (rows, total_customers)."""
+        raise NotImplementedError
+
+    def read_rollups(self):
+        """
+        Pre-aggregated rows maintained by the database on every booking write:
+        {destination, module, status, day, bookings, guests, revenue}.
+        """
+        raise NotImplementedError
+
+    def compute_rollups(self):
+        """Same shape as read_rollups(), aggregated from scratch over all bookings (full scan)."""
+        raise NotImplementedError
+
+    def rebuild_rollups(self):
+        """Replaces the stored rollups with compute_rollups()."""
+        raise NotImplementedError
+
+# --- SUPABASE BACKEND ---
+class SupabaseRepository(BookingRepository):
+    """Remote backend. Atomic writes go through the RPC in db/supabase_schema.sql."""
+    name = "supabase"
+
+    def __init__(self, url=None, key=None):
+        from supabase import create_client
+        self.client = create_client(url or config.SUPABASE_URL, key or config.SUPABASE_KEY)
+
+    def get_customer_id(self, email):
+        with self._timed("get_customer_id"):
+            res = self.client.table("customers").select("id").eq("email", email).limit(1).execute()
+        return res.data[0]["id"] if res.data else None
+
+    def create_booking_with_customer(self, customer, booking):
+        with self._timed("create_booking_with_customer"):
+            res = self.client.rpc("create_booking_with_customer", {
+                "p_name": customer["name"], "p_email": customer["email"],
+                "p_phone": customer["phone"], "p_booking": with_stay_dates(booking),
+            }).execute()
+        return res.data
+
+    def insert_booking(self, customer_id, booking):
+        with self._timed("insert_booking"):
+            res = self.client.table("bookings").insert({**with_stay_dates(booking), "customer_id": customer_id}).execute()
+        return res.data[0]["id"]
+
+    def get_booking_with_customer(self, booking_id):
+        with self._timed("get_booking_with_customer"):
+            res = self.client.table("bookings").select("*, customers(name, email)").eq("id", booking_id).execute()
+        if not res.data: return None
+        row = dict(res.data[0])
+        customer = row.pop("customers", None) or {}
+        return {**row, **customer}
+
+    def get_bookings_by_email(self, email):
+        with self._timed("get_bookings_by_email"):
+            res = (self.client.table("bookings")
+                   .select("id, customer_id, service_type, booking_date, status, customers!inner(email)")
+                   .eq("customers.email", email).execute())
+        return [{k: v for k, v in row.items() if k != "customers"} for row in res.data]
+
+    def get_bookings_by_customer(self, customer_id):
+        with self._timed("get_bookings_by_customer"):
+            res = (self.client.table("bookings").select("id, customer_id, service_type, booking_date, status")
+                   .eq("customer_id", customer_id).execute())
+        return res.data
+
+    def update_booking(self, booking_id, fields):
+        with self._timed("update_booking"):
+            self.client.table("bookings").update(with_stay_dates(fields)).eq("id", booking_id).execute()
+        return True
+
+    def delete_booking(self, booking_id):
+        with self._timed("delete_booking"):
+            self.client.table("bookings").delete().eq("id", booking_id).execute()
+        return True
+
+    def update_status_bulk(self, booking_ids, status):
+        if not booking_ids: return 0
+        with self._timed("update_status_bulk"):
+            self.client.table("bookings").update({"status": status}).in_("id", list(booking_ids)).execute()
+        return len(booking_ids)
+
+    def bulk_create_bookings(self, rows):
+        if not rows: return []
+        with self._timed("bulk_create_bookings"):
+            res = self.client.rpc("bulk_create_bookings", {"p_rows": [with_stay_dates(r) for r in rows]}).execute()
+        return [r["id"] if isinstance(r, dict) else r for r in res.data]
+
+    def upsert_bookings(self, rows):
+        if not rows: return []
+        with self._timed("upsert_bookings"):
+            res = self.client.rpc("upsert_bookings", {"p_rows": [with_stay_dates(r) for r in rows]}).execute()
+        return [r["id"] if isinstance(r, dict) else r for r in res.data]
+
+    @staticmethod
+    def _flatten(row):
+        row = dict(row)
+        customer = row.pop("customers", None) or {}
+        return {**row, "name": customer.get("name"), "email": customer.get("email")}
+
+    def _filtered_bookings(self, filters, **select_kwargs):
+        filters = filters or {}
+        search = (filters.get("search") or "").strip()
+        # Name search needs an inner join so the filter applies to the parent rows
+        embed = "customers!inner(name, email)" if search and not search.isdigit() else "customers(name, email)"
+        query = self.client.table("bookings").select(f"*, {embed}", **select_kwargs)
+        if filters.get("status"): query = query.eq("status", filters["status"])
+        if filters.get("location"): query = query.eq("location", filters["location"])
+        if search.isdigit(): query = query.eq("id", int(search))
+        elif search: query = query.ilike("customers.name", f"%{search}%")
+        return query
+
+    def query_bookings(self, filters=None, offset=0, limit=50):
+        query = self._filtered_bookings(filters, count="exact")
+        with self._timed("query_bookings"):
+            res = query.order("created_at", desc=True).range(offset, offset + limit - 1).execute()
+        return [self._flatten(r) for r in res.data], res.count or 0
+
+    def fetch_bookings_page_after(self, filters=None, before_id=None, limit=5000):
+        query = self._filtered_bookings(filters)
+        if before_id is not None: query = query.lt("id", before_id)
+        with self._timed("fetch_bookings_page_after"):
+            res = query.order("id", desc=True).limit(limit).execute()
+        return [self._flatten(r) for r in res.data]
+
+    def query_bookings_in_range(self, start, end, location=None, module_name=None, include_cancelled=False):
+        with self._timed("query_bookings_in_range"):
+            res = self.client.rpc("bookings_in_range", {
+                "p_start": start, "p_end": end, "p_location": location,
+                "p_module": module_name, "p_include_cancelled": include_cancelled,
+            }).execute()
+        return res.data
+
+    def query_customers(self, offset=0, limit=50):
+        with self._timed("query_customers"):
+            res = (self.client.table("customers").select("*", count="exact")
+                   .order("id").range(offset, offset + limit - 1).execute())
+        return res.data, res.count or 0
+
+    def read_rollups(self):
+        with self._timed("read_rollups"):
+            res = self.client.table("booking_rollups").select("*").execute()
+        return res.data
+
+    def compute_rollups(self):
+        with self._timed("compute_rollups"):
+            res = self.client.rpc("compute_booking_rollups", {}).execute()
+        return res.data
+
+    def rebuild_rollups(self):
+        with self._timed("rebuild_rollups"):
+            self.client.rpc("rebuild_booking_rollups", {}).execute()
+        return True
+
+# --- SQLITE BACKEND ---
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS customers (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT,
+    email TEXT NOT NULL UNIQUE,
+    phone TEXT,
+    created_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now'))
+);
+CREATE TABLE IF NOT EXISTS bookings (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    customer_id INTEGER REFERENCES customers(id),
+    service_type TEXT,
+    location TEXT,
+    module_name TEXT,
+    booking_date TEXT,
+    start_date TEXT,
+    end_date TEXT,
+    guest_count INTEGER,
+    total_cost REAL,
+    status TEXT DEFAULT 'Confirmed',
+    idempotency_key TEXT,
+    created_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now'))
+);
+CREATE TABLE IF NOT EXISTS booking_rollups (
+    destination TEXT NOT NULL,
+    module TEXT NOT NULL,
+    status TEXT NOT NULL,
+    day TEXT NOT NULL,
+    bookings INTEGER NOT NULL DEFAULT 0,
+    guests INTEGER NOT NULL DEFAULT 0,
+    revenue REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (destination, module, status, day)
+);
+"""
+
+# Columns added after the first release: (table, column, type, backfill expression)
+SQLITE_MIGRATIONS = [
+    # Stay range parsed out of the legacy "YYYY-MM-DD to YYYY-MM-DD" string
+    ("bookings", "start_date", "TEXT",
+     "CASE WHEN booking_date GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]*' THEN SUBSTR(booking_date, 1, 10) END"),
+    ("bookings", "end_date", "TEXT",
+     "CASE WHEN booking_date GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9] to [0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]'"
+     " THEN SUBSTR(booking_date, 15, 10)"
+     " WHEN booking_date GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]' THEN booking_date END"),
+    ("bookings", "idempotency_key", "TEXT", None),
+]
+
+# Change feed of an earlier dashboard sync (updated_at triggers + delete tombstones), no longer read.
+# Dropped on open so deletes stop writing tombstones; an existing updated_at column is left in place.
+SQLITE_RETIRED = """
+DROP TRIGGER IF EXISTS trg_bookings_touch;
+DROP TRIGGER IF EXISTS trg_bookings_deleted;
+DROP INDEX IF EXISTS idx_bookings_updated;
+DROP TABLE IF EXISTS booking_deletions;
+"""
+
+SQLITE_INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_bookings_customer ON bookings(customer_id);
+CREATE INDEX IF NOT EXISTS idx_bookings_created ON bookings(created_at);
+CREATE INDEX IF NOT EXISTS idx_bookings_status ON bookings(status, created_at);
+CREATE INDEX IF NOT EXISTS idx_bookings_location ON bookings(location, created_at);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_bookings_idempotency ON bookings(idempotency_key);
+CREATE INDEX IF NOT EXISTS idx_bookings_stay ON bookings(location, module_name, start_date, end_date);
+-- Interval index over stays as integer Julian days: booking id -> [start_day, end_day]
+CREATE VIRTUAL TABLE IF NOT EXISTS booking_stays USING rtree_i32(id, start_day, end_day);
+CREATE TRIGGER IF NOT EXISTS trg_stays_insert AFTER INSERT ON bookings
+WHEN julianday(NEW.start_date) IS NOT NULL AND julianday(NEW.end_date) IS NOT NULL
+BEGIN
+    INSERT INTO booking_stays VALUES (NEW.id,
+        CAST(julianday(MIN(NEW.start_date, NEW.end_date)) AS INTEGER),
+        CAST(julianday(MAX(NEW.start_date, NEW.end_date)) AS INTEGER));
+END;
+CREATE TRIGGER IF NOT EXISTS trg_stays_update AFTER UPDATE OF start_date, end_date ON bookings
+BEGIN
+    DELETE FROM booking_stays WHERE id = OLD.id;
+    INSERT INTO booking_stays SELECT NEW.id,
+        CAST(julianday(MIN(NEW.start_date, NEW.end_date)) AS INTEGER),
+        CAST(julianday(MAX(NEW.start_date, NEW.end_date)) AS INTEGER)
+    WHERE julianday(NEW.start_date) IS NOT NULL AND julianday(NEW.end_date) IS NOT NULL;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_stays_delete AFTER DELETE ON bookings
+BEGIN
+    DELETE FROM booking_stays WHERE id = OLD.id;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_rollups_insert AFTER INSERT ON bookings
+BEGIN
+    INSERT INTO booking_rollups VALUES (COALESCE(NEW.location, ''), COALESCE(NEW.module_name, ''),
+        COALESCE(NEW.status, ''), SUBSTR(NEW.created_at, 1, 10), 1, COALESCE(NEW.guest_count, 0), COALESCE(NEW.total_cost, 0))
+    ON CONFLICT (destination, module, status, day) DO UPDATE SET
+        bookings = bookings + 1, guests = guests + excluded.guests, revenue = revenue + excluded.revenue;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_rollups_update
+AFTER UPDATE OF location, module_name, status, guest_count, total_cost ON bookings
+BEGIN
+    UPDATE booking_rollups SET bookings = bookings - 1,
+        guests = guests - COALESCE(OLD.guest_count, 0), revenue = revenue - COALESCE(OLD.total_cost, 0)
+    WHERE destination = COALESCE(OLD.location, '') AND module = COALESCE(OLD.module_name, '')
+        AND status = COALESCE(OLD.status, '') AND day = SUBSTR(OLD.created_at, 1, 10);
+    INSERT INTO booking_rollups VALUES (COALESCE(NEW.location, ''), COALESCE(NEW.module_name, ''),
+        COALESCE(NEW.status, ''), SUBSTR(NEW.created_at, 1, 10), 1, COALESCE(NEW.guest_count, 0), COALESCE(NEW.total_cost, 0))
+    ON CONFLICT (destination, module, status, day) DO UPDATE SET
+        bookings = bookings + 1, guests = guests + excluded.guests, revenue = revenue + excluded.revenue;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_rollups_delete AFTER DELETE ON bookings
+BEGIN
+    UPDATE booking_rollups SET bookings = bookings - 1,
+        guests = guests - COALESCE(OLD.guest_count, 0), revenue = revenue - COALESCE(OLD.total_cost, 0)
+    WHERE destination = COALESCE(OLD.location, '') AND module = COALESCE(OLD.module_name, '')
+        AND status = COALESCE(OLD.status, '') AND day = SUBSTR(OLD.created_at, 1, 10);
+END;
+"""
+
+ROLLUP_SELECT = """
+SELECT COALESCE(location, '') AS destination, COALESCE(module_name, '') AS module,
+       COALESCE(status, '') AS status, SUBSTR(created_at, 1, 10) AS day,
+       COUNT(*) AS bookings, COALESCE(SUM(guest_count), 0) AS guests, COALESCE(SUM(total_cost), 0) AS revenue
+FROM bookings GROUP BY 1, 2, 3, 4
+"""
+
+BOOKING_COLUMNS = [
+    "service_type", "location", "module_name", "booking_date", "start_date", "end_date",
+    "guest_count", "total_cost", "status",
+]
+
+STAY_SELECT = """
+SELECT id, CAST(julianday(MIN(start_date, end_date)) AS INTEGER), CAST(julianday(MAX(start_date, end_date)) AS INTEGER)
+FROM bookings WHERE julianday(start_date) IS NOT NULL AND julianday(end_date) IS NOT NULL
+"""
+
+class SQLiteRepository(BookingRepository):
+    """Local backend at config.DB_PATH, used for tests and benchmarks."""
+    name = "sqlite"
+
+    def __init__(self, path=None):
+        self.path = path or config.DB_PATH
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SQLITE_SCHEMA)
+        self._migrate(conn)
+        conn.executescript(SQLITE_RETIRED)
+        conn.executescript(SQLITE_INDEXES)
+        # First run on a pre-rollup database: seed the aggregates once
+        if conn.execute("SELECT 1 FROM booking_rollups LIMIT 1").fetchone() is None:
+            self.rebuild_rollups()
+        # Same for the interval index on databases that predate it
+        if conn.execute("SELECT 1 FROM booking_stays LIMIT 1").fetchone() is None:
+            self.rebuild_stay_index()
+
+    @staticmethod
+    def _migrate(conn):
+        for table, column, col_type, backfill in SQLITE_MIGRATIONS:
+            existing = {r[1] for r in conn.execute(f"PRAGMA table_info({table})")}
+            if column not in existing:
+                with conn:
+                    conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {col_type}")
+                    if backfill:
+                        conn.execute(f"UPDATE {table} SET {column} = {backfill}")
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        return conn
+
+    def get_customer_id(self, email):
+        with self._timed("get_customer_id"):
+            row = self._conn().execute("SELECT id FROM customers WHERE email = ?", (email,)).fetchone()
+        return row["id"] if row else None
+
+    def create_booking_with_customer(self, customer, booking):
+        booking = with_stay_dates(booking)
+        conn = self._conn()
+        with self._timed("create_booking_with_customer"), conn:
+            conn.execute(
+                "INSERT INTO customers (name, email, phone) VALUES (?, ?, ?) ON CONFLICT(email) DO NOTHING",
+                (customer["name"], customer["email"], customer["phone"]),
+            )
+            cols = [c for c in BOOKING_COLUMNS if c in booking]
+            cur = conn.execute(
+                f"INSERT INTO bookings (customer_id, {', '.join(cols)}) "
+                f"SELECT id, {', '.join('?' for _ in cols)} FROM customers WHERE email = ?",
+                [booking[c] for c in cols] + [customer["email"]],
+            )
+        return cur.lastrowid
+
+    def insert_booking(self, customer_id, booking):
+        booking = with_stay_dates(booking)
+        cols = [c for c in BOOKING_COLUMNS if c in booking]
+        conn = self._conn()
+        with self._timed("insert_booking"), conn:
+            cur = conn.execute(
+                f"INSERT INTO bookings (customer_id, {', '.join(cols)}) VALUES (?, {', '.join('?' for _ in cols)})",
+                [customer_id] + [booking[c] for c in cols],
+            )
+        return cur.lastrowid
+
+    def get_booking_with_customer(self, booking_id):
+        with self._timed("get_booking_with_customer"):
+            row = self._conn().execute(
+                "SELECT b.*, c.name, c.email FROM bookings b "
+                "LEFT JOIN customers c ON c.id = b.customer_id WHERE b.id = ?", (booking_id,)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def get_bookings_by_email(self, email):
+        with self._timed("get_bookings_by_email"):
+            rows = self._conn().execute(
+                "SELECT b.id, b.customer_id, b.service_type, b.booking_date, b.status FROM bookings b "
+                "JOIN customers c ON c.id = b.customer_id WHERE c.email = ?", (email,)
+            ).fetchall()
+        return [dict(r) for r in rows]
+
+    def get_bookings_by_customer(self, customer_id):
+        with self._timed("get_bookings_by_customer"):
+            rows = self._conn().execute(
+                "SELECT id, customer_id, service_type, booking_date, status FROM bookings WHERE customer_id = ?", (customer_id,)
+            ).fetchall()
+        return [dict(r) for r in rows]
+
+    def update_booking(self, booking_id, fields):
+        fields = with_stay_dates(fields)
+        cols = [c for c in fields if c in BOOKING_COLUMNS]
+        if not cols: return False
+        conn = self._conn()
+        with self._timed("update_booking"), conn:
+            conn.execute(
+                f"UPDATE bookings SET {', '.join(c + ' = ?' for c in cols)} WHERE id = ?",
+                [fields[c] for c in cols] + [booking_id],
+            )
+        return True
+
+    def delete_booking(self, booking_id):
+        conn = self._conn()
+        with self._timed("delete_booking"), conn:
+            conn.execute("DELETE FROM bookings WHERE id = ?", (booking_id,))
+        return True
+
+    def update_status_bulk(self, booking_ids, status):
+        if not booking_ids: return 0
+        conn = self._conn()
+        with self._timed("update_status_bulk"), conn:
+            conn.execute(
+                f"UPDATE bookings SET status = ? WHERE id IN ({', '.join('?' for _ in booking_ids)})",
+                [status] + list(booking_ids),
+            )
+        return len(booking_ids)
+
+    def bulk_create_bookings(self, rows):
+        if not rows: return []
+        rows = [with_stay_dates(r) for r in rows]
+        conn = self._conn()
+        with self._timed("bulk_create_bookings"), conn:
+            conn.executemany(
+                "INSERT INTO customers (name, email, phone) VALUES (?, ?, ?) ON CONFLICT(email) DO NOTHING",
+                [(r["name"], r["email"], r["phone"]) for r in rows],
+            )
+            first = conn.execute("SELECT COALESCE(MAX(id), 0) FROM bookings").fetchone()[0]
+            conn.executemany(
+                f"INSERT INTO bookings (customer_id, {', '.join(BOOKING_COLUMNS)}) "
+                f"SELECT id, {', '.join('?' for _ in BOOKING_COLUMNS)} FROM customers WHERE email = ?",
+                [[r.get(c) for c in BOOKING_COLUMNS] + [r["email"]] for r in rows],
+            )
+            ids = [row[0] for row in conn.execute("SELECT id FROM bookings WHERE id > ? ORDER BY id", (first,))]
+        return ids
+
+    def upsert_bookings(self, rows):
+        if not rows: return []
+        rows = [with_stay_dates(r) for r in rows]
+        conn = self._conn()
+        with self._timed("upsert_bookings"), conn:
+            conn.executemany(
+                "INSERT INTO customers (name, email, phone) VALUES (?, ?, ?) ON CONFLICT(email) DO NOTHING",
+                [(r["name"], r["email"], r["phone"]) for r in rows],
+            )
+            conn.executemany(
+                f"INSERT INTO bookings (id, idempotency_key, customer_id, {', '.join(BOOKING_COLUMNS)}) "
+                f"SELECT ?, ?, id, {', '.join('?' for _ in BOOKING_COLUMNS)} FROM customers WHERE email = ? "
+                "ON CONFLICT DO NOTHING",
+                [[r["id"], r["idempotency_key"]] + [r.get(c) for c in BOOKING_COLUMNS] + [r["email"]] for r in rows],
+            )
+            keys = [r["idempotency_key"] for r in rows]
+            ids = [row[0] for row in conn.execute(
+                f"SELECT id FROM bookings WHERE idempotency_key IN ({', '.join('?' for _ in keys)})", keys
+            )]
+        return ids
+
+    JOINED_SELECT = "SELECT b.*, c.name, c.email FROM bookings b LEFT JOIN customers c ON c.id = b.customer_id"
+
+    @staticmethod
+    def _where(filters):
+        filters = filters or {}
+        where, params = [], []
+        if filters.get("status"):
+            where.append("b.status = ?"); params.append(filters["status"])
+        if filters.get("location"):
+            where.append("b.location = ?"); params.append(filters["location"])
+        search = (filters.get("search") or "").strip()
+        if search:
+            where.append("(LOWER(c.name) LIKE ? OR CAST(b.id AS TEXT) LIKE ?)")
+            params += [f"%{search.lower()}%", f"%{search}%"]
+        return where, params
+
+    def query_bookings(self, filters=None, offset=0, limit=50):
+        where, params = self._where(filters)
+        clause = f" WHERE {' AND '.join(where)}" if where else ""
+        conn = self._conn()
+        with self._timed("query_bookings"):
+            rows = conn.execute(
+                f"{self.JOINED_SELECT}{clause} ORDER BY b.created_at DESC, b.id DESC LIMIT ? OFFSET ?",
+                params + [limit, offset],
+            ).fetchall()
+            total = conn.execute(
+                f"SELECT COUNT(*) FROM bookings b LEFT JOIN customers c ON c.id = b.customer_id{clause}", params
+            ).fetchone()[0]
+        return [dict(r) for r in rows], total
+
+    def fetch_bookings_page_after(self, filters=None, before_id=None, limit=5000):
+        where, params = self._where(filters)
+        if before_id is not None:
+            where.append("b.id < ?"); params.append(before_id)
+        clause = f" WHERE {' AND '.join(where)}" if where else ""
+        with self._timed("fetch_bookings_page_after"):
+            rows = self._conn().execute(
+                f"{self.JOINED_SELECT}{clause} ORDER BY b.id DESC LIMIT ?", params + [limit]
+            ).fetchall()
+        return [dict(r) for r in rows]
+
+    def query_bookings_in_range(self, start, end, location=None, module_name=None, include_cancelled=False):
+        where, params = [], [end, start]
+        if location:
+            where.append("b.location = ?"); params.append(location)
+        if module_name:
+            where.append("b.module_name = ?"); params.append(module_name)
+        if not include_cancelled:
+            where.append("COALESCE(b.status, '') != 'Cancelled'")
+        clause = "".join(f" AND {w}" for w in where)
+        with self._timed("query_bookings_in_range"):
+            rows = self._conn().execute(
+                "SELECT b.*, c.name, c.email FROM booking_stays s "
+                "JOIN bookings b ON b.id = s.id LEFT JOIN customers c ON c.id = b.customer_id "
+                "WHERE s.start_day <= CAST(julianday(?) AS INTEGER) AND s.end_day >= CAST(julianday(?) AS INTEGER)"
+                f"{clause} ORDER BY b.start_date, b.id",
+                params,
+            ).fetchall()
+        return [dict(r) for r in rows]
+
+    def rebuild_stay_index(self):
+        """Repopulates booking_stays from the start_date/end_date columns."""
+        conn = self._conn()
+        with self._timed("rebuild_stay_index"), conn:
+            conn.execute("DELETE FROM booking_stays")
+            conn.execute(f"INSERT INTO booking_stays {STAY_SELECT}")
+        return True
+
+    def query_customers(self, offset=0, limit=50):
+        conn = self._conn()
+        with self._timed("query_customers"):
+            rows = conn.execute("SELECT * FROM customers ORDER BY id LIMIT ? OFFSET ?", (limit, offset)).fetchall()
+            total = conn.execute("SELECT COUNT(*) FROM customers").fetchone()[0]
+        return [dict(r) for r in rows], total
+
+    def read_rollups(self):
+        with self._timed("read_rollups"):
+            rows = self._conn().execute("SELECT * FROM booking_rollups WHERE bookings != 0").fetchall()
+        return [dict(r) for r in rows]
+
+    def compute_rollups(self):
+        with self._timed("compute_rollups"):
+            rows = self._conn().execute(ROLLUP_SELECT).fetchall()
+        return [dict(r) for r in rows]
+
+    def rebuild_rollups(self):
+        conn = self._conn()
+        with self._timed("rebuild_rollups"), conn:
+            conn.execute("DELETE FROM booking_rollups")
+            conn.execute(f"INSERT INTO booking_rollups {ROLLUP_SELECT}")
+        return True
+
+# --- FACTORY ---
+_repository = None
+
+def get_repository():
+    """
+    Returns the configured backend (DB_BACKEND = 'supabase' | 'sqlite'), created once per process.
+    Wrapped in a read-through cache unless DB_CACHE_TTL_SECONDS is 0.
+    """
+    global _repository
+    if _repository is None:
+        if config.DB_BACKEND == "sqlite":
+            backend = SQLiteRepository()
+        else:
+            backend = SupabaseRepository()
+        if config.DB_CACHE_TTL_SECONDS > 0:
+            from db.cache import CachedRepository
+            backend = CachedRepository(backend, ttl=config.DB_CACHE_TTL_SECONDS, maxsize=config.DB_CACHE_MAX_ENTRIES)
+        _repository = backend
+    return _repository
+
+def get_latency_report():
+    """Average latency per operation for each backend used in this process."""
+    return {
+        backend: {op: {"calls": n, "avg_ms": total / n if n else 0.0} for op, (n, total) in ops.items()}
+        for backend, ops in LATENCY_STATS.items()
+    }
+
+# --- BENCHMARK ---
+def run_benchmark(repo, iterations=200):
+    """Runs each operation `iterations` times against `repo` and returns the latency report."""
+    run_id = int(time.time())
+    ids = []
+    for i in range(iterations):
+        customer = {"name": f"Bench {i}", "email": f"bench{run_id}_{i % 20}@example.com", "phone": "9999999999"}
+        booking = {
+            "service_type": "coorg | Kumara Parvatha Trek", "location": "coorg",
+            "module_name": "Kumara Parvatha Trek", "booking_date": "2025-12-19 to 2025-12-20",
+            "guest_count": 2, "total_cost": 7600, "status": "Confirmed",
+        }
+        ids.append(repo.create_booking_with_customer(customer, booking))
+    for i, booking_id in enumerate(ids):
+        repo.get_booking_with_customer(booking_id)
+        repo.get_bookings_by_email(f"bench{run_id}_{i % 20}@example.com")
+        repo.update_booking(booking_id, {"guest_count": 3})
+        repo.query_bookings_in_range("2025-12-19", "2025-12-20", location="coorg", module_name="Kumara Parvatha Trek")
+    for booking_id in ids:
+        repo.delete_booking(booking_id)
+    return get_latency_report()[repo.name]
+
+if __name__ == "__main__":
+    import tempfile
+    backends = [SQLiteRepository(os.path.join(tempfile.mkdtemp(), "bench.db"))]
+    if config.SUPABASE_URL and config.SUPABASE_KEY:
+        backends.append(SupabaseRepository())
+    for repo in backends:
+        print(f"\n== {repo.name} ==")
+        for op, stats in run_benchmark(repo, iterations=50 if repo.name == "supabase" else 200).items():
+            print(f"{op:32s} {stats['calls']:5d} calls  {stats['avg_ms']:8.3f} ms avg")
@@ -0,0 +1,378 @@
+import os
+import sys
+import json
+import time
+import zlib
+import uuid
+import random
+import socket
+import sqlite3
+import threading
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import config.config as config
+
+# --- LOCAL BOOKING OUTBOX ---
+# A confirmed booking is appended to a local SQLite (WAL) file and acknowledged
+# with a client-assigned booking ID. A background thread replays pending rows to
+# the repository in batches via upsert_bookings(), which skips rows whose
+# idempotency key already exists, so retries and concurrent flushers are safe.
+# A row the store skipped because its booking ID belongs to a different booking
+# (another host minted the same ID) can never be stored under that ID, so it is
+# re-keyed: it gets a fresh ID and is retried at once, and rekeyed_from keeps the
+# ID the customer was given. resolve() maps that ID to the stored one.
+# patch() changes a queued booking in place; a patch that lands while its batch
+# is in flight is applied with update_booking() once the batch is stored.
+
+OUTBOX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    booking_id INTEGER PRIMARY KEY,
+    idempotency_key TEXT NOT NULL UNIQUE,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL DEFAULT 0,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    sent_at REAL,
+    rekeyed_from INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_outbox_due ON outbox(status, next_attempt_at);
+"""
+
+LEASE_SECONDS = 30      # a claimed batch is invisible to other flushers for this long
+ISOLATE_AFTER = 3       # rows that failed this often are retried one at a time
+SENT_RETENTION_SECONDS = 24 * 3600
+
+# Booking ID layout (53 bits, so JavaScript clients read IDs exactly):
+# 40-bit ms since ID_EPOCH_MS (good until 2058) | 6-bit node | 7-bit sequence.
+# The sequence makes IDs unique within a process; the node (OUTBOX_NODE_ID, else a
+# hash of hostname + pid) separates processes and hosts writing to the same store.
+ID_EPOCH_MS = 1704067200000  # 2024-01-01 UTC
+NODE_BITS, SEQUENCE_BITS = 6, 7
+_id_lock = threading.Lock()
+_id_state = {"pid": None, "node": 0, "ms": 0, "seq": 0}
+
+def _node_id():
+    if config.OUTBOX_NODE_ID is not None:
+        return config.OUTBOX_NODE_ID % (1 << NODE_BITS)
+    return zlib.crc32(f"{socket.gethostname()}:{os.getpid()}".encode()) % (1 << NODE_BITS)
+
+def new_booking_id():
+    """Provisional booking ID: clock, node and per-process sequence (see above). Never repeats within a process."""
+    with _id_lock:
+        state = _id_state
+        if state["pid"] != os.getpid():  # first call, or a forked child: new node
+            state.update(pid=os.getpid(), node=_node_id(), ms=0, seq=0)
+        ms = max(int(time.time() * 1000) - ID_EPOCH_MS, state["ms"])  # never step back with the clock
+        if ms == state["ms"]:
+            state["seq"] = (state["seq"] + 1) % (1 << SEQUENCE_BITS)
+            if state["seq"] == 0:
+                ms += 1  # sequence used up this millisecond; borrow the next one
+        else:
+            state["seq"] = 0
+        state["ms"] = ms
+        return (ms << (NODE_BITS + SEQUENCE_BITS)) | (state["node"] << SEQUENCE_BITS) | state["seq"]
+
+class BookingOutbox:
+    """Durable write-ahead queue in front of the booking repository."""
+
+    def __init__(self, path=None, repo=None, batch_size=None, flush_interval=None, max_backoff=None):
+        self.path = path or config.OUTBOX_DB_PATH
+        self._repo = repo
+        self.batch_size = batch_size or config.OUTBOX_BATCH_SIZE
+        self.flush_interval = flush_interval if flush_interval is not None else config.OUTBOX_FLUSH_INTERVAL_SECONDS
+        self.max_backoff = max_backoff or config.OUTBOX_MAX_BACKOFF_SECONDS
+        self.stats = {
+            "enqueued": 0, "enqueue_ms": 0.0, "batches": 0, "flushed": 0,
+            "failures": 0, "reverted": 0, "rekeyed": 0, "last_error": None, "last_flush_at": None,
+        }
+        self._local = threading.local()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(OUTBOX_SCHEMA)
+        # Outboxes created before re-keying
+        if "rekeyed_from" not in {r[1] for r in conn.execute("PRAGMA table_info(outbox)")}:
+            conn.execute("ALTER TABLE outbox ADD COLUMN rekeyed_from INTEGER")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_outbox_rekeyed ON outbox(rekeyed_from)")
+
+    def _conn(self):
+        # sqlite3 connections can't be shared across threads; keep one per thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA synchronous=FULL")  # the ack promises the row survives a crash
+            self._local.conn = conn
+        return conn
+
+    @property
+    def repo(self):
+        if self._repo is None:
+            import db.database as database
+            self._repo = database.get_repository()
+        return self._repo
+
+    # --- WRITE PATH (local disk only) ---
+    def enqueue_booking(self, customer, booking):
+        """Persists the booking locally and returns its booking ID. No network I/O."""
+        start = time.perf_counter()
+        row = {**customer, **booking, "idempotency_key": uuid.uuid4().hex}
+        conn = self._conn()
+        while True:
+            row["id"] = new_booking_id()
+            try:
+                conn.execute(
+                    "INSERT INTO outbox (booking_id, idempotency_key, payload, created_at) VALUES (?, ?, ?, ?)",
+                    (row["id"], row["idempotency_key"], json.dumps(row, separators=(",", ":"), default=str), time.time()),
+                )
+                break
+            except sqlite3.IntegrityError:
+                continue  # clashes with an ID from an earlier process on this node; draw again
+        self.stats["enqueued"] += 1
+        self.stats["enqueue_ms"] += (time.perf_counter() - start) * 1000
+        self._wake.set()
+        return row["id"]
+
+    def discard(self, booking_id):
+        """Drops a booking that has not been flushed yet. Returns True if it was still pending."""
+        cur = self._conn().execute("DELETE FROM outbox WHERE booking_id = ? AND status = 'pending'", (booking_id,))
+        return cur.rowcount == 1
+
+    def resolve(self, booking_id):
+        """The ID a booking is stored under: differs from the one the customer got only if it was re-keyed."""
+        row = self._conn().execute(
+            "SELECT booking_id FROM outbox WHERE rekeyed_from = ? ORDER BY created_at DESC LIMIT 1", (booking_id,)
+        ).fetchone()
+        return row["booking_id"] if row else booking_id
+
+    def patch(self, booking_id, fields):
+        """Applies `fields` to a booking that is still queued. Returns True if it was (the flush stores them)."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT payload FROM outbox WHERE booking_id = ? AND status = 'pending'", (booking_id,)
+            ).fetchone()
+            if row:
+                payload = {**json.loads(row["payload"]), **fields}
+                conn.execute("UPDATE outbox SET payload = ? WHERE booking_id = ?",
+                             (json.dumps(payload, separators=(",", ":"), default=str), booking_id))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return row is not None
+
+    def lookup(self, booking_id):
+        """The locally queued booking (same shape as get_booking_with_customer), or None once flushed."""
+        row = self._conn().execute(
+            "SELECT payload FROM outbox WHERE booking_id = ? AND status = 'pending'", (booking_id,)
+        ).fetchone()
+        return json.loads(row["payload"]) if row else None
+
+    # --- FLUSH PATH ---
+    def _claim(self, now):
+        """Leases the next due batch so other processes' flushers skip it."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute(
+                "SELECT booking_id, payload, attempts FROM outbox"
+                " WHERE status = 'pending' AND next_attempt_at <= ? AND attempts < ?"
+                " ORDER BY booking_id LIMIT ?", (now, ISOLATE_AFTER, self.batch_size),
+            ).fetchall()
+            if not rows:
+                # Only repeat offenders left: send one alone so it can't hold back a batch
+                rows = conn.execute(
+                    "SELECT booking_id, payload, attempts FROM outbox"
+                    " WHERE status = 'pending' AND next_attempt_at <= ? ORDER BY next_attempt_at LIMIT 1", (now,),
+                ).fetchall()
+            if rows:
+                ids = [r["booking_id"] for r in rows]
+                conn.execute(
+                    f"UPDATE outbox SET next_attempt_at = ? WHERE booking_id IN ({', '.join('?' for _ in ids)})",
+                    [now + LEASE_SECONDS] + ids,
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return rows
+
+    def _retry_later(self, rows, now, error):
+        """Exponential backoff with jitter, capped at max_backoff. Rows are never dropped."""
+        conn = self._conn()
+        for r in rows:
+            delay = min(self.flush_interval * 2 ** r["attempts"], self.max_backoff) * (0.5 + random.random() / 2)
+            conn.execute(
+                "UPDATE outbox SET attempts = attempts + 1, next_attempt_at = ?, last_error = ? WHERE booking_id = ?",
+                (now + delay, error[:500], r["booking_id"]),
+            )
+
+    def _rekey(self, booking_id):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT payload, rekeyed_from FROM outbox WHERE booking_id = ? AND status = 'pending'", (booking_id,)
+            ).fetchone()
+            while row:
+                new_id = new_booking_id()
+                try:
+                    conn.execute(
+                        "UPDATE outbox SET booking_id = ?, payload = ?, rekeyed_from = ?, next_attempt_at = 0, last_error = ?"
+                        " WHERE booking_id = ?",
+                        (new_id, json.dumps({**json.loads(row["payload"]), "id": new_id}, separators=(",", ":"), default=str),
+                         row["rekeyed_from"] or booking_id, f"booking id {booking_id} already used; re-keyed", booking_id),
+                    )
+                    break
+                except sqlite3.IntegrityError:
+                    continue
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        if row:
+            self.stats["rekeyed"] += 1
+            print(f"Outbox: booking #{booking_id} re-keyed as #{new_id} (ID already used by another booking)")
+
+    def flush_once(self):
+        """Sends one batch. Returns the number of bookings confirmed by the repository."""
+        now = time.time()
+        rows = self._claim(now)
+        if not rows: return 0
+        ids = [r["booking_id"] for r in rows]
+        conn = self._conn()
+        try:
+            stored = set(self.repo.upsert_bookings([json.loads(r["payload"]) for r in rows]))
+        except Exception as e:
+            self.stats["failures"] += 1
+            self.stats["last_error"] = str(e)
+            self._retry_later(rows, now, str(e))
+            return 0
+        # The call succeeded, so a row missing from `stored` was skipped on conflict: its ID
+        # is taken by a different booking. Give it a fresh ID; the next flush stores it.
+        for r in rows:
+            if r["booking_id"] not in stored:
+                self._rekey(r["booking_id"])
+
+        sent_at = time.time()
+        claimed = {r["booking_id"]: json.loads(r["payload"]) for r in rows}
+        conn.execute("BEGIN IMMEDIATE")
+        reverted, patched = [], []
+        for booking_id in ids:
+            if booking_id not in stored: continue
+            current = conn.execute(
+                "SELECT payload FROM outbox WHERE booking_id = ? AND status = 'pending'", (booking_id,)
+            ).fetchone()
+            if current is None:
+                reverted.append(booking_id)  # discarded while the batch was in flight
+                continue
+            changed = {k: v for k, v in json.loads(current["payload"]).items() if claimed[booking_id].get(k) != v}
+            if changed:
+                patched.append((booking_id, changed))  # patched while the batch was in flight
+            conn.execute("UPDATE outbox SET status = 'sent', sent_at = ? WHERE booking_id = ?", (sent_at, booking_id))
+        # Re-keyed rows stay: they map the ID the customer holds to the stored one
+        conn.execute("DELETE FROM outbox WHERE status = 'sent' AND sent_at < ? AND rekeyed_from IS NULL",
+                     (sent_at - SENT_RETENTION_SECONDS,))
+        conn.execute("COMMIT")
+        for booking_id in reverted:
+            self.repo.delete_booking(booking_id)
+        for booking_id, changed in patched:
+            self.repo.update_booking(booking_id, changed)
+
+        self.stats["batches"] += 1
+        sent = len(stored & set(ids))
+        self.stats["flushed"] += sent - len(reverted)
+        self.stats["reverted"] += len(reverted)
+        self.stats["last_flush_at"] = sent_at
+        return sent
+
+    def flush(self):
+        """Drains everything currently due. Returns the number of bookings sent."""
+        total = 0
+        while True:
+            rekeyed = self.stats["rekeyed"]
+            sent = self.flush_once()
+            if not sent and self.stats["rekeyed"] == rekeyed: return total  # re-keyed rows are due again at once
+            total += sent
+
+    # --- BACKGROUND WORKER ---
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                self.stats["last_error"] = str(e)
+                print(f"Outbox flush error: {e}")
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="booking-outbox", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, drain=True):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        if drain:
+            self.flush()
+
+    def get_stats(self):
+        counts = dict(self._conn().execute("SELECT status, COUNT(*) FROM outbox GROUP BY status").fetchall())
+        oldest = self._conn().execute("SELECT MIN(created_at) FROM outbox WHERE status = 'pending'").fetchone()[0]
+        return {
+            **self.stats,
+            "pending": counts.get("pending", 0),
+            "oldest_pending_seconds": round(time.time() - oldest, 1) if oldest else 0.0,
+            "avg_enqueue_ms": self.stats["enqueue_ms"] / self.stats["enqueued"] if self.stats["enqueued"] else 0.0,
+        }
+
+_outbox = None
+_outbox_lock = threading.Lock()
+
+def get_outbox():
+    """Process-wide outbox with its flusher thread running."""
+    global _outbox
+    with _outbox_lock:
+        if _outbox is None:
+            _outbox = BookingOutbox().start()
+    return _outbox
+
+# --- BENCHMARK ---
+if __name__ == "__main__":
+    import tempfile
+    import db.database as database
+
+    tmp = tempfile.mkdtemp()
+    repo = database.SQLiteRepository(os.path.join(tmp, "bench.db"))
+    box = BookingOutbox(os.path.join(tmp, "outbox.db"), repo=repo)
+    booking = {
+        "service_type": "coorg | Kumara Parvatha Trek", "location": "coorg",
+        "module_name": "Kumara Parvatha Trek", "booking_date": "2025-12-19 to 2025-12-20",
+        "guest_count": 2, "total_cost": 7600, "status": "Confirmed",
+    }
+    n = 500
+    direct_start = time.perf_counter()
+    for i in range(n):
+        repo.create_booking_with_customer({"name": "Direct", "email": f"d{i}@example.com", "phone": "9999999999"}, booking)
+    direct_ms = (time.perf_counter() - direct_start) * 1000 / n
+    ids = [box.enqueue_booking({"name": "Queued", "email": f"q{i}@example.com", "phone": "9999999999"}, booking) for i in range(n)]
+    flush_start = time.perf_counter()
+    box.flush()
+    flush_s = time.perf_counter() - flush_start
+    stored = sum(1 for booking_id in ids if repo.get_booking_with_customer(booking_id))
+    stats = box.get_stats()
+    print(f"direct insert (local sqlite)  {direct_ms:8.3f} ms/booking")
+    print(f"outbox enqueue (ack latency)  {stats['avg_enqueue_ms']:8.3f} ms/booking")
+    print(f"flush                         {n / flush_s:8.0f} bookings/s in {stats['batches']} batches")
+    print(f"stored after flush            {stored}/{n}")
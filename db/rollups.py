@@ -0,0 +1,50 @@
+# --- ANALYTICS ROLLUPS ---
+# The database keeps booking_rollups current via triggers (see SQLITE_INDEXES in
+# database.py and db/supabase_schema.sql). Everything here works on those
+# O(#groups) rows and never touches the bookings table.
+
+ROLLUP_KEY = ("destination", "module", "status", "day")
+
+def summarize(rows):
+    """Dashboard metrics from rollup rows. Revenue and popularity exclude cancelled bookings."""
+    summary = {
+        "total_bookings": 0, "total_revenue": 0.0,
+        "revenue_by_destination": {}, "bookings_by_module": {}, "revenue_by_day": {},
+    }
+    for row in rows:
+        summary["total_bookings"] += row["bookings"]
+        if row["status"] == "Cancelled": continue
+        revenue = float(row["revenue"])
+        summary["total_revenue"] += revenue
+        by_dest = summary["revenue_by_destination"]
+        by_dest[row["destination"]] = by_dest.get(row["destination"], 0.0) + revenue
+        by_mod = summary["bookings_by_module"]
+        by_mod[row["module"]] = by_mod.get(row["module"], 0) + row["bookings"]
+        by_day = summary["revenue_by_day"]
+        by_day[str(row["day"])] = by_day.get(str(row["day"]), 0.0) + revenue
+    return summary
+
+def destinations(rows):
+    return sorted({row["destination"] for row in rows if row["destination"] and row["bookings"] > 0})
+
+def diff_rollups(stored, fresh, tolerance=0.01):
+    """
+    Compares incrementally maintained rollups against a from-scratch aggregate.
+    Returns a list of {"key", "stored", "fresh"} for every group that disagrees.
+    """
+    def index(rows):
+        return {tuple(str(r[k]) for k in ROLLUP_KEY): r for r in rows if r["bookings"] != 0}
+
+    stored_idx, fresh_idx = index(stored), index(fresh)
+    diffs = []
+    for key in stored_idx.keys() | fresh_idx.keys():
+        a, b = stored_idx.get(key), fresh_idx.get(key)
+        if a and b and a["bookings"] == b["bookings"] and a["guests"] == b["guests"] \
+                and abs(float(a["revenue"]) - float(b["revenue"])) <= tolerance:
+            continue
+        diffs.append({"key": dict(zip(ROLLUP_KEY, key)), "stored": a, "fresh": b})
+    return diffs
+
+def check_consistency(repo):
+    """Full-scan consistency check; returns the list of mismatched groups (empty = consistent)."""
+    return diff_rollups(repo.read_rollups(), repo.compute_rollups())
@@ -0,0 +1,223 @@
+-- Scout AI: server-side helpers for db/database.py (SupabaseRepository).
+-- Run in the Supabase SQL editor. Every statement is idempotent, so re-run the
+-- whole file after pulling changes that append sections.
+
+-- Customers are upserted by email, so email must be unique.
+do $$
+begin
+    if not exists (select 1 from pg_constraint where conname = 'customers_email_key') then
+        alter table customers add constraint customers_email_key unique (email);
+    end if;
+end;
+$$;
+
+-- Upsert customer + insert booking in one transaction / one round-trip.
+create or replace function create_booking_with_customer(
+    p_name text,
+    p_email text,
+    p_phone text,
+    p_booking jsonb
+) returns bigint
+language plpgsql
+as $$
+declare
+    v_customer_id bigint;
+    v_booking_id bigint;
+begin
+    insert into customers (name, email, phone)
+    values (p_name, p_email, p_phone)
+    on conflict (email) do nothing;
+
+    select id into v_customer_id from customers where email = p_email;
+
+    insert into bookings (customer_id, service_type, location, module_name,
+                          booking_date, start_date, end_date, guest_count, total_cost, status)
+    values (v_customer_id,
+            p_booking->>'service_type',
+            p_booking->>'location',
+            p_booking->>'module_name',
+            p_booking->>'booking_date',
+            (p_booking->>'start_date')::date,
+            (p_booking->>'end_date')::date,
+            (p_booking->>'guest_count')::int,
+            (p_booking->>'total_cost')::numeric,
+            coalesce(p_booking->>'status', 'Confirmed'))
+    returning id into v_booking_id;
+
+    return v_booking_id;
+end;
+$$;
+
+-- Retired: change feed of an earlier dashboard sync (updated_at + delete tombstones).
+-- Nothing reads it; drop it so deletes stop writing tombstones.
+drop trigger if exists bookings_deleted on bookings;
+drop function if exists record_booking_deletion();
+drop table if exists booking_deletions;
+drop trigger if exists bookings_touch on bookings;
+drop function if exists touch_updated_at();
+drop index if exists idx_bookings_updated;
+alter table bookings drop column if exists updated_at;
+
+create index if not exists idx_bookings_created on bookings (created_at desc);
+create index if not exists idx_bookings_status on bookings (status, created_at desc);
+create index if not exists idx_bookings_location on bookings (location, created_at desc);
+
+-- Analytics rollups (db/rollups.py): one row per destination/module/status/day,
+-- maintained by trigger on every booking insert/update/delete.
+create table if not exists booking_rollups (
+    destination text not null,
+    module text not null,
+    status text not null,
+    day date not null,
+    bookings bigint not null default 0,
+    guests bigint not null default 0,
+    revenue numeric not null default 0,
+    primary key (destination, module, status, day)
+);
+
+create or replace function apply_booking_rollup() returns trigger
+language plpgsql
+as $$
+begin
+    if tg_op in ('UPDATE', 'DELETE') then
+        update booking_rollups set
+            bookings = bookings - 1,
+            guests = guests - coalesce(old.guest_count, 0),
+            revenue = revenue - coalesce(old.total_cost, 0)
+        where destination = coalesce(old.location, '') and module = coalesce(old.module_name, '')
+          and status = coalesce(old.status, '') and day = old.created_at::date;
+    end if;
+    if tg_op in ('INSERT', 'UPDATE') then
+        insert into booking_rollups values (
+            coalesce(new.location, ''), coalesce(new.module_name, ''), coalesce(new.status, ''),
+            new.created_at::date, 1, coalesce(new.guest_count, 0), coalesce(new.total_cost, 0))
+        on conflict (destination, module, status, day) do update set
+            bookings = booking_rollups.bookings + 1,
+            guests = booking_rollups.guests + excluded.guests,
+            revenue = booking_rollups.revenue + excluded.revenue;
+    end if;
+    return null;
+end;
+$$;
+
+drop trigger if exists bookings_rollup on bookings;
+create trigger bookings_rollup
+    after insert or delete or update of location, module_name, status, guest_count, total_cost on bookings
+    for each row execute function apply_booking_rollup();
+
+create or replace function compute_booking_rollups()
+returns setof booking_rollups
+language sql stable
+as $$
+    select coalesce(location, ''), coalesce(module_name, ''), coalesce(status, ''), created_at::date,
+           count(*), coalesce(sum(guest_count), 0), coalesce(sum(total_cost), 0)
+    from bookings group by 1, 2, 3, 4;
+$$;
+
+create or replace function rebuild_booking_rollups() returns void
+language plpgsql
+as $$
+begin
+    delete from booking_rollups where true;
+    insert into booking_rollups select * from compute_booking_rollups();
+end;
+$$;
+
+select rebuild_booking_rollups();
+
+-- Bulk CSV import (app/bulk_import.py): one request per chunk of rows.
+create or replace function bulk_create_bookings(p_rows jsonb)
+returns table (id bigint)
+language plpgsql
+as $$
+begin
+    insert into customers (name, email, phone)
+    select distinct on (r->>'email') r->>'name', r->>'email', r->>'phone'
+    from jsonb_array_elements(p_rows) r
+    on conflict (email) do nothing;
+
+    return query
+    insert into bookings (customer_id, service_type, location, module_name,
+                          booking_date, start_date, end_date, guest_count, total_cost, status)
+    select c.id,
+           r->>'service_type', r->>'location', r->>'module_name', r->>'booking_date',
+           (r->>'start_date')::date, (r->>'end_date')::date,
+           (r->>'guest_count')::int, (r->>'total_cost')::numeric,
+           coalesce(r->>'status', 'Confirmed')
+    from jsonb_array_elements(p_rows) r
+    join customers c on c.email = r->>'email'
+    returning bookings.id;
+end;
+$$;
+
+-- Structured stay dates (start_date/end_date) with an interval index.
+-- Backfills from the legacy "YYYY-MM-DD to YYYY-MM-DD" booking_date string.
+alter table bookings add column if not exists start_date date;
+alter table bookings add column if not exists end_date date;
+
+update bookings set
+    start_date = substring(booking_date from '^(\d{4}-\d{2}-\d{2})')::date,
+    end_date = coalesce(substring(booking_date from ' to (\d{4}-\d{2}-\d{2})$'),
+                        substring(booking_date from '^(\d{4}-\d{2}-\d{2})$'))::date
+where start_date is null and booking_date ~ '^\d{4}-\d{2}-\d{2}';
+
+create extension if not exists btree_gist;
+create index if not exists idx_bookings_stay on bookings using gist (
+    location, module_name, daterange(least(start_date, end_date), greatest(start_date, end_date), '[]')
+);
+
+-- Overlap lookup for db/database.py query_bookings_in_range (uses idx_bookings_stay).
+create or replace function bookings_in_range(
+    p_start date,
+    p_end date,
+    p_location text default null,
+    p_module text default null,
+    p_include_cancelled boolean default false
+) returns setof jsonb
+language sql stable
+as $$
+    select to_jsonb(b) || jsonb_build_object('name', c.name, 'email', c.email)
+    from bookings b
+    left join customers c on c.id = b.customer_id
+    where daterange(least(b.start_date, b.end_date), greatest(b.start_date, b.end_date), '[]')
+          && daterange(p_start, p_end, '[]')
+      and (p_location is null or b.location = p_location)
+      and (p_module is null or b.module_name = p_module)
+      and (p_include_cancelled or b.status is distinct from 'Cancelled')
+    order by b.start_date, b.id;
+$$;
+
+-- Local booking outbox (db/outbox.py): batched, idempotent replay of bookings
+-- that were acknowledged locally with a client-assigned id. A row whose id is
+-- already taken by another booking is skipped and missing from the result; the
+-- outbox re-keys it and sends it again.
+alter table bookings add column if not exists idempotency_key text unique;
+
+create or replace function upsert_bookings(p_rows jsonb)
+returns table (id bigint)
+language plpgsql
+as $$
+begin
+    insert into customers (name, email, phone)
+    select distinct on (r->>'email') r->>'name', r->>'email', r->>'phone'
+    from jsonb_array_elements(p_rows) r
+    on conflict (email) do nothing;
+
+    insert into bookings (id, idempotency_key, customer_id, service_type, location, module_name,
+                          booking_date, start_date, end_date, guest_count, total_cost, status)
+    overriding system value
+    select (r->>'id')::bigint, r->>'idempotency_key', c.id,
+           r->>'service_type', r->>'location', r->>'module_name', r->>'booking_date',
+           (r->>'start_date')::date, (r->>'end_date')::date,
+           (r->>'guest_count')::int, (r->>'total_cost')::numeric,
+           coalesce(r->>'status', 'Confirmed')
+    from jsonb_array_elements(p_rows) r
+    join customers c on c.email = r->>'email'
+    on conflict do nothing;
+
+    return query
+    select b.id from bookings b
+    where b.idempotency_key in (select r->>'idempotency_key' from jsonb_array_elements(p_rows) r);
+end;
+$$;
+
@@ -1,23 +1,80 @@
 import os
+import re
 import sys
-from langchain_groq import ChatGroq
+import time
 
 # Add parent directory to path to import config
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 import config.config as config
 
+_groq_model = None
+
+# --- OFFLINE STUB (LLM_BACKEND=stub) ---
+class StubChatModel:
+    """
+    Stand-in for ChatGroq in load tests: no network, fixed latency, canned replies.
+    Implements the two calls the app makes (invoke, stream) on the same prompts.
+    """
+
+    def __init__(self, latency_ms=None):
+        self.latency = (config.LLM_STUB_LATENCY_MS if latency_ms is None else latency_ms) / 1000
+
+    def _reply(self, messages):
+        prompt = messages[0].content
+        if "Return JSON" in prompt:
+            # Entity extraction: pick up a valid location named in the text, nothing else
+            text = re.search(r'Extract booking entities from: "(.*?)"', prompt, re.DOTALL)
+            valid = re.search(r"Valid Locations: \[(.*?)\]", prompt)
+            locs = re.findall(r"'([^']+)'", valid.group(1)) if valid else []
+            found = [loc for loc in locs if text and loc in text.group(1).lower()]
+            return '{"location": "%s"}' % found[0] if found else "{}"
+        if "Conversation Summarizer" in prompt:
+            # Rolling summary: previous summary plus the new user lines
+            previous = re.search(r"SUMMARY:\s*(.*?)\s*NEW MESSAGES:", prompt, re.DOTALL)
+            lines = re.findall(r"^\s*User: (.*)$", prompt, re.MULTILINE)
+            kept = [] if not previous or previous.group(1) == "(empty)" else [previous.group(1)]
+            return "\n".join(kept + [f"User asked: {line[:120]}" for line in lines])
+        if "Query Refiner" in prompt:
+            question = re.search(r"User Question: (.*)", prompt)
+            return question.group(1).strip() if question else ""
+        context = re.search(r"CONTEXT:\s*(.*?)\s*RULES:", prompt, re.DOTALL)
+        snippet = " ".join(context.group(1).split()[:40]) if context else ""
+        return f"(stub) Based on our guides: {snippet}"
+
+    def invoke(self, messages):
+        from langchain_core.messages import AIMessage
+        time.sleep(self.latency)
+        return AIMessage(content=self._reply(messages))
+
+    def stream(self, messages):
+        from langchain_core.messages import AIMessageChunk
+        words = self._reply(messages).split(" ")
+        for i, word in enumerate(words):
+            time.sleep(self.latency / len(words))
+            yield AIMessageChunk(content=word if i == 0 else " " + word)
+
 def get_chatgroq_model():
-    """Initialize and return the Groq chat model using settings from config"""
+    """Initialize (once per process) and return the Groq chat model using settings from config"""
+    global _groq_model
+    if _groq_model is not None:
+        return _groq_model
+    if config.LLM_BACKEND == "stub":
+        _groq_model = StubChatModel()
+        return _groq_model
     try:
         if not config.GROQ_API_KEY:
             raise ValueError("GROQ_API_KEY is missing in config.py!")
 
+        # langchain_groq is slow to import; only the first LLM call pays for it
+        from langchain_groq import ChatGroq
+
         # Initialize the Groq chat model
         groq_model = ChatGroq(
             api_key=config.GROQ_API_KEY,
             model_name=config.GROQ_MODEL_NAME,
             temperature=0.3 # Lower temperature for more factual answers
         )
+        _groq_model = groq_model
         return groq_model
     except Exception as e:
         print(f"Error initializing Groq: {e}")
@@ -0,0 +1,98 @@
+"""
+Recursive 1000/200 splitter vs. the structure-aware chunker (app/doc_chunker.py)
+on the bundled docs/ PDFs.
+
+    python scripts/benchmark_chunking.py           # FastEmbed model (downloaded on first use)
+    python scripts/benchmark_chunking.py --stub    # offline: hash embeddings (latency/size only;
+                                                   # hit rate is meaningless without real vectors)
+
+For each chunker: chunk count, characters indexed (and how many of them are
+overlap duplicates), FAISS index size on disk, build time, top-3 retrieval
+latency, characters of retrieved context per question (what goes into the
+prompt), and the share of questions whose expected fact is in the top-3 chunks.
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# (question, text the answer needs)
+QUESTIONS = [
+    ("Is alcohol allowed in the forest camps?", "Strictly banned in Forest Campsites"),
+    ("What is the refund if I cancel 5 days before?", "50% Refund"),
+    ("What food is served for dinner at the campsite?", "Chapati, Dal Fry"),
+    ("What should I pack for the Kumara Parvatha trek?", "Trekking shoes"),
+    ("Do I need a permit for Berijam in Kodaikanal?", "Requires forest permit"),
+    ("What time must I reach the forest office for Chembra Peak?", "7:00 AM"),
+    ("Are there western toilets at Cloud Farm?", "western toilets available"),
+    ("Can I bring my dog on the trek?", "Pets are not allowed"),
+    ("Which hospital is nearest to the Wayanad base camp?", "WIMS Medical College"),
+    ("How much does the Tadiandamol camp cost?", "2,500/person"),
+    ("What is the day 2 plan for Kumara Parvatha?", "Start 4 AM"),
+    ("Is there mobile network at Kodaikanal?", "Good 4G coverage"),
+]
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))] if values else 0.0
+
+def dir_size(path):
+    return sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(path) for f in files)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stub", action="store_true", help="offline hash embeddings")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="scout-chunking-")
+    os.environ.update({"TRACING_ENABLED": "0", "RERANK_ENABLED": "0"})
+    if args.stub:
+        os.environ["EMBEDDING_BACKEND"] = "stub"
+    sys.path[:0] = [os.path.join(BASE_DIR, "app"), BASE_DIR]
+    import config.config as config
+    import rag_pipeline as rag
+    import pdf_stream
+    import doc_chunker
+
+    docs_dir = os.path.join(BASE_DIR, "docs")
+    pages = [p for f in sorted(os.listdir(docs_dir)) if f.endswith(".pdf")
+             for p in pdf_stream.iter_pdf_pages(os.path.join(docs_dir, f), max_bytes=0)]
+    source_chars = sum(len(" ".join(p.page_content.split())) for p in pages)
+    try:
+        rag.get_embedding_model()
+    except Exception as e:
+        sys.exit(f"Embedding model unavailable ({e}).\nThe hit rate needs the real model; use --stub for size and latency only.")
+
+    print(f"{len(pages)} pages, {source_chars} chars of text (whitespace collapsed)\n")
+    print(f"{'chunker':10s} {'chunks':>6s} {'avg chars':>9s} {'indexed':>8s} {'dup %':>6s} {'index KB':>8s} "
+          f"{'build ms':>8s} {'p50 ms':>7s} {'p95 ms':>7s} {'ctx chars':>9s} {'hit@3':>6s}")
+    for mode in ("recursive", "structured"):
+        config.CHUNKER = mode
+        config.VECTOR_DB_PATH = os.path.join(tmp, mode)
+        chunks = doc_chunker.split_documents(pages)
+        indexed = sum(len(" ".join(c.page_content.split())) for c in chunks)
+
+        start = time.perf_counter()
+        rag.initialize_knowledge_base(force=True)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        latencies, hits, context = [], 0, 0
+        for _ in range(3):
+            for question, fact in QUESTIONS:
+                start = time.perf_counter()
+                texts = rag.retrieve(question)
+                latencies.append((time.perf_counter() - start) * 1000)
+                hits += any(fact in " ".join(t.split()) for t in texts)
+                context += sum(len(t) for t in texts)
+        duplicated = max(0, indexed - source_chars) / indexed
+        print(f"{mode:10s} {len(chunks):6d} {indexed / len(chunks):9.0f} {indexed:8d} {duplicated:6.0%} "
+              f"{dir_size(config.VECTOR_DB_PATH) / 1024:8.0f} {build_ms:8.0f} {percentile(latencies, 50):7.2f} "
+              f"{percentile(latencies, 95):7.2f} {context / len(latencies):9.0f} {'n/a' if args.stub else f'{hits / len(latencies):.0%}':>6s}")
+
+    print("\n'dup %' = indexed chars beyond the source text: overlap for recursive, breadcrumbs for structured.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Context size and retrieval latency with and without the cross-encoder rerank
+stage (app/reranker.py), on the bundled docs/ PDFs.
+
+    python scripts/benchmark_rerank.py                  # FastEmbed models (downloaded on first use)
+    python scripts/benchmark_rerank.py --stub           # offline: hash embeddings + word-overlap reranker
+    python scripts/benchmark_rerank.py --candidates 20 --top-n 1
+
+For each question: plain top-3 retrieval vs. RERANK_CANDIDATES retrieved and
+RERANK_TOP_N kept. Reports context characters/tokens per prompt and retrieval
+latency. Each mode runs twice, so the second pass shows the score cache at work.
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+QUESTIONS = [
+    "Is alcohol allowed in the forest camps?",
+    "What is the cancellation policy for Coorg?",
+    "What food is served at Wayanad?",
+    "What should I pack for the Kumara Parvatha trek?",
+    "Do I need a permit for Berijam in Kodaikanal?",
+    "What time does the Chembra Peak hike start?",
+    "Are there western toilets at Cloud Farm Glamping?",
+    "Is music allowed at night in Kodaikanal?",
+]
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))] if values else 0.0
+
+def run(rag, config, reranker, enabled):
+    config.RERANK_ENABLED = enabled
+    passes = []
+    for _ in range(2):
+        latencies, chars = [], []
+        for question in QUESTIONS:
+            start = time.perf_counter()
+            texts = rag.retrieve(question)
+            latencies.append((time.perf_counter() - start) * 1000)
+            chars.append(sum(len(t) for t in texts))
+        passes.append((latencies, chars))
+    return passes
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stub", action="store_true", help="offline embeddings and reranker")
+    parser.add_argument("--candidates", type=int, default=10, help="chunks retrieved before reranking")
+    parser.add_argument("--top-n", type=int, default=2, help="chunks kept after reranking")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="scout-rerank-")
+    os.environ.update({
+        "VECTOR_DB_PATH": os.path.join(tmp, "faiss_index"), "TRACING_ENABLED": "0",
+        "RERANK_CANDIDATES": str(args.candidates), "RERANK_TOP_N": str(args.top_n),
+    })
+    if args.stub:
+        os.environ["EMBEDDING_BACKEND"] = "stub"
+    sys.path[:0] = [os.path.join(BASE_DIR, "app"), BASE_DIR]
+    import config.config as config
+    import rag_pipeline as rag
+    import reranker
+
+    rag.ensure_knowledge_base()
+    start = time.perf_counter()
+    reranker.get_reranker()
+    print(f"reranker {'stub' if args.stub else config.RERANK_MODEL} loaded in {(time.perf_counter() - start) * 1000:.0f} ms\n")
+
+    results = {"top-3": run(rag, config, reranker, False),
+               f"rerank {args.candidates}->{args.top_n}": run(rag, config, reranker, True)}
+    print(f"{'mode':18s} {'pass':>4s} {'ctx chars':>10s} {'~tokens':>8s} {'p50 ms':>8s} {'p95 ms':>8s}")
+    for mode, passes in results.items():
+        for i, (latencies, chars) in enumerate(passes, 1):
+            avg = sum(chars) / len(chars)
+            print(f"{mode:18s} {i:4d} {avg:10.0f} {avg / 4:8.0f} {percentile(latencies, 50):8.1f} {percentile(latencies, 95):8.1f}")
+    stats = reranker.get_stats()
+    print(f"\ncontext vs. top-3: {stats['context_reduction_vs_top_k']:.0%} smaller, "
+          f"score cache hit rate {stats['cache']['hit_rate']:.0%} ({stats['scored']} pairs scored, {stats['pairs']} requested)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""
+Local load test for the HTTP API (app/api.py) with stubbed LLM, embeddings and DB.
+
+    python scripts/load_test_api.py                       # 20 users, 20 s, 1 worker
+    python scripts/load_test_api.py --users 50 --duration 30 --workers 4
+
+Starts uvicorn in a subprocess with LLM_BACKEND=stub, EMBEDDING_BACKEND=stub and
+DB_BACKEND=sqlite (all files in a temp dir), then each virtual user loops a full
+booking conversation plus availability, answer and streamed-answer calls.
+Slots sell out as the run goes on; a conversation that ends on a sold-out reply
+(no open rows, or the picked slot filled up meanwhile) is counted, not an error.
+Prints throughput and latency percentiles per endpoint; exits 1 on any error.
+"""
+import os
+import sys
+import time
+import json
+import random
+import socket
+import asyncio
+import argparse
+import tempfile
+import subprocess
+
+import httpx
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def start_server(port, workers, tmp, llm_latency_ms):
+    env = {
+        **os.environ,
+        "LLM_BACKEND": "stub", "EMBEDDING_BACKEND": "stub", "LLM_STUB_LATENCY_MS": str(llm_latency_ms),
+        "DB_BACKEND": "sqlite", "DB_PATH": os.path.join(tmp, "camping.db"),
+        "VECTOR_DB_PATH": os.path.join(tmp, "faiss_index"),
+        "OUTBOX_DB_PATH": os.path.join(tmp, "outbox.db"), "MAIL_OUTBOX_DB_PATH": os.path.join(tmp, "mail_outbox.db"),
+        "SESSION_BACKEND": "sqlite", "SESSION_DB_PATH": os.path.join(tmp, "sessions.db"),
+        "SENDER_EMAIL": "your_email@example.com",  # emails are skipped, as in local dev
+    }
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api:app", "--app-dir", os.path.join(BASE_DIR, "app"),
+         "--port", str(port), "--workers", str(workers), "--log-level", "warning"],
+        cwd=BASE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=open(os.path.join(tmp, "server.log"), "w"),
+    )
+
+async def wait_ready(client, timeout=180):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            status = (await client.get("/v1/health")).json()["warmup"]
+            if status["state"] in ("ready", "error"):
+                return status
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.5)
+    raise TimeoutError("API did not become ready")
+
+class Recorder:
+    def __init__(self):
+        self.latencies = {}
+        self.errors = []
+
+    async def call(self, client, name, method, url, **kwargs):
+        start = time.perf_counter()
+        response = await client.request(method, url, **kwargs)
+        self.latencies.setdefault(name, []).append((time.perf_counter() - start) * 1000)
+        if response.status_code >= 400:
+            self.errors.append(f"{name}: HTTP {response.status_code} {response.text[:200]}")
+            return None
+        return response
+
+SOLD_OUT = "sold out"
+
+async def booking_conversation(client, rec, user_id):
+    """Returns "booked", "sold_out" (an expected outcome under load) or None on error."""
+    created = await rec.call(client, "create_session", "POST", "/v1/sessions")
+    if not created: return None
+    sid = created.json()["session_id"]
+
+    async def say(message):
+        r = await rec.call(client, "message", "POST", f"/v1/sessions/{sid}/messages", json={"message": message})
+        return r.json() if r else None
+
+    turn = await say("I want to book a trip to coorg")
+    if turn and not turn["options"] and SOLD_OUT in (turn["reply"] or "").lower():
+        return "sold_out"
+    open_rows = [i for i, row in enumerate(turn["options"] if turn else []) if row["Status"].strip() != "Sold out"]
+    if not open_rows:
+        rec.errors.append(f"user {user_id}: no open options offered ({turn and turn['reply']})")
+        return None
+    picked = await rec.call(client, "select", "POST", f"/v1/sessions/{sid}/select", json={"index": random.choice(open_rows)})
+    if not picked or not await say("yes"): return None
+    guests = await say("2")
+    if not guests: return None
+    if guests["step"] != "GET_DETAILS":
+        # Filled up since the table was shown: back to the table, or fewer slots left than asked
+        if SOLD_OUT in (guests["reply"] or "").lower() or "fewer guests" in (guests["reply"] or ""):
+            return "sold_out"
+        rec.errors.append(f"user {user_id}: guests not accepted ({guests['reply']})")
+        return None
+    for message in [f"Load User {user_id}", f"load{user_id}.{random.randrange(10**6)}@example.com", "9876543210"]:
+        if not await say(message): return None
+    final = await say("yes")
+    if not final or "Success" not in (final["reply"] or ""):
+        rec.errors.append(f"user {user_id}: booking not confirmed ({final and final['reply']})")
+        return None
+    return "booked"
+
+async def stream_answer(client, rec, question):
+    start = time.perf_counter()
+    first = None
+    async with client.stream("POST", "/v1/answer/stream", json={"question": question}) as response:
+        async for line in response.aiter_lines():
+            if line.startswith("data:") and first is None:
+                first = (time.perf_counter() - start) * 1000
+    rec.latencies.setdefault("answer_stream_ttfb", []).append(first or 0.0)
+    rec.latencies.setdefault("answer_stream", []).append((time.perf_counter() - start) * 1000)
+
+async def virtual_user(client, rec, user_id, stop_at, counts):
+    while time.time() < stop_at:
+        outcome = await booking_conversation(client, rec, user_id)
+        if outcome == "booked":
+            counts["bookings"] += 1
+        elif outcome == "sold_out":
+            counts["sold_out"] += 1
+        await rec.call(client, "availability", "GET", "/v1/availability", params={"location": "wayanad"})
+        await rec.call(client, "answer", "POST", "/v1/answer", json={"question": "Is alcohol allowed at the campsite?"})
+        await stream_answer(client, rec, "What should I pack for the Coorg trek?")
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+async def run(args):
+    tmp = tempfile.mkdtemp(prefix="scout-load-")
+    port = free_port()
+    server = start_server(port, args.workers, tmp, args.llm_latency_ms)
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=60,
+                                     limits=httpx.Limits(max_connections=args.users * 2)) as client:
+            status = await wait_ready(client)
+            print(f"server ready (warm-up {status['state']}, {json.dumps({k: round(v) for k, v in status['timings_ms'].items()})} ms)")
+            rec, counts = Recorder(), {"bookings": 0, "sold_out": 0}
+            start = time.time()
+            await asyncio.gather(*(virtual_user(client, rec, i, start + args.duration, counts) for i in range(args.users)))
+            elapsed = time.time() - start
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+    total = sum(len(v) for k, v in rec.latencies.items() if k != "answer_stream_ttfb")
+    print(f"\n{args.users} users x {elapsed:.1f} s, {args.workers} worker(s), stub LLM {args.llm_latency_ms:.0f} ms")
+    print(f"{total} requests, {total / elapsed:.0f} req/s, {counts['bookings']} bookings completed ({counts['bookings'] / elapsed:.1f}/s), "
+          f"{counts['sold_out']} ended sold out\n")
+    print(f"{'endpoint':22s} {'count':>7s} {'p50 ms':>9s} {'p95 ms':>9s} {'p99 ms':>9s}")
+    for name, values in sorted(rec.latencies.items()):
+        print(f"{name:22s} {len(values):7d} {percentile(values, 50):9.1f} {percentile(values, 95):9.1f} {percentile(values, 99):9.1f}")
+    if rec.errors:
+        print(f"\n{len(rec.errors)} errors, first few:")
+        for error in rec.errors[:5]:
+            print(f"  {error}")
+        print(f"server log: {os.path.join(tmp, 'server.log')}")
+        sys.exit(1)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20, help="concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=20, help="seconds to run")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--llm-latency-ms", type=float, default=50, help="simulated LLM latency per call")
+    asyncio.run(run(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
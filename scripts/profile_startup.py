@@ -0,0 +1,81 @@
+"""
+Import-time profile of the chat app entry point (app/main.py).
+
+    python scripts/profile_startup.py              # report + budget check
+    python scripts/profile_startup.py --top 30 --budget 1.0
+
+Runs `python -X importtime -c "import main"` in a fresh interpreter (from app/,
+the way `streamlit run app/main.py` resolves imports), prints the slowest
+modules, and exits non-zero if startup exceeds the budget or if any module in
+DEFERRED_MODULES was imported eagerly. Use it as the startup regression check.
+"""
+import os
+import sys
+import argparse
+import subprocess
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+APP_DIR = os.path.join(BASE_DIR, "app")
+
+DEFAULT_BUDGET_SECONDS = float(os.getenv("STARTUP_BUDGET_SECONDS", "1.5"))
+
+# Heavy dependencies that must only load on first use, never at startup
+DEFERRED_MODULES = [
+    "langchain_groq", "langchain_community", "langchain_core", "langchain_text_splitters",
+    "fastembed", "faiss", "supabase", "pandas", "pyarrow", "pypdf", "fpdf",
+]
+
+def profile(entry="main"):
+    """Returns [(module, self_us, cumulative_us, depth)] in import order."""
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join([APP_DIR, BASE_DIR])}
+    env.setdefault("DB_BACKEND", "sqlite")
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {entry}"],
+        cwd=APP_DIR, env=env, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {entry} failed:\n{proc.stderr[-2000:]}")
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line: continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        rows.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entry", default="main", help="module to import from app/ (default: main)")
+    parser.add_argument("--top", type=int, default=15, help="rows to show per table")
+    parser.add_argument("--budget", type=float, default=DEFAULT_BUDGET_SECONDS, help="max seconds for the entry import")
+    args = parser.parse_args()
+
+    rows = profile(args.entry)
+    entry = next(r for r in reversed(rows) if r[0] == args.entry)
+    total_s = entry[2] / 1e6
+
+    print(f"import {args.entry}: {total_s:.3f} s ({len(rows)} modules)\n")
+    print("Slowest direct imports (cumulative):")
+    for name, _, cumulative, depth in sorted((r for r in rows if r[3] == entry[3] + 1), key=lambda r: -r[2])[:args.top]:
+        print(f"  {cumulative / 1000:9.1f} ms  {name}")
+    print("\nSlowest modules (self time):")
+    for name, self_us, _, _ in sorted(rows, key=lambda r: -r[1])[:args.top]:
+        print(f"  {self_us / 1000:9.1f} ms  {name}")
+
+    loaded = {name.split(".")[0] for name, _, _, _ in rows}
+    eager = [m for m in DEFERRED_MODULES if m in loaded]
+    failures = []
+    if eager:
+        failures.append(f"deferred modules imported at startup: {', '.join(eager)}")
+    if total_s > args.budget:
+        failures.append(f"startup {total_s:.3f} s exceeds budget {args.budget:.3f} s")
+
+    print()
+    if failures:
+        for failure in failures:
+            print(f"FAIL: {failure}")
+        sys.exit(1)
+    print(f"OK: within {args.budget:.3f} s budget, no deferred modules loaded")
+
+if __name__ == "__main__":
+    main()
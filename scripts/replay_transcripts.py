@@ -0,0 +1,198 @@
+"""
+Replays recorded conversations (TRANSCRIPT_PATH, see app/transcripts.py) through
+booking_flow.process_booking_input and rag.query_rag with every recorded LLM,
+vector-search, DB and SMTP result stubbed in.
+
+    TRANSCRIPT_PATH=db/transcripts.jsonl streamlit run app/main.py    # record real sessions
+    python scripts/replay_transcripts.py db/transcripts.jsonl         # replay + report
+    python scripts/replay_transcripts.py --record-sample /tmp/sample.jsonl   # make a transcript offline
+
+Reports per-turn latency (replayed in-process time and recorded wall time),
+external calls per conversation by type, and behaviour diffs (reply, booking
+step or call sequence differing from the recording). Exits 1 if anything differs.
+"""
+import os
+import re
+import sys
+import time
+import argparse
+import tempfile
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+def configure(record_path=None):
+    """Must run before importing the app: offline backends, scratch DB, recording on or off."""
+    tmp = tempfile.mkdtemp(prefix="scout-replay-")
+    # Unrecorded calls must fail loudly rather than reach real services
+    os.environ.update({
+        "LLM_BACKEND": "stub", "LLM_STUB_LATENCY_MS": "0", "EMBEDDING_BACKEND": "stub",
+        "DB_BACKEND": "sqlite", "DB_PATH": os.path.join(tmp, "camping.db"),
+        "VECTOR_DB_PATH": os.path.join(tmp, "faiss_index"),
+        "OUTBOX_DB_PATH": os.path.join(tmp, "outbox.db"), "MAIL_OUTBOX_DB_PATH": os.path.join(tmp, "mail_outbox.db"),
+        "SENDER_EMAIL": "your_email@example.com", "TRANSCRIPT_PATH": record_path or "",
+    })
+    sys.path[:0] = [os.path.join(BASE_DIR, "app"), BASE_DIR]
+
+# --- SAMPLE RECORDING ---
+def record_sample(path):
+    """Books, updates and cancels through the real adapter (stub LLM, scratch SQLite) with recording on."""
+    import session_store
+    import booking_flow as booking
+    import rag_pipeline as rag
+    import transcripts
+    import tools
+
+    rag.ensure_knowledge_base()
+
+    def conversation(name, steps):
+        state = session_store.SessionState(messages=[])
+        with booking.bound_session(state), transcripts.session(name):
+            booking.init_booking_state()
+            for step in steps:
+                if isinstance(step, int):
+                    booking.select_package(dict(state.selection_df.iloc[step]), state.messages) \
+                        if state.booking_step == "WAITING_FOR_SELECTION" else \
+                        booking.select_update_date(dict(state.selection_df.iloc[step]), state.messages)
+                elif isinstance(step, dict):
+                    booking.invoice_verified(step, state.messages)
+                else:
+                    state.messages.append({"role": "user", "content": step})
+                    reply = booking.process_booking_input(step, state.messages)
+                    if reply is None:
+                        reply = rag.query_rag(step, state.messages)
+                    state.messages.append({"role": "assistant", "content": reply})
+        return state
+
+    if os.path.exists(path):
+        os.remove(path)
+    state = conversation("sample-book", ["What should I pack for the Coorg trek?", "book a trip to coorg", 0, "yes", "2",
+                                         "Sample User", "sample@example.com", "9876543210", "yes"])
+    booking_id = int(re.search(r"#(\d+)", state.messages[-1]["content"]).group(1))
+    tools.get_booking_outbox().flush()
+
+    def verified():
+        # What the invoice upload would have found (still queued locally if the flusher is mid-batch)
+        return tools.get_repo().get_booking_with_customer(booking_id) or tools.get_booking_outbox().lookup(booking_id)
+    conversation("sample-update", ["I want to change my booking", verified(), "make it 3 people",
+                                   "show available dates", 1, "done", "confirm"])
+    conversation("sample-cancel", ["cancel my booking", verified(), "yes"])
+    conversation("sample-rag", ["Is alcohol allowed in the forest camps?", "what about wayanad?"])
+    print(f"recorded sample transcript to {path}")
+
+# --- REPLAY ---
+def flow_of(entries):
+    intents = {(e.get(k) or {}).get("data", {}).get("intent") for e in entries for k in ("before", "after")}
+    for flow in ("cancel", "update"):
+        if flow in intents: return flow
+    return "book" if any(e["kind"] == "booking" and e.get("after", {}).get("step") != "IDLE" for e in entries) else "rag"
+
+def replay_session(entries):
+    """Returns [(entry, replay_ms, diffs, used_kinds)] for one recorded session."""
+    import pandas as pd
+    import session_store
+    import booking_flow as booking
+    import rag_pipeline as rag
+    import transcripts
+
+    state = session_store.SessionState(messages=[])
+    first = next((e["before"] for e in entries if e["kind"] == "booking"), None)
+    if first:
+        state.booking_step, state.booking_data = first["step"], first["data"]
+        if first["options"]:
+            state.selection_df = pd.DataFrame(first["options"])
+
+    results = []
+    with booking.bound_session(state):
+        for entry in entries:
+            diffs = []
+            if entry["kind"] == "booking" and state.get("booking_step") != entry["before"]["step"]:
+                diffs.append(f"starts in {state.get('booking_step')}, recorded {entry['before']['step']}")
+            reply = None
+            start = time.perf_counter()
+            with transcripts.replay(entry["calls"]) as replayed:
+                try:
+                    if entry["kind"] == "rag":
+                        reply = rag.query_rag(entry["query"], entry["history"])
+                    elif entry["event"]["type"] == "select":
+                        reply = booking.select_package(entry["event"]["row"])
+                    elif entry["event"]["type"] == "invoice_verified":
+                        reply = booking.invoice_verified(entry["event"]["booking"])
+                    else:
+                        event = entry["event"]
+                        reply = booking.process_booking_input(event["text"], event.get("history", []), intent=event.get("intent"))
+                except transcripts.ReplayMiss as e:
+                    diffs.append(f"unrecorded {e}")
+            elapsed = (time.perf_counter() - start) * 1000
+
+            recorded_kinds = [c["kind"] for c in entry["calls"]]
+            if replayed.used != recorded_kinds and not any(d.startswith("unrecorded") for d in diffs):
+                diffs.append(f"calls {replayed.used} != recorded {recorded_kinds}")
+            if reply != entry["reply"]:
+                diffs.append(f"reply {str(reply)[:80]!r} != recorded {str(entry['reply'])[:80]!r}")
+            if entry["kind"] == "booking" and state.get("booking_step") != entry["after"]["step"]:
+                diffs.append(f"ends in {state.get('booking_step')}, recorded {entry['after']['step']}")
+            results.append((entry, elapsed, diffs, replayed.used))
+    return results
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))] if values else 0.0
+
+def report(path, rounds):
+    import transcripts
+
+    sessions = transcripts.load(path)
+    by_flow, all_diffs = {}, []
+    for _ in range(rounds):
+        for session_id, entries in sessions.items():
+            flow = flow_of(entries)
+            stats = by_flow.setdefault(flow, {"conversations": 0, "turns": 0, "replay_ms": [], "recorded_ms": [], "calls": {}})
+            stats["conversations"] += 1
+            for turn, (entry, elapsed, diffs, used) in enumerate(replay_session(entries), 1):
+                stats["turns"] += 1
+                stats["replay_ms"].append(elapsed)
+                stats["recorded_ms"].append(entry.get("ms", 0.0))
+                for kind in used:
+                    stats["calls"][kind] = stats["calls"].get(kind, 0) + 1
+                all_diffs += [f"{session_id} turn {turn}: {d}" for d in diffs]
+
+    total_turns = sum(s["turns"] for s in by_flow.values())
+    print(f"{len(sessions)} conversations, {total_turns // rounds} turns, {rounds} round(s)\n")
+    print(f"{'flow':8s} {'convs':>6s} {'turns':>6s} {'replay p50':>11s} {'p95':>8s} {'recorded p50':>13s} {'p95':>9s}  calls/conversation")
+    for flow, s in sorted(by_flow.items()):
+        per_conv = ", ".join(f"{kind} {count / s['conversations']:.1f}" for kind, count in sorted(s["calls"].items()))
+        categories = {}
+        for kind, count in s["calls"].items():
+            category = transcripts.CALL_CATEGORIES.get(kind, "other")
+            categories[category] = categories.get(category, 0) + count / s["conversations"]
+        print(f"{flow:8s} {s['conversations']:6d} {s['turns']:6d} {percentile(s['replay_ms'], 50):9.2f}ms {percentile(s['replay_ms'], 95):6.2f}ms"
+              f" {percentile(s['recorded_ms'], 50):11.1f}ms {percentile(s['recorded_ms'], 95):7.1f}ms"
+              f"  [{', '.join(f'{c} {n:.1f}' for c, n in sorted(categories.items()))}] {per_conv}")
+
+    unique = list(dict.fromkeys(all_diffs))
+    print()
+    if unique:
+        print(f"{len(unique)} behaviour diffs:")
+        for diff in unique[:20]:
+            print(f"  {diff}")
+        sys.exit(1)
+    print("OK: replies, booking steps and call sequences match the recording")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("transcript", nargs="?", help="JSONL written with TRANSCRIPT_PATH")
+    parser.add_argument("--record-sample", metavar="PATH", help="record a sample transcript offline, then replay it")
+    parser.add_argument("--rounds", type=int, default=1, help="replay everything N times (steadier latency numbers)")
+    args = parser.parse_args()
+    if not args.transcript and not args.record_sample:
+        parser.error("give a transcript to replay or --record-sample PATH")
+
+    configure(record_path=args.record_sample)
+    if args.record_sample:
+        record_sample(args.record_sample)
+        import config.config as config
+        config.TRANSCRIPT_PATH = ""  # don't append the replay to the file being replayed
+    report(args.transcript or args.record_sample, args.rounds)
+
+if __name__ == "__main__":
+    main()